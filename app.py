@@ -1,7 +1,13 @@
 import streamlit as st
-import importlib
 import os
+import time
+import uuid
 from llm import GeminiLLM
+from memory import ConversationMemory
+from registry import ToolRegistry
+from tracing import recent_traces, waterfall, metrics
+from jobs import job_queue, Job, run_job, QUEUED, DONE, ERROR
+from pipeline import process_request, INTERRUPTED_NOTE
 
 st.set_page_config(page_title="Jarvis 챗봇", page_icon="🤖", layout="wide")
 
@@ -99,17 +105,76 @@ header, .st-emotion-cache-18ni7ap {
 </style>
 """, unsafe_allow_html=True)
 
+# "planner": decide_tools(JSON) -> 도구 실행 -> answer_with_tools, "function_calling": Gemini 함수 호출 한 대화로 처리
+AGENT_MODE = os.getenv("AGENT_MODE", "planner")
+
+# 1이면 마지막 요청의 구간별 소요 시간(워터폴)과 Prometheus 메트릭을 화면 하단에 표시
+TRACE_DEBUG_PANEL = os.getenv("TRACE_DEBUG_PANEL", "0") == "1"
+
+# LLM 응답을 조각 단위로 말풍선에 바로 표시 (첫 토큰까지의 대기 시간 단축)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") != "0"
+
+# 요청을 백그라운드 작업으로 실행하고 스크립트는 진행 상황만 폴링 (0이면 스크립트 스레드에서 직접 처리)
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "1") != "0"
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.3"))
+
+def render_waterfall(trace):
+    # 마지막 요청의 span을 시작 시각/길이 비율로 막대로 표시
+    rows = waterfall(trace)
+    total = max([start + duration for _, _, start, duration, _, _ in rows] + [1.0])
+    html = []
+    for depth, name, start, duration, status, attrs in rows:
+        left = start / total * 100
+        width = max(duration / total * 100, 0.3)
+        color = "#e06c75" if status == "error" else "#4f8cff"
+        detail = ", ".join(f"{k}={v}" for k, v in attrs.items())
+        html.append(
+            f'<div style="font-size:0.8em; margin:2px 0;">'
+            f'<div style="padding-left:{depth * 1.2}em;">{name} {duration:.0f}ms <span style="color:#888;">{detail}</span></div>'
+            f'<div style="background:#2a2d33; height:8px; position:relative;">'
+            f'<div style="position:absolute; left:{left:.2f}%; width:{width:.2f}%; height:8px; background:{color};"></div>'
+            f'</div></div>'
+        )
+    st.markdown("".join(html), unsafe_allow_html=True)
+
 def load_tools():
-    tools = {}
-    tools_dir = "tools"
-    if not os.path.isdir(tools_dir):
-        return tools
-    for fname in os.listdir(tools_dir):
-        if fname.endswith(".py") and not fname.startswith("__"):
-            modname = fname[:-3]
-            module = importlib.import_module(f"tools.{modname}")
-            tools[modname] = module
-    return tools
+    # TOOL_SPEC만 읽어 등록하고, 각 도구 모듈은 처음 실행할 때 import
+    return ToolRegistry()
+
+def render_artifacts(artifacts):
+    # [(도구 결과 텍스트, 산출물 목록), ...] 중 이미지 산출물 표시
+    for result, items in artifacts:
+        st.markdown(result)
+        for artifact in items:
+            if artifact["type"] == "image/png":
+                st.image(artifact["data"], caption=artifact.get("title"))
+
+def render_job_progress(container, snapshot, stage=None):
+    # 진행 중인 작업의 부분 답변과 현재 단계(기본: 마지막 진행 메시지) 표시
+    if stage is None:
+        stage = snapshot["events"][-1]["message"] if snapshot["events"] else ""
+    with container:
+        if snapshot["partial"]:
+            st.markdown(f'<div class="chat-bubble-bot">{snapshot["partial"]}▌</div>', unsafe_allow_html=True)
+        st.caption(f"⏳ {stage} · {snapshot['elapsed_s']:.1f}s")
+
+def finish_job(job):
+    # 끝난 작업의 답변을 히스토리에 한 번만 기록 (스크립트 스레드에서만 session_state를 변경)
+    snapshot = job.snapshot()
+    result = snapshot["result"] or {}
+    if snapshot["status"] == DONE:
+        st.session_state["history"].append(("model", result["answer"]))
+        st.session_state["last_artifacts"] = result["artifacts"]
+        st.session_state["notification"] = result["notification"]
+    elif snapshot["status"] == ERROR:
+        # 스트리밍 도중 오류가 나면 받은 부분까지 남기고 오류를 덧붙임
+        message = f"요청 처리 중 오류 발생: {snapshot['error']}"
+        partial = snapshot["partial"].strip()
+        st.session_state["history"].append(("model", f"{partial}\n\n({message})" if partial else message))
+        st.session_state["notification"] = "app.py에서 대기 중 (작업 오류)"
+    else:
+        st.session_state["history"].append(("model", snapshot["partial"].strip() + INTERRUPTED_NOTE))
+    st.session_state["job_id"] = None
 
 if "history" not in st.session_state:
     st.session_state["history"] = []
@@ -117,8 +182,17 @@ if "history" not in st.session_state:
 if "llm" not in st.session_state:
     st.session_state["llm"] = GeminiLLM()
 
+if "memory" not in st.session_state:
+    st.session_state["memory"] = ConversationMemory(st.session_state["llm"].summarize_history)
+
 if "tools" not in st.session_state:
     st.session_state["tools"] = load_tools()
+    # 등록된 도구의 명세만으로 플래너 프롬프트 구성 (도구 모듈 import 없음)
+    st.session_state["llm"].set_tool_specs(st.session_state["tools"].specs())
+
+if "session_id" not in st.session_state:
+    # 작업 큐의 사용자별 동시 실행 제한 단위
+    st.session_state["session_id"] = uuid.uuid4().hex
 
 if "notification" not in st.session_state:
     st.session_state["notification"] = "app.py에서 대기 중"
@@ -140,6 +214,7 @@ with chat_placeholder:
         else:
             st.markdown(f'<div class="chat-bubble-bot">{content}</div>', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
+    render_artifacts(st.session_state.get("last_artifacts", []))
 
 with st.form(key="chat_form", clear_on_submit=True):
     user_input = st.text_input(
@@ -152,88 +227,74 @@ with st.form(key="chat_form", clear_on_submit=True):
     submitted = st.form_submit_button("보내기", use_container_width=True)
 
 if submitted and user_input.strip():
+    # 진행 중인 스트리밍 응답이 있으면 중단
+    if st.session_state.get("cancel_event"):
+        st.session_state["cancel_event"].set()
+    # 진행 중인 작업이 있으면 취소하고 지금까지의 부분 응답을 남김
+    running_job = job_queue.get(st.session_state.get("job_id"))
+    if running_job is not None:
+        job_queue.cancel(running_job.id)
+        finish_job(running_job)
+    st.session_state["last_artifacts"] = []
     st.session_state["history"].append(("user", user_input))
     st.session_state["notification"] = "app.py: LLM이 도구 판단 중..."
     st.rerun()
 
-if st.session_state["history"] and st.session_state["history"][-1][0] == "user":
-    llm = st.session_state["llm"]
+if (
+    BACKGROUND_JOBS and not st.session_state.get("job_id")
+    and st.session_state["history"] and st.session_state["history"][-1][0] == "user"
+):
     user_input = st.session_state["history"][-1][1]
-    tool_intents = llm.decide_tools(user_input)
-    st.write("LLM 반환 tool_intents:", tool_intents)
-    tool_results = []
-    for intent in tool_intents:
-        tool_name = intent.get("tool")
-        if tool_name and tool_name in st.session_state["tools"] and tool_name != "none":
-            st.session_state["notification"] = f"app.py: {tool_name}.py 실행 중"
-            tool_module = st.session_state["tools"][tool_name]
-            if tool_name == "stock":
-                param = intent.get("ticker")
-                chart_flag = intent.get("chart", True)
-                tool_result = tool_module.run(
-                    query=user_input,
-                    ticker=param,
-                    start=intent.get("start"),
-                    end=intent.get("end"),
-                    interval=intent.get("interval"),
-                    ma_window=intent.get("ma_window", 5),
-                    rsi_window=intent.get("rsi_window", 14),
-                    summary=intent.get("summary", True),
-                    chart=chart_flag
-                )
-                if "[차트 이미지(base64)]:" in tool_result:
-                    text, img_line = tool_result.split("[차트 이미지(base64)]:", 1)
-                    st.markdown(text)
-                    chart_img = img_line.strip()
-                    st.image("data:image/png;base64," + chart_img)
-                    tool_result = text
-            elif tool_name == "news":
-                param = intent.get("keyword")
-                tool_result = tool_module.run(query=param)
-            elif tool_name == "tavily":
-                param = intent.get("query")
-                tool_result = tool_module.run(query=param)
-            elif tool_name == "serp":
-                param = intent.get("query")
-                search_type = intent.get("search_type", "web")
-                tool_result = tool_module.run(
-                    query=param,
-                    search_type=search_type
-                )
-            elif tool_name == "mongo":
-                action = intent.get("action")
-                db_name = intent.get("db_name")
-                coll_name = intent.get("coll_name")
-                query_param = intent.get("query")
-                data_param = intent.get("data")
-                update_param = intent.get("update")
-                many_param = intent.get("many", False)
-                object_id_param = intent.get("object_id")
-                projection_param = intent.get("projection")
-                tool_result = tool_module.run(
-                    action=action,
-                    db_name=db_name,
-                    coll_name=coll_name,
-                    query=query_param,
-                    data=data_param,
-                    update=update_param,
-                    many=many_param,
-                    object_id=object_id_param,
-                    projection=projection_param
-                )
-            else:
-                param = None
-                tool_result = "지원하지 않는 도구입니다."
-            tool_results.append({"tool": tool_name, "param": param if tool_name != "mongo" else intent, "result": tool_result})
-            st.session_state["notification"] = f"{tool_name}.py 실행 완료, app.py로 복귀"
-    if tool_results:
-        tools_used = ', '.join(set([tr['tool'] for tr in tool_results]))
-        summary = llm.answer_with_tools(user_input, tool_results)
-        display_text = f"[사용된 도구: {tools_used}]\n\n{summary}"
-        st.session_state["history"].append(("model", display_text))
+    # 현재 질문을 제외한 대화를 요약 + 최근 대화 창으로 압축해 전달 (직접 답변용)
+    history = st.session_state["memory"].context(st.session_state["history"][:-1])
+    job = job_queue.submit(
+        st.session_state["session_id"], process_request,
+        st.session_state["llm"], st.session_state["tools"], user_input, history,
+        agent_mode=AGENT_MODE, stream=STREAM_RESPONSES, label=user_input[:40],
+    )
+    st.session_state["job_id"] = job.id
+
+if BACKGROUND_JOBS and st.session_state.get("job_id"):
+    job = job_queue.get(st.session_state["job_id"])
+    if job is None:
+        st.session_state["job_id"] = None
+    elif job.done:
+        finish_job(job)
+        st.rerun()
     else:
-        st.session_state["notification"] = "app.py: LLM 직접 답변"
-        response = llm.answer_direct(user_input, history=st.session_state["history"])
-        st.session_state["history"].append(("model", response))
-        st.session_state["notification"] = "app.py에서 대기 중"
+        # 작업 스레드가 남긴 진행 상황과 부분 답변을 표시하고 잠시 뒤 다시 확인
+        snapshot = job.snapshot()
+        stage = None
+        if snapshot["status"] == QUEUED:
+            stats = job_queue.stats()
+            stage = f"대기 중 (실행 {stats['running']}/{stats['max_concurrent']}, 대기 {stats['queued']})"
+        render_job_progress(chat_placeholder, snapshot, stage)
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+
+if not BACKGROUND_JOBS and st.session_state["history"] and st.session_state["history"][-1][0] == "user":
+    # 작업 큐 없이 스크립트 스레드에서 같은 처리 흐름(process_request)을 실행하고, 갱신될 때마다 바로 그림
+    user_input = st.session_state["history"][-1][1]
+    history = st.session_state["memory"].context(st.session_state["history"][:-1])
+    with chat_placeholder:
+        progress = st.empty()
+    job = Job(
+        st.session_state["session_id"], process_request,
+        (st.session_state["llm"], st.session_state["tools"], user_input, history),
+        dict(agent_mode=AGENT_MODE, stream=STREAM_RESPONSES), label=user_input[:40],
+        on_update=lambda job: render_job_progress(progress.container(), job.snapshot()),
+    )
+    st.session_state["cancel_event"] = job.cancel_event
+    try:
+        run_job(job)
+    finally:
+        # 새 메시지 제출로 스크립트가 중단되어도 지금까지의 부분 답변을 히스토리에 남김
+        st.session_state["cancel_event"] = None
+        finish_job(job)
     st.rerun()
+
+if TRACE_DEBUG_PANEL and recent_traces:
+    last_trace = recent_traces[-1]
+    with st.expander(f"마지막 요청 트레이스 ({last_trace.to_dict()['duration_ms']:.0f}ms)"):
+        render_waterfall(last_trace)
+        st.code(metrics.prometheus_text(), language="text")
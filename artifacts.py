@@ -0,0 +1,15 @@
+class ToolOutput(str):
+    """
+    도구 결과 텍스트(str) + 텍스트와 분리된 바이너리 산출물(차트 이미지 등)
+    LLM 프롬프트에는 텍스트만 들어가고, 산출물은 UI에서만 사용
+    artifacts: [{"type": "image/png", "data": bytes, "title": str}, ...]
+    """
+    def __new__(cls, text, artifacts=None):
+        obj = super().__new__(cls, text)
+        obj.artifacts = list(artifacts or [])
+        return obj
+
+
+def split_artifacts(result):
+    # (텍스트, 산출물 목록)으로 분리
+    return str(result), list(getattr(result, "artifacts", []))
@@ -0,0 +1,107 @@
+# benchmarks/agent_modes.py
+# 기존 2단계 파이프라인(decide_tools -> answer_with_tools)과 함수 호출 모드(run_agent)를 비교
+# 실제 Gemini/도구 API를 호출하므로 GOOGLE_API_KEY 등 각 도구의 키가 필요
+#   python benchmarks/agent_modes.py --tools stock,news --repeat 3
+import os
+import sys
+import time
+import argparse
+import importlib
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import GeminiLLM
+from executor import execute_intents
+
+SAMPLE_PROMPTS = [
+    "AAPL 주가",
+    "삼성전자와 애플의 최근 3개월 주가를 비교해줘",
+    "최신 AI 뉴스 요약해줘",
+    "파이썬에서 리스트와 튜플의 차이는?",
+]
+
+
+class CountingModel:
+    # generate_content 호출 횟수를 세는 래퍼 (LLM 왕복 횟수 측정용)
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+
+    def generate_content(self, *args, **kwargs):
+        self.calls += 1
+        return self.model.generate_content(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def load_tools(names):
+    tools = {}
+    for name in names:
+        try:
+            tools[name] = importlib.import_module(name)
+        except Exception as e:
+            print(f"도구 로드 실패: {name} ({e})")
+    return tools
+
+
+def run_planner(llm, tools, user_input):
+    counter = CountingModel(llm.model)
+    llm.model = counter
+    try:
+        intents = llm.decide_tools(user_input, use_cache=False)
+        if intents and intents[0].get("tool") != "none":
+            tool_results = execute_intents(tools, intents, user_input)
+            llm.answer_with_tools(user_input, tool_results)
+        else:
+            llm.answer_direct(user_input)
+    finally:
+        llm.model = counter.model
+    return counter.calls
+
+
+def run_function_calling(llm, tools, user_input):
+    llm.run_agent(user_input, lambda intents: execute_intents(tools, intents, user_input))
+    return llm.last_round_trips
+
+
+def measure(fn, llm, tools, prompt, repeat):
+    latencies, trips = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            trips.append(fn(llm, tools, prompt))
+        except Exception as e:
+            print(f"  오류: {e}")
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="planner vs function_calling 모드 비교")
+    parser.add_argument("--tools", default="stock,news,tavily,serp")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("prompts", nargs="*")
+    args = parser.parse_args()
+
+    tools = load_tools([name for name in args.tools.split(",") if name])
+    llm = GeminiLLM()
+    llm.set_tool_specs([tool.TOOL_SPEC for tool in tools.values() if hasattr(tool, "TOOL_SPEC")])
+
+    print(f"{'모드':<18}{'LLM 호출':>10}{'p50(s)':>10}{'최대(s)':>10}  질문")
+    for prompt in args.prompts or SAMPLE_PROMPTS:
+        for mode, fn in (("planner", run_planner), ("function_calling", run_function_calling)):
+            latencies, trips = measure(fn, llm, tools, prompt, args.repeat)
+            if not latencies:
+                print(f"{mode:<18}{'-':>10}{'-':>10}{'-':>10}  {prompt}")
+                continue
+            print(
+                f"{mode:<18}{statistics.mean(trips):>10.1f}"
+                f"{statistics.median(latencies):>10.2f}{max(latencies):>10.2f}  {prompt}"
+            )
+
+
+if __name__ == "__main__":
+    main()
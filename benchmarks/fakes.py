@@ -0,0 +1,267 @@
+# benchmarks/fakes.py
+# 오프라인 벤치마크용 대역: Gemini, yfinance, MongoDB, serp/tavily/news API를 결정적인 가짜 응답으로 대체
+# install()은 도구/LLM 모듈을 import하기 전에 호출해야 함
+import os
+import re
+import sys
+import json
+import time
+import types
+import zlib
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# 외부 호출별 가짜 지연(초), install(latency=...)로 조정
+DEFAULT_LATENCY = {
+    "gemini": 0.05,        # generate_content 1회
+    "gemini_chunk": 0.005, # 조각(CHUNK_CHARS자) 하나를 생성하는 시간
+    "yfinance": 0.03,
+    "serp": 0.04,
+    "tavily": 0.06,
+    "news": 0.03,
+    "translate": 0.02,
+}
+LATENCY = dict(DEFAULT_LATENCY)
+CHUNK_CHARS = 40
+
+# 사용자 입력 -> 플래너가 돌려줄 도구 계획 (시나리오에 없는 입력은 직접 답변)
+SCRIPTED_PLANS = {}
+PLANNER_REQUEST_RE = re.compile(r"다음은 사용자의 요청입니다:\n(.*)\n")
+
+
+def sleep(kind):
+    seconds = LATENCY.get(kind, 0.0)
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+# --- yfinance ---
+
+def synthetic_ohlcv(tickers, start, end, interval="1d", seed=0):
+    """
+    종목별 고정 시드 랜덤 워크 OHLCV (컬럼: (필드, 티커) 멀티인덱스, yfinance 기본 형식과 동일)
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    if interval in ("1d", "5d"):
+        index = pd.bdate_range(start, end - timedelta(days=1))
+    elif interval == "1wk":
+        index = pd.date_range(start, end - timedelta(days=1), freq="W-MON")
+    elif interval == "1mo":
+        index = pd.date_range(start, end - timedelta(days=1), freq="MS")
+    else:
+        minutes = int(re.sub(r"\D", "", interval) or 1) * (60 if interval.endswith("h") else 1)
+        index = pd.date_range(start, end, freq=f"{minutes}min", inclusive="left", tz="America/New_York")
+    frames = {}
+    for ticker in tickers:
+        rng = np.random.default_rng(seed + zlib.crc32(ticker.encode()))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+        open_ = close * (1 + rng.normal(0, 0.003, len(index)))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, len(index))))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, len(index))))
+        volume = rng.integers(1_000_000, 5_000_000, len(index)).astype(np.float64)
+        for field, values in (("Close", close), ("High", high), ("Low", low), ("Open", open_), ("Volume", volume)):
+            frames[(field, ticker)] = values
+    data = pd.DataFrame(frames, index=index)
+    data.columns = pd.MultiIndex.from_tuples(data.columns, names=["Price", "Ticker"])
+    data.index.name = "Date"
+    return data
+
+
+def fake_download(tickers, start=None, end=None, interval="1d", progress=False, **kwargs):
+    sleep("yfinance")
+    start = start or (datetime.now() - timedelta(days=30)).date().isoformat()
+    end = end or datetime.now().date().isoformat()
+    return synthetic_ohlcv(tickers, start, end, interval)
+
+
+# --- 검색 API ---
+
+def canned_items(query, n, kind):
+    return [
+        {
+            "title": f"{query} {kind} 결과 {i}",
+            "link": f"https://example.com/{kind}/{zlib.crc32(query.encode())}/{i}",
+            "snippet": f"{query}에 대한 {kind} 설명 {i}. " * 3,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def fake_serp_get_json(url, params=None, **kwargs):
+    sleep("serp")
+    query = (params or {}).get("q", "")
+    items = canned_items(query, 10, "web")
+    return {
+        "organic_results": items,
+        "news_results": canned_items(query, 10, "news"),
+        "answer_box": {"answer": f"{query} 즉답"},
+        "related_questions": [{"question": f"{query} 관련 질문 {i}"} for i in range(4)],
+    }
+
+
+def fake_tavily_post_json(url, payload=None, **kwargs):
+    sleep("tavily")
+    query = (payload or {}).get("query", "")
+    results = [
+        {"title": item["title"], "url": item["link"], "content": item["snippet"]}
+        for item in canned_items(query, (payload or {}).get("max_results", 5), "web")
+    ]
+    return {"results": results, "answer": f"{query} 요약"}
+
+
+class FakeNewsApiClient:
+    def __init__(self, api_key=None, session=None):
+        self.api_key = api_key
+
+    def articles(self, q):
+        return [
+            {
+                "title": item["title"], "description": item["snippet"],
+                "source": {"name": "Bench News"}, "url": item["link"],
+            }
+            for item in canned_items(q or "headline", 5, "news")
+        ]
+
+    def get_top_headlines(self, q=None, **kwargs):
+        sleep("news")
+        # 헤드라인은 비어 있어 전체 검색 fallback 경로를 타도록 함
+        return {"status": "ok", "articles": [] if q else self.articles(q)}
+
+    def get_everything(self, q=None, **kwargs):
+        sleep("news")
+        return {"status": "ok", "articles": self.articles(q)}
+
+
+class FakeTranslator:
+    def translate(self, text, src="ko", dest="en"):
+        sleep("translate")
+        return types.SimpleNamespace(text=f"en({text})")
+
+
+# --- Gemini ---
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    플래너 요청이면 SCRIPTED_PLANS의 계획을 JSON(코드블록 포함)으로, 그 외에는 고정 답변을 반환
+    """
+    def __init__(self, model_name=None, tools=None, system_instruction=None, **kwargs):
+        self.model_name = model_name
+
+    @classmethod
+    def from_cached_content(cls, cached):
+        return cls()
+
+    def reply(self, contents):
+        prompt = contents[-1]["parts"][0] if isinstance(contents, list) else str(contents)
+        request = PLANNER_REQUEST_RE.search(prompt)
+        if request:
+            plan = SCRIPTED_PLANS.get(request.group(1).strip(), [{"tool": "none"}])
+            return "```json\n" + json.dumps(plan, ensure_ascii=False) + "\n```"
+        return "벤치마크용 답변입니다. " * 20
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        sleep("gemini")
+        text = self.reply(contents)
+        if not stream:
+            # 스트리밍이 아니면 전체 생성이 끝날 때까지 기다린 뒤 한 번에 반환
+            for _ in range(0, len(text), CHUNK_CHARS):
+                sleep("gemini_chunk")
+            return FakeResponse(text)
+        return self.stream(text)
+
+    def stream(self, text):
+        for i in range(0, len(text), CHUNK_CHARS):
+            sleep("gemini_chunk")
+            yield FakeResponse(text[i:i + CHUNK_CHARS])
+
+
+def fake_genai_module():
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.protos = types.SimpleNamespace(Part=dict, FunctionResponse=dict, Content=dict)
+    return genai
+
+
+def install_modules():
+    # 실제 SDK가 설치되어 있어도 네트워크 호출이 없도록 항상 가짜 모듈을 사용
+    try:
+        # google.protobuf 등 다른 google.* 패키지가 계속 동작하도록 실제 네임스페이스 패키지를 유지
+        import google
+    except ImportError:
+        google = types.ModuleType("google")
+        google.__path__ = []
+        sys.modules["google"] = google
+    genai = fake_genai_module()
+    sys.modules["google.generativeai"] = genai
+    google.generativeai = genai
+    sys.modules["newsapi"] = types.SimpleNamespace(NewsApiClient=FakeNewsApiClient)
+    sys.modules["googletrans"] = types.SimpleNamespace(Translator=FakeTranslator)
+
+
+# --- MongoDB ---
+
+def seed_collection(collection, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    base = datetime(2024, 1, 1)
+    collection.insert_many([
+        {
+            "name": f"user{i}",
+            "age": int(rng.integers(10, 80)),
+            "city": ["서울", "부산", "대구", "인천"][i % 4],
+            "created_at": base + timedelta(minutes=int(i)),
+            "tags": [f"t{j}" for j in range(i % 5)],
+        }
+        for i in range(n)
+    ])
+
+
+def install_mongo(mongo, docs=2000):
+    import mongomock
+    client = mongomock.MongoClient()
+    seed_collection(client["bench"]["users"], docs)
+    mongo.MONGODB_URI = "mongodb://bench"
+    mongo.client_manager.uri = mongo.MONGODB_URI
+    mongo.client_manager._client = client
+    return client
+
+
+def install(latency=None, mongo_docs=2000):
+    """
+    가짜 대역을 설치하고 {도구 이름: 모듈} 을 반환
+    latency: {"gemini": 0.1, ...} 기본 지연 덮어쓰기
+    """
+    LATENCY.clear()
+    LATENCY.update(DEFAULT_LATENCY)
+    LATENCY.update(latency or {})
+    os.environ.setdefault("JARVIS_CACHE_DIR", tempfile.mkdtemp(prefix="jarvis-bench-"))
+    # 가짜 대역은 현재 프로세스에만 설치되므로 도구를 프로세스 풀로 보내지 않음
+    os.environ["PROCESS_TOOLS"] = ""
+    for key in ("GOOGLE_API_KEY", "SERPAPI_API_KEY", "TAVILY_API_KEY", "NEWS_API_KEY"):
+        os.environ.setdefault(key, "bench")
+    install_modules()
+
+    import price_store
+    import stock
+    import serp
+    import tavily
+    import news
+    import mongo
+
+    price_store.yf.download = fake_download
+    serp.get_json = fake_serp_get_json
+    tavily.post_json = fake_tavily_post_json
+    tavily.api_key = "bench"
+    news.NEWS_API_KEY = "bench"
+    install_mongo(mongo, mongo_docs)
+    return {"stock": stock, "serp": serp, "tavily": tavily, "news": news, "mongo": mongo}
@@ -0,0 +1,304 @@
+# benchmarks/run.py
+# 오프라인 벤치마크: API 키/네트워크 없이 가짜 대역으로 마이크로벤치마크와 요청 단위 지연(p50/p95)을 측정
+#   python benchmarks/run.py                     # 측정 후 baseline.json과 비교 (회귀 시 종료 코드 1)
+#   python benchmarks/run.py --save-baseline     # 현재 결과를 기준값으로 저장
+#   python benchmarks/run.py --latency gemini=0.2,serp=0.1 --only e2e
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fakes
+
+# 한글 폰트가 없는 환경의 글리프 경고는 측정과 무관하므로 숨김
+warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+# 기준값 대비 이 비율 이상 느려지면 회귀로 판단 (짧은 측정값의 잡음을 고려해 절대 허용치도 함께 적용)
+DEFAULT_TOLERANCE = 0.3
+MIN_REGRESSION_MS = 2.0
+
+E2E_SCENARIOS = [
+    ("stock", "애플 최근 1년 주가 흐름 분석해줘", [
+        {"tool": "stock", "ticker": "AAPL", "start": "2024-01-01", "end": "2025-01-01", "summary": True, "chart": True},
+    ]),
+    ("stock_compare", "삼성전자와 애플 주가 비교", [
+        {"tool": "stock", "ticker": ["005930.KS", "AAPL"], "start": "2024-01-01", "end": "2025-01-01"},
+    ]),
+    ("search", "AI 반도체 최신 동향 알려줘", [
+        {"tool": "news", "keyword": "AI 반도체"},
+        {"tool": "serp", "query": "AI 반도체 동향", "search_type": "web,news,answer_box"},
+        {"tool": "tavily", "query": "AI 반도체 동향"},
+    ]),
+    ("mongo", "서울 사는 사용자 나이순으로 보여줘", [
+        {"tool": "mongo", "action": "find", "db_name": "bench", "coll_name": "users",
+         "query": {"city": "서울"}, "sort": {"age": -1}, "limit": 50},
+    ]),
+    ("direct", "파이썬 제너레이터 설명해줘", None),
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(samples):
+    ms = [s * 1000 for s in samples]
+    return {
+        "p50": round(percentile(ms, 0.5), 3),
+        "p95": round(percentile(ms, 0.95), 3),
+        "mean": round(statistics.mean(ms), 3),
+        "n": len(ms),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    """
+    fn의 소요 시간과 함께, 매 반복 직후의 보정 작업 시간(calibration, p50 ms)을 기록
+    같은 순간의 기계 속도를 재므로 다른 기계나 부하가 바뀐 구간에서도 기준값을 비율로 환산할 수 있음
+    """
+    for _ in range(warmup):
+        fn()
+        calibration_workload()
+    samples = []
+    calibration = []
+    for _ in range(repeat):
+        samples.append(timed(fn))
+        calibration.append(timed(calibration_workload))
+    return dict(summarize(samples), calibration=summarize(calibration)["p50"])
+
+
+_calibration_input = None
+
+
+def calibration_workload():
+    # 코드 변경과 무관한 고정 CPU 작업 (파이썬 정렬/직렬화 + NumPy 정렬, 수 ms)
+    global _calibration_input
+    if _calibration_input is None:
+        import random
+        import numpy as np
+        rng = random.Random(0)
+        values = [rng.random() for _ in range(20_000)]
+        _calibration_input = (values, np.array(values))
+    values, array = _calibration_input
+    sorted(values)
+    json.dumps(values[:4_000])
+    array.copy().sort()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def micro_benchmarks(repeat):
+    import json as jsonlib
+    import stock
+    import charts
+    import mongo
+    from indicators import IndicatorEngine
+    from compaction import compact_tool_results
+    from dedup import merge_search_results
+
+    data = fakes.synthetic_ohlcv("AAPL", "2015-01-01", "2025-01-01").xs("AAPL", axis=1, level=1)
+    close = stock.get_close_series(data)
+    ma = stock.moving_average(close, 5)
+    rsi = stock.rsi_from_close(close, 14)
+    big = fakes.synthetic_ohlcv("AAPL", "2024-01-01", "2024-01-12", "1m").xs("AAPL", axis=1, level=1)
+    full_spec = {"sma": [5, 20, 60], "ema": [12, 26], "rsi": 14, "macd": (12, 26, 9),
+                 "bollinger": (20, 2.0), "atr": 14, "volume_ma": 20}
+    collection = mongo.get_collection("bench", "users")
+    docs = list(collection.find().limit(500))
+    search_results = [
+        {"tool": "serp", "param": "q", "result": fakes_text("serp"), "elapsed": 0.0},
+        {"tool": "tavily", "param": "q", "result": fakes_text("tavily"), "elapsed": 0.0},
+        {"tool": "news", "param": "q", "result": fakes_text("news"), "elapsed": 0.0},
+    ]
+    table_text = "\n".join(stock.format_price_table(data, ma, rsi))
+    stock_result = [{"tool": "stock", "param": "AAPL", "result": table_text}] + search_results
+
+    cases = {
+        "stock.format_price_table[2.5k rows]": lambda: stock.format_price_table(data, ma, rsi),
+        "stock.moving_average+rsi[2.5k rows]": lambda: (stock.moving_average(close, 5), stock.rsi_from_close(close, 14)),
+        "indicators.compute[full spec, 16k bars]": lambda: IndicatorEngine(full_spec).compute(
+            big["Close"].to_numpy(), high=big["High"].to_numpy(), low=big["Low"].to_numpy(),
+            volume=big["Volume"].to_numpy()),
+        "charts.render_price_chart[2.5k rows]": lambda: charts.render_price_chart(
+            data.index, close.to_numpy(), ma.to_numpy(), rsi.to_numpy(), "AAPL"),
+        "mongo.json_dumps[500 docs]": lambda: jsonlib.dumps(docs, ensure_ascii=False, indent=2, default=str),
+        "compaction.compact_tool_results": lambda: compact_tool_results(stock_result, 3000),
+        "dedup.merge_search_results": lambda: merge_search_results(search_results, "AI 반도체 동향"),
+    }
+    results = {}
+    for name, fn in cases.items():
+        # 차트 렌더링은 느리므로 반복 횟수를 줄임
+        n = max(repeat // 5, 3) if name.startswith("charts.") else repeat
+        results[name] = measure(fn, n)
+        print_row(name, results[name])
+    return results
+
+
+def fakes_text(tool):
+    # 검색 도구 출력 형식의 텍스트 (dedup/compaction 입력용)
+    items = fakes.canned_items("AI 반도체 동향", 10, tool)
+    if tool == "serp":
+        return "\n\n".join(f"{i}. {it['title']}\n{it['snippet']}\n{it['link']}" for i, it in enumerate(items, 1))
+    return "\n\n".join(f"{i}. {it['title']}\n- 요약: {it['snippet']}\n- 링크: {it['link']}" for i, it in enumerate(items, 1))
+
+
+def reset_caches():
+    # 매 요청을 콜드 경로로 측정 (외부 응답/차트/지표/시세 캐시 비움)
+    import price_store
+    from response_cache import response_cache
+    from charts import render_cache
+    from indicators import indicator_cache
+    response_cache.clear()
+    with render_cache.lock:
+        render_cache.entries.clear()
+    with indicator_cache.lock:
+        indicator_cache.entries.clear()
+    price_store.clear()
+
+
+def run_turn(llm, tools, user_input):
+    from executor import execute_intents
+    # 앱과 같이 플래너 스트림에서 완성된 intent부터 바로 실행
+    tool_results = execute_intents(tools, llm.iter_tools(user_input, use_cache=False), user_input)
+    if tool_results:
+        return "".join(llm.stream_with_tools(user_input, tool_results))
+    return "".join(llm.stream_direct(user_input))
+
+
+def e2e_benchmarks(tools, turns, warm):
+    from llm import GeminiLLM
+    llm = GeminiLLM()
+    llm.set_tool_specs([tool.TOOL_SPEC for tool in tools.values()])
+    for _, user_input, plan in E2E_SCENARIOS:
+        if plan is not None:
+            fakes.SCRIPTED_PLANS[user_input] = plan
+
+    results = {}
+    all_samples = []
+    all_calibration = []
+    for name, user_input, _ in E2E_SCENARIOS:
+        run_turn(llm, tools, user_input)  # import/커넥션 예열
+        samples = []
+        calibration = []
+        for _ in range(turns):
+            if not warm:
+                reset_caches()
+            samples.append(timed(lambda: run_turn(llm, tools, user_input)))
+            calibration.append(timed(calibration_workload))
+        key = f"e2e.{name}"
+        results[key] = dict(summarize(samples), calibration=summarize(calibration)["p50"])
+        all_samples.extend(samples)
+        all_calibration.extend(calibration)
+        print_row(key, results[key])
+    results["e2e.all"] = dict(summarize(all_samples), calibration=summarize(all_calibration)["p50"])
+    print_row("e2e.all", results["e2e.all"])
+    return results
+
+
+def print_row(name, stats, baseline=None, flag=""):
+    base = f"{baseline['p50']:>10.2f}" if baseline else f"{'-':>10}"
+    print(f"{name:<44}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{base}  {flag}")
+
+
+def speed_ratio(stats, base):
+    # 이 항목을 잴 때 기계가 기준값을 잴 때보다 몇 배 느렸는지 (보정값이 없는 이전 기준값이면 1.0)
+    if not stats.get("calibration") or not base.get("calibration"):
+        return 1.0
+    return stats["calibration"] / base["calibration"]
+
+
+def compare(results, baseline, tolerance):
+    """
+    기준값을 항목별 보정 비율로 이번 환경에 맞게 환산한 뒤 비교 (기준p50 열은 환산된 값)
+    e2e는 가짜 지연(sleep)이 대부분이라 기계가 빨라져도 줄지 않으므로 느려지는 방향으로만 환산
+    """
+    regressions = []
+    print(f"\n{'항목':<44}{'p50(ms)':>10}{'p95(ms)':>10}{'기준p50':>10}")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        flag = ""
+        if base:
+            ratio = speed_ratio(stats, base)
+            scale = max(ratio, 1.0) if name.startswith("e2e.") else ratio
+            base = dict(base, p50=base["p50"] * scale)
+            limit = base["p50"] * (1 + tolerance)
+            if stats["p50"] > limit and stats["p50"] - base["p50"] > MIN_REGRESSION_MS:
+                flag = f"회귀 (+{(stats['p50'] / base['p50'] - 1) * 100:.0f}%)"
+                regressions.append(name)
+            elif stats["p50"] < base["p50"] / (1 + tolerance):
+                flag = f"개선 ({(stats['p50'] / base['p50'] - 1) * 100:.0f}%)"
+        print_row(name, stats, base, flag)
+    return regressions
+
+
+def parse_latency(text):
+    latency = {}
+    for pair in filter(None, (text or "").split(",")):
+        key, value = pair.split("=")
+        latency[key.strip()] = float(value)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jarvis 오프라인 벤치마크")
+    parser.add_argument("--only", choices=["micro", "e2e"])
+    parser.add_argument("--repeat", type=int, default=30, help="마이크로벤치마크 반복 횟수")
+    parser.add_argument("--turns", type=int, default=10, help="시나리오별 요청 횟수")
+    parser.add_argument("--latency", default="", help="가짜 지연(초) 덮어쓰기 예: gemini=0.2,serp=0.1")
+    parser.add_argument("--warm", action="store_true", help="요청 사이에 캐시를 비우지 않음")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    tools = fakes.install(parse_latency(args.latency))
+    print(f"{'항목':<44}{'p50(ms)':>10}{'p95(ms)':>10}")
+    results = {}
+    if args.only in (None, "micro"):
+        results.update(micro_benchmarks(args.repeat))
+    if args.only in (None, "e2e"):
+        results.update(e2e_benchmarks(tools, args.turns, args.warm))
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n기준값 저장: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("\n기준값 파일이 없습니다. --save-baseline으로 먼저 저장하세요.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n회귀 {len(regressions)}건: {', '.join(regressions)}")
+        return 1
+    print("\n회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
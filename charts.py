@@ -0,0 +1,149 @@
+import io
+import threading
+from collections import OrderedDict
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from tracing import span, annotate
+
+# 차트 렌더링: pyplot 전역 상태 없이 Figure/Agg 캔버스를 직접 사용
+FIG_WIDTH_IN = 10
+DPI = 100
+CACHE_SIZE = 64
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 다운샘플링
+    선의 모양(고점/저점)을 유지하면서 점 개수를 threshold개로 줄임
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    bucket = (n - 2) / (threshold - 2)
+    idx = np.empty(threshold, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        next_start = end
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+def downsample(index, values, threshold):
+    # 결측값을 제외하고 화면 픽셀 폭에 맞춰 줄임 (x는 datetime64 -> 정수로 변환해 계산)
+    values = np.asarray(values, dtype=np.float64)
+    if getattr(index, "tz", None) is not None:
+        # 분봉 등 시간대 정보가 있는 인덱스는 현지 시각 기준으로 표시
+        index = index.tz_localize(None)
+    x = np.asarray(index)
+    mask = ~np.isnan(values)
+    x, values = x[mask], values[mask]
+    if len(values) <= threshold:
+        return x, values
+    if np.issubdtype(x.dtype, np.datetime64):
+        xi = x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    else:
+        xi = x.astype(np.float64)
+    xs, ys = lttb(xi, values, threshold)
+    picked = np.searchsorted(xi, xs)
+    return x[picked], ys
+
+
+def figure_to_png(fig):
+    buf = io.BytesIO()
+    FigureCanvasAgg(fig)
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+
+def render_price_chart(index, close, ma, rsi, title, ma_window=5, rsi_window=14):
+    fig = Figure(figsize=(FIG_WIDTH_IN, 6), dpi=DPI)
+    threshold = FIG_WIDTH_IN * DPI
+    ax1 = fig.add_subplot(1, 1, 1)
+    ax1.plot(*downsample(index, close, threshold), label='종가', color='blue')
+    ax1.plot(*downsample(index, ma, threshold), label=f'MA({ma_window})', color='orange')
+    ax1.set_xlabel('날짜')
+    ax1.set_ylabel('가격')
+    ax1.legend(loc='upper left')
+    ax2 = ax1.twinx()
+    ax2.plot(*downsample(index, rsi, threshold), label=f'RSI({rsi_window})', color='green')
+    ax2.axhline(70, color='red', linestyle='--', linewidth=0.7)
+    ax2.axhline(30, color='red', linestyle='--', linewidth=0.7)
+    ax2.set_ylabel('RSI')
+    ax2.legend(loc='upper right')
+    ax1.set_title(title)
+    return figure_to_png(fig)
+
+
+def render_comparison_chart(index, rebased, rsi, title, rsi_window=14):
+    """
+    rebased, rsi: {ticker: 값 배열}
+    """
+    fig = Figure(figsize=(FIG_WIDTH_IN, 8), dpi=DPI)
+    threshold = FIG_WIDTH_IN * DPI
+    gs = fig.add_gridspec(2, 1, height_ratios=[3, 1])
+    ax1 = fig.add_subplot(gs[0])
+    ax2 = fig.add_subplot(gs[1], sharex=ax1)
+    for ticker, values in rebased.items():
+        ax1.plot(*downsample(index, values, threshold), label=ticker)
+    ax1.set_ylabel('상대 가격(시작=100)')
+    ax1.legend(loc='upper left')
+    for ticker, values in rsi.items():
+        ax2.plot(*downsample(index, values, threshold), label=ticker, linewidth=0.8)
+    ax2.axhline(70, color='red', linestyle='--', linewidth=0.7)
+    ax2.axhline(30, color='red', linestyle='--', linewidth=0.7)
+    ax2.set_ylabel(f'RSI({rsi_window})')
+    ax2.set_xlabel('날짜')
+    ax1.set_title(title)
+    return figure_to_png(fig)
+
+
+class RenderCache:
+    """
+    (ticker, 기간, interval, 지표 기간, 데이터 지문) -> PNG bytes LRU 캐시
+    """
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                annotate(chart_cache="hit")
+                return self.entries[key]
+            self.misses += 1
+        with span("chart_render") as s:
+            png = render()
+            s.attrs["png_bytes"] = len(png)
+        with self.lock:
+            self.entries[key] = png
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return png
+
+
+render_cache = RenderCache()
+
+
+def data_fingerprint(index, close):
+    # 오늘 봉처럼 값이 바뀌는 경우 캐시를 다시 만들도록 길이/마지막 시각/마지막 값 포함
+    if not len(index):
+        return (0,)
+    return (len(index), str(index[-1]), repr(float(np.asarray(close, dtype=np.float64)[-1])))
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+
+# answer_with_tools 프롬프트에 넣기 전에 도구 결과를 토큰 예산에 맞춰 압축
+TOOL_TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", "6000"))
+SNIPPET_MAX_CHARS = 300
+ELLIPSIS = " ...(생략)"
+
+TABLE_ROW_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[ ,|]")
+
+
+def estimate_tokens(text):
+    # 토크나이저 호출 없이 근사: 영문/숫자는 약 4자당 1토큰, 한글 등은 약 1.5자당 1토큰
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return int((len(text) - non_ascii) / 4 + non_ascii / 1.5) + 1
+
+
+def truncate_to_tokens(text, budget):
+    if estimate_tokens(text) <= budget:
+        return text
+    # 이분 탐색으로 예산 안에 들어가는 최대 길이를 찾음
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) + estimate_tokens(ELLIPSIS) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + ELLIPSIS
+
+
+def allocate_budget(needs, budget):
+    """
+    도구별 필요 토큰(needs)에 대해 예산을 배분 (적게 필요한 도구는 필요한 만큼, 남는 몫은 나머지에 재분배)
+    """
+    shares = [0] * len(needs)
+    remaining = budget
+    pending = sorted(range(len(needs)), key=lambda i: needs[i])
+    while pending:
+        fair = remaining // len(pending)
+        i = pending[0]
+        if needs[i] <= fair:
+            shares[i] = needs[i]
+            remaining -= needs[i]
+            pending.pop(0)
+        else:
+            for j in pending:
+                shares[j] = fair
+            break
+    return shares
+
+
+def compact_stock(text, budget):
+    lines = text.split("\n")
+    rows = [i for i, line in enumerate(lines) if TABLE_ROW_RE.match(line)]
+    if not rows:
+        return truncate_to_tokens(text, budget)
+    head = lines[:rows[0]]
+    tail = lines[rows[-1] + 1:]
+    fixed = estimate_tokens("\n".join(head + tail))
+    row_tokens = max(estimate_tokens(lines[rows[0]]), 1)
+    keep = max((budget - fixed) // row_tokens - 1, 2)
+    if keep >= len(rows):
+        return text
+    # 시계열 표는 처음/끝과 최고/최저 종가 행, 그리고 등간격 샘플만 남김
+    picked = {rows[0], rows[-1]}
+    closes = []
+    for i in rows:
+        parts = re.split(r"\s*[|,]\s*", lines[i])
+        try:
+            closes.append((float(parts[1]), i))
+        except (IndexError, ValueError):
+            pass
+    if closes:
+        picked.add(max(closes)[1])
+        picked.add(min(closes)[1])
+    step = len(rows) / max(keep - len(picked), 1)
+    k = 0.0
+    while len(picked) < keep and int(k) < len(rows):
+        picked.add(rows[int(k)])
+        k += step
+    sampled = [lines[i] for i in sorted(picked)]
+    note = f"(전체 {len(rows)}행 중 {len(sampled)}행 샘플: 시작/끝/최고/최저 포함)"
+    return truncate_to_tokens("\n".join(head + sampled + [note] + tail), budget)
+
+
+def minify_json_block(text):
+    # "조회 결과(...):\n{json}" 형태의 JSON 부분을 공백 없이 다시 직렬화
+    header, sep, body = text.partition("\n")
+    marker = "\n\n다음 페이지 토큰"
+    body, tsep, token = body.partition(marker)
+    try:
+        data = json.loads(body)
+    except (ValueError, TypeError):
+        return text, None
+    minified = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    return header + sep + minified + tsep + token, data
+
+
+def compact_mongo(text, budget):
+    compact, data = minify_json_block(text)
+    if estimate_tokens(compact) <= budget or not isinstance(data, list):
+        return truncate_to_tokens(compact, budget)
+    header = text.split("\n", 1)[0]
+    # 문서를 덜어내면 기존 다음 페이지 토큰으로 이어 받을 때 빠진 문서를 건너뛰게 되므로 토큰은 버리고 안내를 남김
+    has_token = "\n\n다음 페이지 토큰" in compact
+    restart = " / 다음 페이지 토큰 생략: 이어서 보려면 더 작은 limit으로 처음부터 다시 조회하세요" if has_token else ""
+    docs = list(data)
+    while len(docs) > 1:
+        docs.pop()
+        body = json.dumps(docs, ensure_ascii=False, separators=(",", ":"), default=str)
+        candidate = f"{header}\n{body}\n(전체 {len(data)}건 중 {len(docs)}건 표시{restart})"
+        if estimate_tokens(candidate) <= budget:
+            return candidate
+    if has_token:
+        note = f"\n(일부만 표시{restart})"
+        body = compact.partition("\n\n다음 페이지 토큰")[0]
+        return truncate_to_tokens(body, max(budget - estimate_tokens(note), 1)) + note
+    return truncate_to_tokens(compact, budget)
+
+
+RANKED_ITEM_RE = re.compile(r"^\s*\d+\.\s")
+
+
+def normalize_key(text):
+    return re.sub(r"\W+", "", text.lower())[:80]
+
+
+def compact_search(text, budget):
+    """
+    검색 결과는 빈 줄로 구분된 항목 단위: 중복 제거 -> 스니펫 길이 제한 -> 순위가 낮은(뒤쪽) 번호 항목부터 제외
+    번호가 없는 항목([AI 요약], [Answer Box], 지식 그래프 등 요약 블록)은 정보가 가장 압축돼 있으므로 끝까지 유지
+    """
+    items = [item for item in text.split("\n\n") if item.strip()]
+    seen = set()
+    unique = []
+    for item in items:
+        first = item.strip().split("\n", 1)[0]
+        key = normalize_key(re.sub(r"^\d+\.\s*", "", first))
+        if key and key in seen:
+            continue
+        seen.add(key)
+        lines = [
+            line if len(line) <= SNIPPET_MAX_CHARS else line[:SNIPPET_MAX_CHARS] + "..."
+            for line in item.split("\n")
+        ]
+        unique.append(("\n".join(lines), not RANKED_ITEM_RE.match(first)))
+    while unique:
+        candidate = "\n\n".join(item for item, _ in unique)
+        ranked = [i for i, (_, pinned) in enumerate(unique) if not pinned]
+        if estimate_tokens(candidate) <= budget or not ranked or len(unique) == 1:
+            return truncate_to_tokens(candidate, budget)
+        unique.pop(ranked[-1])
+    return truncate_to_tokens(text, budget)
+
+
+COMPACTORS = {
+    "stock": compact_stock,
+    "mongo": compact_mongo,
+    "news": compact_search,
+    "tavily": compact_search,
+    "serp": compact_search,
+    "search": compact_search,
+}
+
+
+def compact_tool_results(tool_results, budget=TOOL_TOKEN_BUDGET):
+    """
+    도구 결과 목록을 전체 토큰 예산에 맞춰 압축한 새 목록을 반환 (원본은 변경하지 않음)
+    """
+    texts = [str(tr["result"]) for tr in tool_results]
+    # JSON 들여쓰기 제거는 정보 손실이 없으므로 항상 적용
+    texts = [
+        minify_json_block(text)[0] if tr["tool"] == "mongo" else text
+        for tr, text in zip(tool_results, texts)
+    ]
+    needs = [estimate_tokens(text) for text in texts]
+    if sum(needs) <= budget:
+        return [{**tr, "result": text} for tr, text in zip(tool_results, texts)]
+    shares = allocate_budget(needs, budget)
+    compacted = []
+    for tr, text, need, share in zip(tool_results, texts, needs, shares):
+        if need > share:
+            compactor = COMPACTORS.get(tr["tool"], truncate_to_tokens)
+            text = compactor(text, share)
+        compacted.append({**tr, "result": text})
+    return compacted
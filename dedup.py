@@ -0,0 +1,216 @@
+import os
+import re
+import math
+import zlib
+from collections import Counter
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 여러 검색 도구(news/serp/tavily) 결과를 합쳐 중복 제거 후 질의 관련도 순으로 top-k만 프롬프트에 전달
+SEARCH_TOOLS = ("news", "serp", "tavily")
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "8"))
+NEAR_DUP_THRESHOLD = float(os.getenv("SEARCH_NEAR_DUP_THRESHOLD", "0.7"))
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 4
+
+ITEM_RE = re.compile(r"^\s*(\d+)\.\s*(.*)$")
+URL_RE = re.compile(r"https?://\S+")
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ocid", "cmpid", "ref", "source")
+TOKEN_RE = re.compile(r"[0-9a-z]+|[가-힣]+")
+MERSENNE = (1 << 61) - 1
+
+
+def normalize_url(url):
+    # 스킴/www/추적 파라미터/fragment/끝 슬래시/AMP 경로 차이는 같은 문서로 취급
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m."):
+        host = host[2:]
+    path = re.sub(r"/amp/?$|\.amp$", "", parts.path).rstrip("/")
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS) and k.lower() not in ("output", "amp")
+    ]
+    return urlunsplit(("", host, path, urlencode(sorted(query)), ""))
+
+
+def parse_items(text):
+    """
+    검색 도구 출력 문자열 -> (항목 목록, 항목이 아닌 부분)
+    항목: "N. 제목" 으로 시작하는 빈 줄 구분 블록 ({"title", "snippet", "url"})
+    Answer Box/AI 요약/안내 문구 등은 항목이 아닌 부분으로 그대로 유지
+    """
+    items, others = [], []
+    for block in str(text).split("\n\n"):
+        lines = [line for line in block.strip().split("\n") if line.strip()]
+        match = ITEM_RE.match(lines[0]) if lines else None
+        if not match:
+            if lines:
+                others.append("\n".join(lines))
+            continue
+        url = ""
+        snippet = []
+        for line in lines[1:]:
+            body = re.sub(r"^-\s*(요약|링크|출처|이미지|원문):\s*", "", line.strip())
+            found = URL_RE.search(line)
+            if not url and found and (line.strip().startswith(("http", "- 링크"))):
+                url = found.group(0)
+            elif not line.strip().startswith(("- 출처", "- 이미지", "- 원문")):
+                snippet.append(body)
+        items.append({"title": match.group(2).strip(), "snippet": " ".join(snippet).strip(), "url": url})
+    return items, others
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token.isascii():
+            tokens.append(token)
+        else:
+            # 한글은 조사가 붙어도 맞도록 어절 + 2글자 단위로 색인
+            tokens.append(token)
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return tokens
+
+
+def shingles(text):
+    text = re.sub(r"\W+", " ", text.lower()).strip()
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+# (a * h + b) mod p 형태의 해시 함수 묶음 (실행마다 같은 값이 되도록 고정 시드)
+_PERMUTATIONS = [
+    (zlib.crc32(f"a{i}".encode()) * 2654435761 % MERSENNE | 1, zlib.crc32(f"b{i}".encode()))
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+
+def minhash(features):
+    if not features:
+        return None
+    hashes = [zlib.crc32(f.encode("utf-8")) for f in features]
+    return tuple(min((a * h + b) % MERSENNE for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(sig1, sig2):
+    if sig1 is None or sig2 is None:
+        return 0.0
+    return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
+
+
+def bm25_scores(query, docs, k1=1.5, b=0.75):
+    # 후보 문서 집합 안에서 IDF를 계산하는 로컬 BM25
+    query_terms = set(tokenize(query))
+    doc_terms = [tokenize(doc) for doc in docs]
+    if not docs or not query_terms:
+        return [0.0] * len(docs)
+    avgdl = sum(len(terms) for terms in doc_terms) / len(docs) or 1.0
+    df = Counter(term for terms in doc_terms for term in set(terms))
+    scores = []
+    for terms in doc_terms:
+        tf = Counter(terms)
+        score = 0.0
+        for term in query_terms:
+            if term not in tf:
+                continue
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * len(terms) / avgdl))
+        scores.append(score)
+    return scores
+
+
+def dedupe(items):
+    """
+    items: [{"title", "snippet", "url", "sources"}, ...] (앞쪽 항목 우선)
+    같은 URL 또는 제목+스니펫이 거의 같은 항목은 하나로 합치고 출처만 누적
+    """
+    kept = []
+    by_url = {}
+    for item in items:
+        key = normalize_url(item["url"])
+        if key and key in by_url:
+            for source in item["sources"]:
+                if source not in by_url[key]["sources"]:
+                    by_url[key]["sources"].append(source)
+            continue
+        signature = minhash(shingles(f"{item['title']} {item['snippet']}"))
+        duplicate = None
+        for other in kept:
+            if similarity(signature, other["signature"]) >= NEAR_DUP_THRESHOLD:
+                duplicate = other
+                break
+        if duplicate is not None:
+            for source in item["sources"]:
+                if source not in duplicate["sources"]:
+                    duplicate["sources"].append(source)
+            # 더 긴 스니펫을 남김
+            if len(item["snippet"]) > len(duplicate["snippet"]):
+                duplicate["snippet"] = item["snippet"]
+            continue
+        item = {**item, "signature": signature}
+        kept.append(item)
+        if key:
+            by_url[key] = item
+    return kept
+
+
+def select_top_k(items, scores, top_k):
+    # 점수순 top-k, 단 결과가 있던 출처는 최소 1건씩 남겨 커버리지 유지
+    order = sorted(range(len(items)), key=lambda i: (-scores[i], i))
+    picked = order[:top_k]
+    covered = {source for i in picked for source in items[i]["sources"]}
+    for i in order[top_k:]:
+        missing = [s for s in items[i]["sources"] if s not in covered]
+        if not missing:
+            continue
+        # 다른 출처가 남아 있는 가장 낮은 점수 항목과 교체
+        for j in reversed(range(len(picked))):
+            rest = {s for k in picked if k != picked[j] for s in items[k]["sources"]}
+            if set(items[picked[j]]["sources"]) <= rest:
+                picked[j] = i
+                covered = rest | set(items[i]["sources"])
+                break
+    return sorted(picked, key=lambda i: (-scores[i], i))
+
+
+def merge_search_results(tool_results, user_input, top_k=SEARCH_TOP_K):
+    """
+    검색 도구 결과가 2개 이상이면 하나의 "search" 결과로 합침 (첫 검색 결과 위치에 배치)
+    나머지 도구 결과는 그대로 유지, 원본 목록은 변경하지 않음
+    """
+    search = [tr for tr in tool_results if tr["tool"] in SEARCH_TOOLS]
+    if len(search) < 2:
+        return tool_results
+    items, others = [], []
+    for tr in search:
+        label = f"{tr['tool']}:{tr['param']}" if tr.get("param") else tr["tool"]
+        parsed, rest = parse_items(tr["result"])
+        items.extend({**item, "sources": [tr["tool"]]} for item in parsed)
+        others.extend(f"[{label}] {text}" for text in rest)
+    unique = dedupe(items)
+    scores = bm25_scores(user_input, [f"{item['title']} {item['title']} {item['snippet']}" for item in unique])
+    lines = []
+    for n, i in enumerate(select_top_k(unique, scores, top_k), 1):
+        item = unique[i]
+        lines.append(f"{n}. {item['title']} (출처: {', '.join(item['sources'])})\n{item['snippet']}\n{item['url']}".rstrip())
+    note = f"(검색 결과 {len(items)}건 -> 중복 제거 {len(unique)}건 -> 관련도 상위 {len(lines)}건)"
+    merged = {
+        "tool": "search",
+        "param": ", ".join(sorted({str(tr.get("param")) for tr in search if tr.get("param")})),
+        "result": "\n\n".join(others + lines + [note]),
+        "artifacts": [],
+        "status": "ok",
+        "elapsed": max(tr.get("elapsed", 0.0) for tr in search),
+    }
+    merged_results = []
+    for tr in tool_results:
+        if tr["tool"] not in SEARCH_TOOLS:
+            merged_results.append(tr)
+        elif tr is search[0]:
+            merged_results.append(merged)
+    return merged_results
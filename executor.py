@@ -0,0 +1,252 @@
+import os
+import time
+import logging
+import threading
+from artifacts import split_artifacts
+from tracing import span, wrap_context
+from jobs import call_in_process
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 도구 동시 실행 설정
+MAX_WORKERS = 4            # 동시에 실행할 최대 도구 수
+TOOL_TIMEOUT = 20.0        # 도구 1개당 제한 시간(초)
+REQUEST_DEADLINE = 45.0    # 요청 전체 제한 시간(초)
+# 차트 렌더링/지표 계산처럼 CPU를 오래 쓰는 도구를 프로세스 풀에서 실행 (예: "stock", 기본값은 모두 스레드에서 실행)
+# 프로세스에서 실행한 도구는 트레이스 span이 남지 않고 지표/차트 캐시도 워커별로 나뉘므로 필요할 때만 켬
+PROCESS_TOOLS = set(filter(None, os.getenv("PROCESS_TOOLS", "").split(",")))
+# execute_intents가 cancel_event를 확인하는 간격(초)
+CANCEL_POLL_INTERVAL = 0.1
+# 시간 초과 후에도 끝나지 않은 도구 스레드가 이 수만큼 풀을 차지하면 새 풀로 교체
+ORPHAN_RECYCLE_THRESHOLD = max(1, MAX_WORKERS // 2)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# 시간 초과로 결과를 버렸지만 아직 실행 중인 future -> (소속 풀, 도구 이름, 버린 시각)
+_orphans = {}
+_orphan_stats = {"orphaned": 0, "recycled_pools": 0}
+
+
+def get_executor():
+    # Streamlit 재실행마다 스레드 풀을 새로 만들지 않도록 프로세스 전역으로 공유
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+        return _executor
+
+
+def orphan(fut, executor, tool_name):
+    """
+    시간 초과된 future를 추적 (실행 중인 스레드는 중단할 수 없으므로 cancel()은 대기 중일 때만 효과가 있음)
+    멈춘 도구가 공유 풀의 스레드를 계속 차지해 이후 요청이 굶지 않도록,
+    현재 풀의 고아 스레드가 ORPHAN_RECYCLE_THRESHOLD개에 이르면 풀을 새로 만들고 기존 풀은 남은 작업이 끝나면 정리되게 함
+    """
+    global _executor
+    if fut.cancel() or fut.done():
+        return
+    with _executor_lock:
+        _orphans[fut] = (executor, tool_name, time.monotonic())
+        _orphan_stats["orphaned"] += 1
+        stuck = sum(1 for f, (ex, _, _) in _orphans.items() if ex is _executor and not f.done())
+        recycle = _executor is executor and stuck >= ORPHAN_RECYCLE_THRESHOLD
+        if recycle:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+            _orphan_stats["recycled_pools"] += 1
+    fut.add_done_callback(release_orphan)
+    logger.warning("%s 도구가 제한 시간을 넘겨 스레드를 점유 중 (현재 풀 고아 스레드 %d개)", tool_name, stuck)
+    if recycle:
+        logger.warning("고아 스레드가 %d개에 도달해 도구 스레드 풀을 교체", stuck)
+        executor.shutdown(wait=False)
+
+
+def release_orphan(fut):
+    with _executor_lock:
+        entry = _orphans.pop(fut, None)
+    if entry is not None:
+        logger.info("%s 도구의 고아 스레드 종료 (%.1f초 후)", entry[1], time.monotonic() - entry[2])
+
+
+def orphan_stats():
+    with _executor_lock:
+        return dict(_orphan_stats, running=sum(1 for f in _orphans if not f.done()))
+
+
+def module_name(tool_module):
+    # LazyTool은 아직 import하지 않은 모듈 이름을, 일반 모듈은 __name__을 사용
+    return getattr(tool_module, "module_name", None) or tool_module.__name__
+
+
+def call_tool(tools, intent, user_input, timeout=TOOL_TIMEOUT):
+    """
+    intent 하나를 해당 도구 모듈의 run()으로 실행하고 (param, result)를 반환
+    timeout: 프로세스 풀에서 실행하는 도구의 결과 대기 시간(초)
+    """
+    tool_name = intent.get("tool")
+    tool_module = tools[tool_name]
+    if tool_name == "stock":
+        param = intent.get("ticker")
+        kwargs = dict(
+            query=user_input,
+            ticker=param,
+            start=intent.get("start"),
+            end=intent.get("end"),
+            interval=intent.get("interval"),
+            ma_window=intent.get("ma_window", 5),
+            rsi_window=intent.get("rsi_window", 14),
+            summary=intent.get("summary", True),
+            chart=intent.get("chart", True),
+            indicators=intent.get("indicators")
+        )
+        if tool_name in PROCESS_TOOLS:
+            # 프로세스 작업도 제한 시간을 두어, 멈춘 워커 때문에 호출 스레드가 무기한 기다리지 않게 함
+            result = call_in_process(module_name(tool_module), "run", kwargs, timeout=timeout)
+        else:
+            result = tool_module.run(**kwargs)
+    elif tool_name == "news":
+        param = intent.get("keyword")
+        result = tool_module.run(query=param)
+    elif tool_name == "tavily":
+        param = intent.get("query")
+        result = tool_module.run(query=param)
+    elif tool_name == "serp":
+        param = intent.get("query")
+        result = tool_module.run(
+            query=param,
+            search_type=intent.get("search_type", "web")
+        )
+    elif tool_name == "mongo":
+        param = intent
+        result = tool_module.run(
+            action=intent.get("action"),
+            db_name=intent.get("db_name"),
+            coll_name=intent.get("coll_name"),
+            query=intent.get("query"),
+            data=intent.get("data"),
+            documents=intent.get("documents"),
+            ops=intent.get("ops"),
+            ordered=intent.get("ordered", True),
+            update=intent.get("update"),
+            many=intent.get("many", False),
+            object_id=intent.get("object_id"),
+            projection=intent.get("projection"),
+            sort=intent.get("sort"),
+            limit=intent.get("limit", 10),
+            skip=intent.get("skip", 0),
+            batch_size=intent.get("batch_size"),
+            page_token=intent.get("page_token")
+        )
+    else:
+        param = None
+        result = "지원하지 않는 도구입니다."
+    return param, result
+
+
+def execute_intents(
+    tools, intents, user_input, tool_timeout=TOOL_TIMEOUT, deadline=REQUEST_DEADLINE, cancel_event=None
+):
+    """
+    여러 intent를 스레드 풀에서 동시에 실행
+    - intents가 이터레이터(스트리밍 플래너)면 intent가 도착하는 즉시 제출해 계획 생성과 도구 실행을 겹침
+    - 도구별 제한 시간(tool_timeout)과 요청 전체 제한 시간(deadline) 적용 (deadline은 첫 도구 제출부터)
+    - cancel_event(threading.Event)가 설정되면 더 제출하거나 기다리지 않고 남은 도구를 cancelled로 반환
+    - 느리거나 실패한 도구는 오류 메시지로 채워 부분 결과를 반환
+    - 반환 순서는 intent 순서를 유지하며, 각 항목에 elapsed(초)와 status 포함
+    """
+    cancelled = (lambda: cancel_event.is_set()) if cancel_event is not None else (lambda: False)
+    started = {}
+    finished = {}
+
+    def task(i, intent):
+        started[i] = time.monotonic()
+        try:
+            with span(f"tool.{intent.get('tool')}") as s:
+                param, result = call_tool(tools, intent, user_input, timeout=tool_timeout)
+                s.attrs["result_chars"] = len(str(result))
+                s.attrs["artifacts"] = len(getattr(result, "artifacts", []))
+                return param, result
+        finally:
+            finished[i] = time.monotonic()
+
+    executor = get_executor()
+    runnable = []
+    futures = {}
+    request_start = None
+    for intent in intents:
+        if cancelled():
+            break
+        if not intent.get("tool") or intent.get("tool") == "none" or intent.get("tool") not in tools:
+            continue
+        if request_start is None:
+            request_start = time.monotonic()
+        # 스레드 풀에서도 현재 요청의 트레이스에 span이 기록되도록 컨텍스트를 넘김
+        futures[executor.submit(wrap_context(task), len(runnable), intent)] = len(runnable)
+        runnable.append(intent)
+    if not runnable:
+        return []
+
+    outcomes = {}
+    pending = set(futures)
+    while pending:
+        if cancelled():
+            # 취소된 요청의 도구는 결과를 기다리지 않음 (대기 중이면 취소, 실행 중이면 끝나는 대로 정리)
+            for fut in pending:
+                fut.cancel()
+                outcomes[futures[fut]] = ("cancelled", None, "요청이 취소되어 도구 실행을 중단했습니다.")
+            break
+        now = time.monotonic()
+        # 도구별 제한 시간 초과 처리 (실행 중인 스레드는 중단할 수 없으므로 결과만 버림)
+        for fut in list(pending):
+            i = futures[fut]
+            if i in started and now - started[i] >= tool_timeout:
+                pending.discard(fut)
+                orphan(fut, executor, runnable[i].get("tool"))
+                outcomes[i] = ("timeout", None, f"도구 실행 시간 초과({tool_timeout:.0f}초)")
+        remaining = deadline - (now - request_start)
+        if not pending:
+            break
+        if remaining <= 0:
+            for fut in pending:
+                orphan(fut, executor, runnable[futures[fut]].get("tool"))
+                outcomes[futures[fut]] = ("timeout", None, f"요청 제한 시간 초과({deadline:.0f}초)")
+            break
+        waits = [remaining] + [
+            tool_timeout - (now - started[futures[fut]]) for fut in pending if futures[fut] in started
+        ]
+        # 아직 시작하지 않은 도구가 있으면 시작 시각을 잡기 위해 짧게 대기
+        if any(futures[fut] not in started for fut in pending):
+            waits.append(0.05)
+        # 취소 요청을 놓치지 않도록 주기적으로 깨어남
+        if cancel_event is not None:
+            waits.append(CANCEL_POLL_INTERVAL)
+        done, pending = wait(pending, timeout=max(min(waits), 0), return_when=FIRST_COMPLETED)
+        for fut in done:
+            i = futures[fut]
+            try:
+                param, result = fut.result()
+                outcomes[i] = ("ok", param, result)
+            except Exception as e:
+                outcomes[i] = ("error", None, f"{runnable[i].get('tool')} 도구 실행 중 오류 발생: {e}")
+
+    tool_results = []
+    for i, intent in enumerate(runnable):
+        tool_name = intent.get("tool")
+        status, param, result = outcomes[i]
+        if param is None and status != "ok":
+            param = intent if tool_name == "mongo" else (
+                intent.get("ticker") or intent.get("keyword") or intent.get("query")
+            )
+        end = finished.get(i, time.monotonic())
+        elapsed = end - started[i] if i in started else 0.0
+        # 차트 이미지 등 바이너리 산출물은 텍스트(LLM 입력)와 분리해서 전달
+        text, artifacts = split_artifacts(result)
+        tool_results.append({
+            "tool": tool_name,
+            "param": param,
+            "result": text,
+            "artifacts": artifacts,
+            "status": status,
+            "elapsed": elapsed,
+        })
+    return tool_results
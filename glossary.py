@@ -0,0 +1,36 @@
+# 뉴스 검색어 번역용 한글 → 영문 용어집 (번역 API 호출 없이 바로 사용, 필요시 확장)
+KO_EN_GLOSSARY = {
+    "삼성전자": "Samsung Electronics",
+    "삼성": "Samsung",
+    "애플": "Apple",
+    "SK하이닉스": "SK Hynix",
+    "현대차": "Hyundai Motor",
+    "현대자동차": "Hyundai Motor",
+    "LG전자": "LG Electronics",
+    "네이버": "Naver",
+    "카카오": "Kakao",
+    "구글": "Google",
+    "마이크로소프트": "Microsoft",
+    "아마존": "Amazon",
+    "메타": "Meta",
+    "테슬라": "Tesla",
+    "엔비디아": "Nvidia",
+    "오픈AI": "OpenAI",
+    "인공지능": "artificial intelligence",
+    "반도체": "semiconductor",
+    "비트코인": "Bitcoin",
+    "경제": "economy",
+    "주식": "stock market",
+    "환율": "exchange rate",
+    "금리": "interest rate",
+    "부동산": "real estate",
+    "날씨": "weather",
+    "스포츠": "sports",
+    "정치": "politics",
+    "대통령": "president",
+    "한국": "South Korea",
+    "미국": "United States",
+    "중국": "China",
+    "일본": "Japan",
+    # 필요시 추가
+}
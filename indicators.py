@@ -0,0 +1,252 @@
+import math
+import threading
+import numpy as np
+
+# 기술적 지표 엔진
+# - SMA/볼린저/거래량 MA: 누적합 기반 롤링 합을 공유해 벡터 연산으로 계산
+# - EMA/MACD/Wilder RSI/ATR: 직전 상태만 필요하므로 봉 단위 한 번의 루프에서 함께 갱신
+# - 상태를 보관하므로 새 봉이 추가되면 전체 이력을 다시 계산하지 않고 이어서 계산
+
+DEFAULT_SPEC = {
+    "sma": [5, 20],
+    "ema": [12, 26],
+    "rsi": 14,
+    "macd": (12, 26, 9),
+    "bollinger": (20, 2.0),
+    "atr": 14,
+    "volume_ma": 20,
+}
+
+
+def normalize_spec(spec):
+    spec = dict(DEFAULT_SPEC if spec is None else spec)
+    for key in ("sma", "ema"):
+        value = spec.get(key)
+        if isinstance(value, int):
+            spec[key] = [value]
+    return spec
+
+
+def rolling_sum(values, window):
+    # 누적합 차이로 롤링 합 계산 (앞쪽 window-1개와 NaN이 포함된 구간은 NaN)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        nan_mask = np.isnan(values)
+        csum = np.cumsum(np.concatenate(([0.0], np.where(nan_mask, 0.0, values))))
+        ncnt = np.cumsum(np.concatenate(([0], nan_mask)))
+        sums = csum[window:] - csum[:-window]
+        sums[(ncnt[window:] - ncnt[:-window]) > 0] = np.nan
+        out[window - 1:] = sums
+    return out
+
+
+class IndicatorEngine:
+    """
+    spec에 지정된 지표를 한 번에 계산하고, update()로 새 봉만 이어서 계산
+
+    spec 예: {"sma": [5, 20], "ema": [12], "rsi": 14, "macd": (12, 26, 9),
+              "bollinger": (20, 2.0), "atr": 14, "volume_ma": 20}
+    dtype: 입력/출력 배열 타입 (np.float32 지정 시 메모리 절반, 누적 연산은 float64로 수행)
+    """
+    def __init__(self, spec=None, dtype=np.float64):
+        self.spec = normalize_spec(spec)
+        self.dtype = dtype
+        windows = list(self.spec.get("sma") or [])
+        if self.spec.get("bollinger"):
+            windows.append(self.spec["bollinger"][0])
+        if self.spec.get("volume_ma"):
+            windows.append(self.spec["volume_ma"])
+        # 롤링 지표를 이어서 계산하기 위해 보관할 최근 봉 수
+        self.tail_size = max(windows) - 1 if windows else 0
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.tail_close = np.empty(0)
+        self.tail_volume = np.empty(0)
+        self.prev_close = math.nan
+        spans = set(self.spec.get("ema") or [])
+        if self.spec.get("macd"):
+            fast, slow, _ = self.spec["macd"]
+            spans.update((fast, slow))
+        self.ema = {span: math.nan for span in spans}
+        self.macd_signal = math.nan
+        self.rsi_state = {"n": 0, "gain": 0.0, "loss": 0.0}
+        self.atr_state = {"n": 0, "atr": 0.0}
+
+    def compute(self, close, high=None, low=None, volume=None):
+        # 처음부터 다시 계산
+        self.reset()
+        return self.update(close, high=high, low=low, volume=volume)
+
+    def update(self, close, high=None, low=None, volume=None):
+        """
+        새로 추가된 봉들만 입력받아 해당 구간의 지표 배열을 반환 (dict: 이름 -> ndarray)
+        """
+        close = np.asarray(close, dtype=np.float64)
+        n = len(close)
+        out = {}
+
+        # 롤링 계열: 이전 꼬리 + 새 봉으로 계산 후 새 봉 구간만 사용
+        window_close = np.concatenate((self.tail_close, close))
+        offset = len(self.tail_close)
+        sums = {}
+
+        def close_sum(window):
+            if window not in sums:
+                sums[window] = rolling_sum(window_close, window)[offset:]
+            return sums[window]
+
+        for window in self.spec.get("sma") or []:
+            out[f"sma_{window}"] = close_sum(window) / window
+        if self.spec.get("bollinger"):
+            window, k = self.spec["bollinger"]
+            mid = close_sum(window) / window
+            sq = rolling_sum(window_close * window_close, window)[offset:] / window
+            std = np.sqrt(np.maximum(sq - mid * mid, 0.0) * window / max(window - 1, 1))
+            out["bb_mid"] = mid
+            out["bb_upper"] = mid + k * std
+            out["bb_lower"] = mid - k * std
+        if self.spec.get("volume_ma") and volume is not None:
+            volume = np.asarray(volume, dtype=np.float64)
+            window = self.spec["volume_ma"]
+            window_volume = np.concatenate((self.tail_volume, volume))
+            out[f"volume_ma_{window}"] = rolling_sum(window_volume, window)[len(self.tail_volume):] / window
+            if self.tail_size:
+                self.tail_volume = window_volume[-self.tail_size:]
+        if self.tail_size:
+            self.tail_close = window_close[-self.tail_size:]
+
+        # 재귀 계열: 한 번의 루프에서 EMA/MACD/RSI/ATR을 함께 갱신
+        ema_out = {span: np.empty(n) for span in self.ema}
+        alphas = {span: 2.0 / (span + 1) for span in self.ema}
+        macd = self.spec.get("macd")
+        rsi_window = self.spec.get("rsi")
+        atr_window = self.spec.get("atr") if high is not None and low is not None else None
+        if macd:
+            macd_line = np.empty(n)
+            macd_sig = np.empty(n)
+            sig_alpha = 2.0 / (macd[2] + 1)
+        if rsi_window:
+            rsi = np.full(n, np.nan)
+            rs = self.rsi_state
+        if atr_window:
+            high = np.asarray(high, dtype=np.float64)
+            low = np.asarray(low, dtype=np.float64)
+            atr = np.full(n, np.nan)
+            at = self.atr_state
+
+        prev = self.prev_close
+        for i, c in enumerate(close.tolist()):
+            if c != c:
+                # 결측 봉은 상태를 갱신하지 않고 직전 값을 유지
+                for span in alphas:
+                    ema_out[span][i] = self.ema[span]
+                if macd:
+                    macd_line[i] = self.ema[macd[0]] - self.ema[macd[1]]
+                    macd_sig[i] = self.macd_signal
+                continue
+            for span, alpha in alphas.items():
+                e = self.ema[span]
+                e = c if e != e else e + alpha * (c - e)
+                self.ema[span] = e
+                ema_out[span][i] = e
+            if macd:
+                m = self.ema[macd[0]] - self.ema[macd[1]]
+                s = self.macd_signal
+                s = m if s != s else s + sig_alpha * (m - s)
+                self.macd_signal = s
+                macd_line[i] = m
+                macd_sig[i] = s
+            if rsi_window and prev == prev:
+                d = c - prev
+                g = d if d > 0 else 0.0
+                l = -d if d < 0 else 0.0
+                if rs["n"] < rsi_window:
+                    # 첫 window개는 단순 평균으로 시작
+                    rs["gain"] += g / rsi_window
+                    rs["loss"] += l / rsi_window
+                    rs["n"] += 1
+                else:
+                    rs["gain"] = (rs["gain"] * (rsi_window - 1) + g) / rsi_window
+                    rs["loss"] = (rs["loss"] * (rsi_window - 1) + l) / rsi_window
+                if rs["n"] >= rsi_window:
+                    rsi[i] = 100.0 if rs["loss"] == 0 else 100.0 - 100.0 / (1.0 + rs["gain"] / rs["loss"])
+            if atr_window:
+                h, lo = high[i], low[i]
+                tr = h - lo if prev != prev else max(h - lo, abs(h - prev), abs(lo - prev))
+                if at["n"] < atr_window:
+                    at["atr"] += tr / atr_window
+                    at["n"] += 1
+                else:
+                    at["atr"] = (at["atr"] * (atr_window - 1) + tr) / atr_window
+                if at["n"] >= atr_window:
+                    atr[i] = at["atr"]
+            prev = c
+        self.prev_close = prev
+        self.count += n
+
+        for span in self.spec.get("ema") or []:
+            out[f"ema_{span}"] = ema_out[span]
+        if macd:
+            out["macd"] = macd_line
+            out["macd_signal"] = macd_sig
+            out["macd_hist"] = macd_line - macd_sig
+        if rsi_window:
+            out[f"rsi_{rsi_window}"] = rsi
+        if atr_window:
+            out[f"atr_{atr_window}"] = atr
+        return {name: values.astype(self.dtype, copy=False) for name, values in out.items()}
+
+
+class IndicatorCache:
+    """
+    (ticker, interval, spec)별 엔진과 이미 계산한 결과를 보관
+    새 데이터가 이전 데이터에 봉을 덧붙인 형태면 추가된 봉만 계산
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, index, close, high=None, low=None, volume=None, spec=None, dtype=np.float64):
+        index = np.asarray(index)
+        series = {
+            "close": np.asarray(close, dtype=np.float64),
+            "high": None if high is None else np.asarray(high, dtype=np.float64),
+            "low": None if low is None else np.asarray(low, dtype=np.float64),
+            "volume": None if volume is None else np.asarray(volume, dtype=np.float64),
+        }
+        # 엔진은 상태를 가지므로 꺼내서 단독으로 쓰고, 계산은 잠금 밖에서 수행 (다른 키의 요청을 막지 않음)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is not None:
+            prev_index, prev_series, engine, result = entry
+            m = len(prev_index)
+            # 앞부분이 같고 이미 계산한 봉의 종가/고가/저가/거래량도 그대로일 때만 이어서 계산
+            if len(index) >= m > 0 and np.array_equal(index[:m], prev_index) and all(
+                (values is None) == (prev_series[name] is None)
+                and (values is None or np.array_equal(values[:m], prev_series[name], equal_nan=True))
+                for name, values in series.items()
+            ):
+                sl = slice(m, None)
+                new = engine.update(
+                    series["close"][sl],
+                    **{name: None if values is None else values[sl] for name, values in series.items() if name != "close"},
+                )
+                result = {name: np.concatenate((result[name], new[name])) for name in result}
+                self.store(key, index, series, engine, result)
+                return result
+        engine = IndicatorEngine(spec, dtype=dtype)
+        result = engine.compute(series["close"], high=series["high"], low=series["low"], volume=series["volume"])
+        self.store(key, index, series, engine, result)
+        return result
+
+    def store(self, key, index, series, engine, result):
+        with self.lock:
+            self.entries[key] = (index, series, engine, result)
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+
+
+indicator_cache = IndicatorCache()
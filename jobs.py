@@ -0,0 +1,240 @@
+import os
+import time
+import uuid
+import importlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from multiprocessing import get_context
+
+# 백그라운드 작업 큐: Streamlit 스크립트 스레드는 작업 제출과 진행 상태 표시만 담당
+JOB_MAX_CONCURRENT = int(os.getenv("JOB_MAX_CONCURRENT", "8"))    # 프로세스 전체 동시 실행 작업 수
+JOB_PER_USER = int(os.getenv("JOB_PER_USER", "1"))                 # 사용자(세션)별 동시 실행 작업 수
+JOB_PROCESS_WORKERS = int(os.getenv("JOB_PROCESS_WORKERS", "2"))   # CPU 작업(차트/지표)용 프로세스 수
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "600"))             # 끝난 작업을 보관하는 시간(초)
+
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = "queued", "running", "done", "error", "cancelled"
+
+
+class Job:
+    """
+    fn(job, *args, **kwargs)로 실행되는 작업 하나
+    작업 함수는 job.emit()으로 진행 상황을, job.append_partial()로 스트리밍 중인 답변을 남김
+    UI는 snapshot()을 주기적으로 읽어 표시
+    """
+    def __init__(self, user_id, fn, args, kwargs, label="", on_update=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.user_id = user_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.label = label
+        self.status = QUEUED
+        self.events = []
+        self.partial = ""
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # 작업을 실행하는 스레드에서 emit/append_partial 직후 on_update(job) 호출 (인라인 실행 시 화면 갱신용)
+        self.on_update = on_update
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in (DONE, ERROR, CANCELLED)
+
+    def emit(self, stage, message, fraction=None):
+        with self.lock:
+            self.events.append({"time": time.time(), "stage": stage, "message": message, "fraction": fraction})
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def append_partial(self, text):
+        with self.lock:
+            self.partial += text
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "label": self.label,
+                "events": list(self.events),
+                "partial": self.partial,
+                "result": self.result,
+                "error": self.error,
+                "queued_s": (self.started_at or time.time()) - self.created_at,
+                "elapsed_s": ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0,
+            }
+
+
+def run_job(job):
+    """
+    job을 현재 스레드에서 실행하고 결과/상태를 기록
+    JobQueue 워커와 BACKGROUND_JOBS=0일 때의 인라인 실행이 같은 처리 흐름을 쓰도록 공유
+    """
+    with job.lock:
+        job.status = RUNNING
+        job.started_at = job.started_at or time.time()
+    job.emit("started", "작업 시작")
+    try:
+        result = job.fn(job, *job.args, **job.kwargs)
+        with job.lock:
+            job.result = result
+            job.status = CANCELLED if job.cancel_event.is_set() else DONE
+    except Exception as e:
+        with job.lock:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = ERROR
+    finally:
+        with job.lock:
+            if not job.done:
+                # 스크립트 중단처럼 Exception이 아닌 예외로 끝나면 취소로 기록
+                job.status = CANCELLED
+            job.finished_at = time.time()
+
+
+class JobQueue:
+    """
+    대기열 + 스레드 풀: 전체 동시 실행 수(max_concurrent)와 사용자별 동시 실행 수(per_user)를 함께 제한
+    제한에 걸린 작업은 대기열에 남아 있다가 앞선 작업이 끝나면 제출 순서대로 시작
+    """
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT, per_user=JOB_PER_USER):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="job")
+        self.pending = deque()
+        self.running = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, user_id, fn, *args, label="", **kwargs):
+        job = Job(user_id, fn, args, kwargs, label=label)
+        job.emit("queued", "대기열에 등록됨")
+        with self.lock:
+            self.prune()
+            self.jobs[job.id] = job
+            self.pending.append(job)
+        self.dispatch()
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        # 대기 중이면 바로 취소, 실행 중이면 cancel_event로 협조적 중단 요청
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.done:
+                return
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self.pending.remove(job)
+                job.status = CANCELLED
+                job.finished_at = time.time()
+
+    def running_for(self, user_id):
+        return sum(1 for job in self.running.values() if job.user_id == user_id)
+
+    def dispatch(self):
+        with self.lock:
+            started = []
+            for job in list(self.pending):
+                if len(self.running) >= self.max_concurrent:
+                    break
+                if self.running_for(job.user_id) >= self.per_user:
+                    continue
+                self.pending.remove(job)
+                job.status = RUNNING
+                job.started_at = time.time()
+                self.running[job.id] = job
+                started.append(job)
+        for job in started:
+            self.pool.submit(self.run, job)
+
+    def run(self, job):
+        try:
+            run_job(job)
+        finally:
+            with self.lock:
+                self.running.pop(job.id, None)
+            self.dispatch()
+
+    def prune(self):
+        # 호출 전 self.lock 보유: 오래된 완료 작업 정리
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [j.id for j in self.jobs.values() if j.done and (j.finished_at or 0) < cutoff]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queued": len(self.pending),
+                "running": len(self.running),
+                "max_concurrent": self.max_concurrent,
+                "per_user": self.per_user,
+            }
+
+
+job_queue = JobQueue()
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    # spawn: 스레드가 있는 부모 프로세스를 fork할 때의 잠금 상속 문제를 피함 (워커는 재사용)
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=JOB_PROCESS_WORKERS, mp_context=get_context("spawn"))
+        return _process_pool
+
+
+def call_module(module_name, func_name, kwargs):
+    # 프로세스 워커에서 실행: 모듈은 워커마다 한 번만 import됨
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)(**kwargs)
+
+
+def recycle_process_pool(pool):
+    """
+    시간 초과된 작업이 워커를 붙잡고 있는 풀을 새 풀로 교체
+    이후 작업은 새 풀에서 실행되고, 기존 풀은 대기 중인 작업을 취소한 뒤 실행 중인 작업이 끝나면 정리됨
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not pool:
+            # 다른 스레드가 이미 교체함
+            return
+        _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_in_process(module_name, func_name, kwargs):
+    """
+    module_name.func_name(**kwargs)를 프로세스 풀에서 실행하고 Future를 반환 (GIL을 잡지 않음)
+    인자와 반환값은 pickle 가능해야 함
+    """
+    return get_process_pool().submit(call_module, module_name, func_name, kwargs)
+
+
+def call_in_process(module_name, func_name, kwargs, timeout=None):
+    """
+    module_name.func_name(**kwargs)를 프로세스 풀에서 실행하고 결과를 timeout(초)까지 기다림
+    시간 안에 끝나지 않으면 해당 워커를 계속 점유하지 않도록 풀을 교체하고 TimeoutError 발생
+    """
+    pool = get_process_pool()
+    future = pool.submit(call_module, module_name, func_name, kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        recycle_process_pool(pool)
+        raise TimeoutError(f"{module_name}.{func_name} 프로세스 실행 시간 초과({timeout:.0f}초)")
@@ -1,7 +1,16 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-import json
+import datetime
+from planner import (
+    plan_cache, planner_stats, rule_based_plan, normalize_input,
+    build_planner_prefix, prefix_fingerprint,
+    build_agent_instruction, function_declarations, call_to_intent, to_plain,
+    IntentStreamParser,
+)
+from compaction import compact_tool_results, estimate_tokens, TOOL_TOKEN_BUDGET
+from dedup import merge_search_results
+from tracing import annotate
 
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -9,90 +18,115 @@ if not API_KEY:
     raise ValueError("GOOGLE_API_KEY가 .env 파일에 정의되어 있어야 합니다.")
 genai.configure(api_key=API_KEY)
 
-TOOL_DESCRIPTIONS = """
-당신은 사용자가 명시적으로 허용한 환경에서, 실제 데이터베이스에 직접 접근할 수 있습니다.
-반드시 mongo 도구를 사용하여 데이터베이스의 내용을 직접 조회, 삽입, 수정, 삭제할 수 있습니다.
-안내 메시지나 권한 관련 안내 대신, 아래 예시처럼 mongo 도구를 호출하는 JSON만 반환해야 합니다.
-
-- stock: 주식 티커(예: 미국 나스닥 티커 'AAPL', 한국 증권거래소 티커 '005930.KS' 형식으로 반드시 정확히 입력), 시작일(start, YYYY-MM-DD), 종료일(end, YYYY-MM-DD), 빈도(interval: '1d', '1wk', '1mo'), 이동평균선 기간(ma_window), RSI 기간(rsi_window), 요약 통계(summary: true/false), 차트 이미지(chart: true/false) 등을 받아, 상세 시세, 기술적 지표, 요약, 차트 이미지를 제공합니다.
-  - 티커는 반드시 Yahoo Finance에서 인식 가능한 형식으로 입력해야 하며, 한글 종목명 대신 반드시 티커 심볼을 사용하세요.
-  - 사용자가 한글 종목명(예: "삼성전자")으로 질문해도 반드시 Yahoo Finance에서 인식 가능한 티커(예: "005930.KS")로 변환하여 반환하세요.
-  - 'chart' 파라미터는 주가 그래프가 필요한 경우 true로 반드시 설정하세요.
-  - 예를 들어, 삼성전자는 '005930.KS', 애플은 'AAPL'과 같이 정확한 티커를 입력해야 합니다.
-- news: 키워드(예: 인물, 이슈 등)에 대한 최신 뉴스 기사 5건을 제공합니다.
-- tavily: 자연어 질의에 대해 실시간 웹 검색, 뉴스, 금융, 이미지, 원문 포함 등 다양한 정보를 제공합니다.
-- serp: 다양한 검색 유형(search_type: 'web', 'news', 'images', 'videos', 'scholar', 'answer_box', 'knowledge_graph', 'people_also_ask')과 쿼리(query)를 받아, 구글/유튜브 등에서 실시간 검색 결과, 뉴스, 이미지, 동영상, 학술논문, 즉답 박스, 지식 그래프, 함께 묻는 질문 등 특화된 정보를 제공합니다.
-- mongo: MongoDB 데이터베이스에서 문서 조회, 한 건 조회, 삽입, 수정, 삭제 등 다양한 작업을 수행합니다.
-  - action: "find"(여러 건 조회), "find_one"(한 건만 조회), "insert"(삽입), "update"(수정), "delete"(삭제) 중 하나를 지정
-  - db_name: 데이터베이스 이름 (예: "mydb")
-  - coll_name: 컬렉션 이름 (예: "users")
-  - query: dict, 조회/수정/삭제 조건 (예: {"name": "홍길동"})
-  - data: dict, 삽입할 데이터 (예: {"name": "홍길동", "age": 30})
-  - update: dict, update 명령 (예: {"$set": {"age": 31}})
-  - many: 여러 개 작업 여부 (True/False)
-  - object_id: _id로 직접 접근 시(str)
-  - projection: dict, 반환 필드 제한(예: {"name": 1, "_id": 0})
-
-**중요:**  
-- 사용자가 "데이터베이스에 저장된 내용을 보여줘", "users 컬렉션의 모든 데이터를 조회해줘", "홍길동을 삭제해줘" 등으로 요청하면,  
-  반드시 mongo 도구를 호출하는 JSON을 반환해야 하며,  
-  "접근 권한이 없습니다" 또는 "직접 접근할 수 없습니다"와 같은 안내 메시지는 절대 반환하지 마세요.
-
-각 도구를 사용할 때는 반드시 아래와 같은 JSON 배열 형식으로만 명령을 생성하세요. 도구들을 복합적으로 여러개 활용하여 사용하세요.
-
-예시:
-[
-  {"tool": "stock", "ticker": "AAPL", "start": "2024-01-01", "end": "2024-12-31", "interval": "1d", "ma_window": 20, "rsi_window": 14, "summary": true, "chart": true},
-  {"tool": "mongo", "action": "find", "db_name": "mydb", "coll_name": "users"},
-  {"tool": "mongo", "action": "find", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}},
-  {"tool": "mongo", "action": "find_one", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}},
-  {"tool": "mongo", "action": "insert", "db_name": "mydb", "coll_name": "users", "data": {"name": "홍길동", "age": 30}},
-  {"tool": "mongo", "action": "update", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}, "update": {"$set": {"age": 31}}},
-  {"tool": "mongo", "action": "delete", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}, "many": false},
-  {"tool": "mongo", "action": "delete", "db_name": "mydb", "coll_name": "users", "query": {"age": {"$lt": 18}}, "many": true},
-  {"tool": "news", "keyword": "Apple"},
-  {"tool": "tavily", "query": "2025년 AI 트렌드"},
-  {"tool": "serp", "query": "2025년 AI 트렌드", "search_type": "news"}
-]
-도구가 필요 없다면 반드시 [{"tool": "none"}]만 반환하세요.
-절대 직접 답변하지 말고, 반드시 위와 같은 JSON 배열만 반환하세요.
-"""
+# 플래너 컨텍스트 캐싱(Gemini CachedContent) 사용 여부. 지원되지 않는 모델/크기면 일반 호출로 대체
+PLANNER_CONTEXT_CACHE = os.getenv("PLANNER_CONTEXT_CACHE", "0") == "1"
 
 class GeminiLLM:
-    def __init__(self, model="gemini-2.0-flash"):
+    def __init__(self, model="gemini-2.0-flash", tool_token_budget=TOOL_TOKEN_BUDGET):
         self.model = genai.GenerativeModel(model)
+        self.model_name = model
+        self.tool_token_budget = tool_token_budget
+        self.last_plan_source = None
+        self.last_round_trips = 0
+        self.set_tool_specs([])
 
-    def decide_tools(self, user_input, max_retry=2):
-        prompt = (
-            f"{TOOL_DESCRIPTIONS}\n"
+    def set_tool_specs(self, specs):
+        """
+        실제로 로드된 도구의 TOOL_SPEC 목록으로 플래너 프롬프트를 구성
+        """
+        self.tool_specs = list(specs)
+        self.available_tools = {spec["name"] for spec in self.tool_specs}
+        self.planner_prefix = build_planner_prefix(self.tool_specs)
+        self.planner_key = prefix_fingerprint(self.planner_prefix)
+        self.planner_model = None
+        self.agent_model = None
+        if PLANNER_CONTEXT_CACHE and self.tool_specs:
+            try:
+                from google.generativeai import caching
+                cached = caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    system_instruction=self.planner_prefix,
+                    ttl=datetime.timedelta(hours=1),
+                )
+                self.planner_model = genai.GenerativeModel.from_cached_content(cached)
+            except Exception:
+                # 최소 토큰 수 미달, 미지원 모델 등은 일반 호출로 진행
+                self.planner_model = None
+
+    def decide_tools(self, user_input, max_retry=2, use_cache=True):
+        return list(self.iter_tools(user_input, max_retry=max_retry, use_cache=use_cache))
+
+    def iter_tools(self, user_input, max_retry=2, use_cache=True, cancel_event=None):
+        """
+        도구 계획을 intent 단위로 yield (decide_tools의 스트리밍 버전)
+        LLM 플래너 응답은 스트리밍으로 받아, 배열 원소 하나가 완성될 때마다 바로 넘겨
+        첫 번째 도구 실행이 나머지 계획 생성과 겹치도록 함
+        cancel_event(threading.Event)가 설정되면 남은 계획을 받지 않고 중단 (재시도/캐시 저장 없음)
+        """
+        # 1) 같은 요청의 캐시된 계획, 2) 규칙 기반 빠른 경로, 3) LLM 플래너 순으로 시도
+        if not self.tool_specs:
+            # 사용할 수 있는 도구가 없으면 플래너 호출 없이 직접 답변
+            self.last_plan_source = "no_tools"
+            yield {"tool": "none"}
+            return
+        # 도구 구성이 다르면 계획도 달라지므로 prefix 지문을 키에 포함
+        key = (self.planner_key, normalize_input(user_input))
+        if use_cache:
+            cached = plan_cache.get(key)
+            if cached is not None:
+                planner_stats.incr("cache_hits")
+                self.last_plan_source = "cache"
+                yield from cached
+                return
+        ruled = rule_based_plan(user_input, self.available_tools)
+        if ruled is not None:
+            planner_stats.incr("rule_hits")
+            self.last_plan_source = "rule"
+            plan_cache.put(key, ruled)
+            yield from ruled
+            return
+        planner_stats.incr("llm_calls")
+        self.last_plan_source = "llm"
+        request = (
             f"다음은 사용자의 요청입니다:\n"
             f"{user_input}\n"
             "요청을 분석해 어떤 도구들을 어떤 파라미터로 사용할지 반드시 위 예시처럼 JSON 배열만 반환하세요. "
             "도구가 필요 없다면 반드시 [{'tool': 'none'}]만 반환하세요."
         )
-        for _ in range(max_retry):
-            response = self.model.generate_content([{"role": "user", "parts": [prompt]}])
-            output = response.text.strip()
-            # JSON만 추출(앞뒤 설명, 코드블록 등 제거)
-            output = self._extract_json_array(output)
-            try:
-                result = json.loads(output)
-                if isinstance(result, list):
-                    return result
-            except Exception:
-                continue
-        # fallback: 도구 미사용
-        return [{"tool": "none"}]
-
-    def _extract_json_array(self, text):
-        # 코드블록, 설명 등 제거, JSON 배열만 추출
-        import re
-        match = re.search(r'(\[\s*{.*}\s*\])', text, re.DOTALL)
-        if match:
-            return match.group(1)
-        return text
+        if self.planner_model is not None:
+            # 도구 설명은 캐시된 컨텍스트에 있으므로 요청 부분만 전송
+            model, prompt = self.planner_model, request
+        else:
+            model, prompt = self.model, f"{self.planner_prefix}\n{request}"
+        annotate(prompt_tokens=estimate_tokens(prompt))
+        for attempt in range(max_retry):
+            if attempt:
+                planner_stats.incr("llm_retries")
+            annotate(llm_attempts=attempt + 1)
+            parser = IntentStreamParser()
+            for chunk in model.generate_content([{"role": "user", "parts": [prompt]}], stream=True):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # 안전 필터 등으로 텍스트가 없는 조각은 건너뜀
+                    continue
+                # 코드블록/설명은 건너뛰고 완성된 intent만 바로 넘김
+                yield from parser.feed(text)
+            # 이미 넘긴 intent는 실행 중이므로, 하나도 얻지 못했을 때만 재시도
+            if parser.items:
+                if parser.complete:
+                    plan_cache.put(key, parser.items)
+                return
+        # fallback: 도구 미사용 (파싱 실패 결과는 캐시하지 않음)
+        planner_stats.incr("llm_failures")
+        yield {"tool": "none"}
 
-    def answer_with_tools(self, user_input, tool_results):
+    def _tools_prompt(self, user_input, tool_results):
+        # 여러 검색 도구의 중복 기사를 합친 뒤, 표/JSON/검색 스니펫을 토큰 예산에 맞춰 압축해 프롬프트 크기와 지연을 줄임
+        tool_results = merge_search_results(tool_results, user_input)
+        tool_results = compact_tool_results(tool_results, self.tool_token_budget)
         tool_summaries = []
         for tr in tool_results:
             tool = tr["tool"]
@@ -114,6 +148,10 @@ class GeminiLLM:
                 tool_summaries.append(
                     f"[Serp 검색: {param}]\n{result}"
                 )
+            elif tool == "search":
+                tool_summaries.append(
+                    f"[통합 검색 결과: {param}]\n{result}"
+                )
             elif tool == "mongo":
                 tool_summaries.append(
                     f"[MongoDB 작업: {param}]\n{result}"
@@ -124,14 +162,128 @@ class GeminiLLM:
             f"{chr(10).join(tool_summaries)}\n\n"
             "각 도구의 결과를 종합해, 주요 인사이트·트렌드·요약·연관성·의미를 3~7줄로 심층 분석해줘."
         )
-        response = self.model.generate_content([{"role": "user", "parts": [prompt]}])
-        return response.text.strip()
+        annotate(prompt_tokens=estimate_tokens(prompt))
+        return prompt
 
-    def answer_direct(self, user_input, history=None):
+    def _direct_contents(self, user_input, history=None):
         contents = []
         if history:
             for role, content in history:
                 contents.append({"role": role, "parts": [content]})
-        contents.append({"role": "user", "parts": [user_input]})
-        response = self.model.generate_content(contents)
+        if contents and contents[-1]["role"] == "user":
+            # 직전 질문에 답이 없으면 현재 질문과 한 턴으로 합쳐 역할이 번갈아 오도록 함
+            contents[-1] = {"role": "user", "parts": [contents[-1]["parts"][0] + "\n\n" + user_input]}
+        else:
+            contents.append({"role": "user", "parts": [user_input]})
+        annotate(prompt_tokens=sum(estimate_tokens(c["parts"][0]) for c in contents))
+        return contents
+
+    def _stream(self, contents, cancel_event=None):
+        """
+        generate_content(stream=True)의 텍스트 조각을 순서대로 yield
+        cancel_event(threading.Event)가 설정되면 남은 응답을 받지 않고 중단
+        """
+        response = self.model.generate_content(contents, stream=True)
+        try:
+            for chunk in response:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # 안전 필터 등으로 텍스트가 없는 조각은 건너뜀
+                    continue
+                if text:
+                    yield text
+        finally:
+            close = getattr(response, "close", None)
+            if close:
+                close()
+
+    def summarize_history(self, previous_summary, turns):
+        # ConversationMemory가 오래된 대화를 누적 요약할 때 사용 (백그라운드 호출)
+        lines = [f"{'사용자' if role == 'user' else '어시스턴트'}: {content}" for role, content in turns]
+        prompt = (
+            "다음은 지금까지의 대화 요약과 그 이후 대화입니다.\n"
+            f"[기존 요약]\n{previous_summary or '(없음)'}\n\n"
+            f"[이후 대화]\n{chr(10).join(lines)}\n\n"
+            "이후 대화의 핵심 사실, 사용자의 선호/요청, 미해결 질문을 반영해 기존 요약을 5~10줄로 갱신해줘. 요약만 출력해."
+        )
+        response = self.model.generate_content([{"role": "user", "parts": [prompt]}])
         return response.text.strip()
+
+    def answer_with_tools(self, user_input, tool_results):
+        prompt = self._tools_prompt(user_input, tool_results)
+        response = self.model.generate_content([{"role": "user", "parts": [prompt]}])
+        return response.text.strip()
+
+    def stream_with_tools(self, user_input, tool_results, cancel_event=None):
+        prompt = self._tools_prompt(user_input, tool_results)
+        yield from self._stream([{"role": "user", "parts": [prompt]}], cancel_event)
+
+    def answer_direct(self, user_input, history=None):
+        response = self.model.generate_content(self._direct_contents(user_input, history))
+        return response.text.strip()
+
+    def stream_direct(self, user_input, history=None, cancel_event=None):
+        yield from self._stream(self._direct_contents(user_input, history), cancel_event)
+
+    def run_agent(self, user_input, run_intents, max_steps=3, cancel_event=None):
+        """
+        Gemini 함수 호출(function calling)로 도구 선택과 최종 답변을 한 대화에서 처리
+        - 도구 인자는 TOOL_SPEC 스키마로 선언되므로 JSON 추출/재시도가 없음
+        - 도구가 필요 없으면 1회, 도구를 쓰면 보통 2회 호출로 끝남
+        run_intents(intents) -> tool_results (executor.execute_intents 형식, 취소되면 일부만 올 수 있음)
+        cancel_event가 설정되면 더 호출하지 않고 ("", 지금까지의 결과)를 반환
+        반환: (answer, tool_results)
+        """
+        self.last_round_trips = 0
+        if not self.tool_specs:
+            self.last_round_trips = 1
+            return self.answer_direct(user_input), []
+        if self.agent_model is None:
+            self.agent_model = genai.GenerativeModel(
+                self.model_name,
+                tools=[{"function_declarations": function_declarations(self.tool_specs)}],
+                system_instruction=build_agent_instruction(self.tool_specs),
+            )
+        specs = {spec["name"]: spec for spec in self.tool_specs}
+        chat = self.agent_model.start_chat()
+        response = chat.send_message(user_input)
+        self.last_round_trips = 1
+        all_results = []
+        for _ in range(max_steps):
+            calls = [
+                part.function_call for part in response.candidates[0].content.parts
+                if part.function_call and part.function_call.name
+            ]
+            if not calls:
+                break
+            intents = [call_to_intent(specs[c.name], to_plain(c.args)) for c in calls if c.name in specs]
+            tool_results = run_intents(intents)
+            all_results.extend(tool_results)
+            if cancel_event is not None and cancel_event.is_set():
+                return "", all_results
+            compacted = compact_tool_results(tool_results, self.tool_token_budget)
+            # 함수 호출 순서대로 응답을 돌려줌 (결과는 알려진 도구 호출과 순서대로 짝지음)
+            parts = []
+            index = 0
+            for c in calls:
+                if c.name not in specs:
+                    result = "지원하지 않는 도구입니다."
+                elif index < len(compacted):
+                    result = compacted[index]["result"]
+                    index += 1
+                else:
+                    result = "도구 실행이 취소되었거나 실패해 결과가 없습니다."
+                parts.append(genai.protos.Part(
+                    function_response=genai.protos.FunctionResponse(name=c.name, response={"result": result})
+                ))
+            response = chat.send_message(genai.protos.Content(parts=parts))
+            self.last_round_trips += 1
+        try:
+            return response.text.strip(), all_results
+        except ValueError:
+            # 단계 제한까지 함수 호출만 이어진 경우 기존 방식으로 종합
+            self.last_round_trips += 1
+            return self.answer_with_tools(user_input, all_results), all_results
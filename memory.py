@@ -0,0 +1,111 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from compaction import estimate_tokens, truncate_to_tokens
+
+# answer_direct에 다시 보내는 대화 맥락을 일정 크기로 유지
+MEMORY_WINDOW_TOKENS = int(os.getenv("MEMORY_WINDOW_TOKENS", "2000"))
+MEMORY_MESSAGE_TOKENS = int(os.getenv("MEMORY_MESSAGE_TOKENS", "400"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "400"))
+
+# 요약은 응답 경로 밖에서 실행 (세션 간 공유)
+_summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory")
+
+
+def shrink_message(role, content, max_tokens):
+    # 도구 결과처럼 큰 메시지는 앞부분만 남겨 맥락에 재사용
+    if estimate_tokens(content) <= max_tokens:
+        return content
+    if role == "model" and content.startswith("[사용된 도구:"):
+        return content.split("\n", 1)[0] + " (긴 도구 출력 생략)"
+    return truncate_to_tokens(content, max_tokens)
+
+
+class ConversationMemory:
+    """
+    최근 대화는 토큰 예산 안에서 그대로, 그보다 오래된 대화는 누적 요약으로 전달
+    summarize_fn(previous_summary, turns) -> str 는 백그라운드에서 호출
+    """
+    def __init__(
+        self,
+        summarize_fn,
+        window_tokens=MEMORY_WINDOW_TOKENS,
+        max_message_tokens=MEMORY_MESSAGE_TOKENS,
+        summary_tokens=MEMORY_SUMMARY_TOKENS,
+    ):
+        self.summarize_fn = summarize_fn
+        self.window_tokens = window_tokens
+        self.max_message_tokens = max_message_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.summarized_upto = 0   # history에서 요약에 반영된 메시지 수
+        self.pending = None
+        self.lock = threading.Lock()
+
+    def window_start(self, history):
+        # 뒤에서부터 예산이 찰 때까지 포함
+        used = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            role, content = history[i]
+            tokens = estimate_tokens(shrink_message(role, content, self.max_message_tokens))
+            if used + tokens > self.window_tokens and start < len(history):
+                break
+            used += tokens
+            start = i
+        return start
+
+    def context(self, history):
+        """
+        history: [(role, content), ...] 전체 대화
+        반환: 요약 + 최근 대화로 구성된 [(role, content), ...]
+        """
+        start = self.window_start(history)
+        with self.lock:
+            idle = self.pending is None or self.pending.done()
+            if start > self.summarized_upto and idle:
+                self.schedule(history[self.summarized_upto:start], start)
+            summary = self.summary
+            summarized_upto = self.summarized_upto
+        # 요약이 진행 중이거나 실패해 아직 반영되지 않은 대화는 빠지지 않도록 요약 지점까지 창을 넓힘
+        start = min(start, summarized_upto)
+        # 대화는 user 턴으로 시작해야 하므로 앞쪽 model 턴이 있으면 직전 user 턴부터 포함
+        while 0 < start < len(history) and history[start][0] != "user":
+            start -= 1
+        while start < len(history) and history[start][0] != "user":
+            start += 1
+        contents = []
+        if summary:
+            contents.append(("user", f"[이전 대화 요약]\n{summary}"))
+            contents.append(("model", "이전 대화 요약을 참고하겠습니다."))
+        for role, content in history[start:]:
+            content = shrink_message(role, content, self.max_message_tokens)
+            if contents and contents[-1][0] == role:
+                # 같은 역할이 연속되면(응답 없이 끝난 요청 등) 한 턴으로 합쳐 역할이 번갈아 오도록 함
+                contents[-1] = (role, contents[-1][1] + "\n\n" + content)
+            else:
+                contents.append((role, content))
+        return contents
+
+    def schedule(self, turns, upto):
+        turns = [(role, shrink_message(role, content, self.max_message_tokens)) for role, content in turns]
+        previous = self.summary
+
+        def job():
+            try:
+                summary = self.summarize_fn(previous, turns)
+                summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+                with self.lock:
+                    self.summary = summary
+                    self.summarized_upto = upto
+            except Exception:
+                # 요약 실패 시 다음 요청에서 다시 시도
+                pass
+
+        self.pending = _summarizer.submit(job)
+
+    def wait(self, timeout=None):
+        # 테스트/벤치마크용: 진행 중인 요약이 끝날 때까지 대기
+        pending = self.pending
+        if pending is not None:
+            pending.result(timeout=timeout)
@@ -1,47 +1,510 @@
 # tools/mongo.py
 
 import os
+import time
+import atexit
+import threading
 from dotenv import load_dotenv
 import pymongo
+from pymongo import monitoring, InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
+from bson import json_util
+import base64
 import json
+from tracing import record_span
 
-# .env에서 MONGODB_URI 불러오기
+# .env에서 MONGODB_URI 불러오기 (없으면 첫 사용 시 안내, import는 실패하지 않음)
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
-if not MONGODB_URI:
-    raise ValueError("MONGODB_URI가 .env 파일에 정의되어 있어야 합니다.")
+
+# 플래너 프롬프트/함수 호출 스키마에 쓰이는 도구 명세 (import 없이 읽을 수 있도록 리터럴로 유지)
+TOOL_SPEC = {
+    "name": "mongo",
+    "description": "MongoDB 데이터베이스에서 문서 조회, 한 건 조회, 삽입, 수정, 삭제, 여러 건 일괄 삽입/쓰기 등 다양한 작업을 수행합니다.",
+    "requires_env": ["MONGODB_URI"],
+    "preamble": [
+        "당신은 사용자가 명시적으로 허용한 환경에서, 실제 데이터베이스에 직접 접근할 수 있습니다.",
+        "반드시 mongo 도구를 사용하여 데이터베이스의 내용을 직접 조회, 삽입, 수정, 삭제할 수 있습니다.",
+        "안내 메시지나 권한 관련 안내 대신, 아래 예시처럼 mongo 도구를 호출하는 JSON만 반환해야 합니다.",
+    ],
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": ["find", "find_one", "insert", "insert_many", "update", "delete", "bulk_write"], "description": "\"find\"(여러 건 조회), \"find_one\"(한 건만 조회), \"insert\"(삽입), \"insert_many\"(여러 건 일괄 삽입), \"update\"(수정), \"delete\"(삭제), \"bulk_write\"(삽입/수정/삭제 혼합 일괄 실행) 중 하나"},
+            "db_name": {"type": "string", "description": "데이터베이스 이름 (예: \"mydb\")"},
+            "coll_name": {"type": "string", "description": "컬렉션 이름 (예: \"users\")"},
+            "query": {"type": "object", "description": "조회/수정/삭제 조건 (예: {\"name\": \"홍길동\"})"},
+            "data": {"type": "object", "description": "삽입할 데이터 (예: {\"name\": \"홍길동\", \"age\": 30})"},
+            "documents": {"type": "array", "items": {"type": "object"}, "description": "insert_many로 삽입할 문서 목록 (예: [{\"name\": \"홍길동\"}, {\"name\": \"김철수\"}])"},
+            "ops": {"type": "array", "items": {"type": "object"}, "description": "bulk_write 작업 목록. 각 원소는 {\"insert\": 문서}, {\"update\": {\"query\": ..., \"update\": ..., \"many\": false, \"upsert\": false}}, {\"replace\": {\"query\": ..., \"data\": ..., \"upsert\": false}}, {\"delete\": {\"query\": ..., \"many\": false}} 중 하나"},
+            "ordered": {"type": "boolean", "description": "insert_many/bulk_write 순서 보장 여부 (기본 true, false면 실패한 작업이 있어도 나머지를 계속 실행)"},
+            "update": {"type": "object", "description": "update 명령 (예: {\"$set\": {\"age\": 31}})"},
+            "many": {"type": "boolean", "description": "여러 개 작업 여부"},
+            "object_id": {"type": "string", "description": "_id로 직접 접근 시"},
+            "projection": {"type": "object", "description": "반환 필드 제한 (예: {\"name\": 1, \"_id\": 0})"},
+            "sort": {"type": "object", "description": "정렬 조건 (예: {\"age\": -1})"},
+            "limit": {"type": "integer", "description": "find 한 페이지 최대 건수 (기본 10, 최대 100)"},
+            "skip": {"type": "integer", "description": "건너뛸 건수"},
+            "batch_size": {"type": "integer", "description": "insert_many/bulk_write 한 번에 서버로 보낼 작업 수 (기본 1000)"},
+            "page_token": {"type": "string", "description": "이전 find 결과에 있던 \"다음 페이지 토큰\" (다음 페이지 요청 시 그대로 전달)"},
+        },
+        "required": ["action", "db_name", "coll_name"],
+    },
+    "guidelines": [
+        "여러 문서를 한꺼번에 넣거나 바꿀 때는 insert/update를 여러 번 호출하지 말고 insert_many 또는 bulk_write 한 번으로 처리하세요.",
+        "사용자가 \"데이터베이스에 저장된 내용을 보여줘\", \"users 컬렉션의 모든 데이터를 조회해줘\", \"홍길동을 삭제해줘\" 등으로 요청하면, 반드시 mongo 도구를 호출하는 JSON을 반환해야 하며, \"접근 권한이 없습니다\" 또는 \"직접 접근할 수 없습니다\"와 같은 안내 메시지는 절대 반환하지 마세요.",
+    ],
+    "examples": [
+        {"tool": "mongo", "action": "find", "db_name": "mydb", "coll_name": "users"},
+        {"tool": "mongo", "action": "find", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}},
+        {"tool": "mongo", "action": "find", "db_name": "mydb", "coll_name": "users", "sort": {"age": -1}, "limit": 20},
+        {"tool": "mongo", "action": "find", "db_name": "mydb", "coll_name": "users", "page_token": "<이전 결과의 다음 페이지 토큰>"},
+        {"tool": "mongo", "action": "find_one", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}},
+        {"tool": "mongo", "action": "insert", "db_name": "mydb", "coll_name": "users", "data": {"name": "홍길동", "age": 30}},
+        {"tool": "mongo", "action": "update", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}, "update": {"$set": {"age": 31}}},
+        {"tool": "mongo", "action": "delete", "db_name": "mydb", "coll_name": "users", "query": {"name": "홍길동"}, "many": False},
+        {"tool": "mongo", "action": "delete", "db_name": "mydb", "coll_name": "users", "query": {"age": {"$lt": 18}}, "many": True},
+        {"tool": "mongo", "action": "insert_many", "db_name": "mydb", "coll_name": "users", "documents": [{"name": "홍길동", "age": 30}, {"name": "김철수", "age": 25}]},
+        {"tool": "mongo", "action": "bulk_write", "db_name": "mydb", "coll_name": "users", "ordered": False, "ops": [{"insert": {"name": "이영희", "age": 28}}, {"update": {"query": {"name": "홍길동"}, "update": {"$set": {"age": 31}}}}, {"delete": {"query": {"age": {"$lt": 18}}, "many": True}}]},
+    ],
+}
+
+# 커넥션 풀 설정 (.env로 조정 가능)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# 작업 전체 제한 시간(풀 대기 + 서버 선택 + 실행, PyMongo 4.2+의 timeoutMS). 도구 제한 시간(20초)보다 짧게 둠
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "15000"))
+# 동시에 새로 맺는 연결 수 (부하가 몰릴 때 연결 폭주 방지)
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", "2"))
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    커넥션 풀 이벤트를 집계해 풀 크기 산정에 쓸 통계를 제공
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkout_started = {}
+        self.stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "open_connections": 0,
+            "checked_out": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "waits": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def _incr(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.stats["connections_created"] += 1
+            self.stats["open_connections"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.stats["connections_closed"] += 1
+            self.stats["open_connections"] -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._checkout_started[threading.get_ident()] = time.monotonic()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._checkout_started.pop(threading.get_ident(), None)
+            self.stats["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            started = self._checkout_started.pop(threading.get_ident(), None)
+            self.stats["checkouts"] += 1
+            self.stats["checked_out"] += 1
+            if started is not None:
+                wait_ms = (time.monotonic() - started) * 1000
+                # 즉시 대여되지 않고 대기한 경우만 wait로 집계
+                if wait_ms >= 1.0:
+                    self.stats["waits"] += 1
+                    self.stats["total_wait_ms"] += wait_ms
+                    self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+
+    def connection_checked_in(self, event):
+        self._incr("checked_out", -1)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class CommandTraceListener(monitoring.CommandListener):
+    """
+    MongoDB 명령별 소요 시간을 현재 요청 트레이스에 기록 (이벤트는 명령을 실행한 스레드에서 호출됨)
+    """
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_span("mongo_command", event.duration_micros / 1000, command=event.command_name)
+
+    def failed(self, event):
+        record_span(
+            "mongo_command", event.duration_micros / 1000,
+            command=event.command_name, error=str(event.failure)[:200],
+        )
+
+
+class MongoClientManager:
+    """
+    프로세스 전역에서 하나의 MongoClient(커넥션 풀)를 공유
+    """
+    def __init__(
+        self,
+        uri,
+        max_pool_size=MONGO_MAX_POOL_SIZE,
+        min_pool_size=MONGO_MIN_POOL_SIZE,
+        max_idle_time_ms=MONGO_MAX_IDLE_TIME_MS,
+        server_selection_timeout_ms=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        timeout_ms=MONGO_TIMEOUT_MS,
+        max_connecting=MONGO_MAX_CONNECTING,
+    ):
+        self.uri = uri
+        self.options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "maxIdleTimeMS": max_idle_time_ms,
+            "serverSelectionTimeoutMS": server_selection_timeout_ms,
+            # 4.x에서 폐기 예정인 waitQueueTimeoutMS 대신 timeoutMS로 풀 대기를 포함한 전체 시간을 제한
+            "timeoutMS": timeout_ms,
+            "maxConnecting": max_connecting,
+        }
+        self.listener = PoolStatsListener()
+        self.command_listener = CommandTraceListener()
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if not self.uri:
+            raise ValueError("MONGODB_URI가 .env 파일에 정의되어 있어야 합니다.")
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = pymongo.MongoClient(
+                        self.uri, event_listeners=[self.listener, self.command_listener], **self.options
+                    )
+        return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def stats(self):
+        stats = self.listener.snapshot()
+        stats["max_pool_size"] = self.options["maxPoolSize"]
+        stats["connected"] = self._client is not None
+        return stats
+
+
+client_manager = MongoClientManager(MONGODB_URI)
+atexit.register(client_manager.close)
+
 
 def get_collection(db_name, coll_name):
-    client = pymongo.MongoClient(MONGODB_URI)
+    client = client_manager.get_client()
     db = client[db_name]
     collection = db[coll_name]
     return collection
 
+
+def get_pool_stats():
+    return client_manager.stats()
+
+
+def close_client():
+    client_manager.close()
+
+# find 페이지 설정
+FIND_DEFAULT_LIMIT = 10
+FIND_MAX_LIMIT = 100
+FIND_BATCH_SIZE = 100
+
+
+def normalize_sort(sort):
+    # {"age": -1} / [["age", -1]] / "age" 형태를 [(필드, 방향), ...]으로 통일하고 _id를 타이브레이커로 추가
+    if not sort:
+        keys = []
+    elif isinstance(sort, str):
+        keys = [(sort, pymongo.ASCENDING)]
+    elif isinstance(sort, dict):
+        keys = [(k, int(v)) for k, v in sort.items()]
+    else:
+        keys = [(k, int(v)) for k, v in sort]
+    if not any(k == "_id" for k, _ in keys):
+        keys.append(("_id", pymongo.ASCENDING))
+    return keys
+
+
+def encode_page_token(state):
+    raw = json_util.dumps(state).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_page_token(token):
+    raw = base64.urlsafe_b64decode(token.encode("ascii"))
+    return json_util.loads(raw.decode("utf-8"))
+
+
+def keyset_condition(sort_keys, last_values):
+    # 정렬 키 기준으로 마지막 문서 이후만 조회하는 조건 (서버 인덱스로 바로 탐색, skip 스캔 없음)
+    branches = []
+    for i, (field, direction) in enumerate(sort_keys):
+        cond = {f: v for (f, _), v in zip(sort_keys[:i], last_values[:i])}
+        cond[field] = {"$gt" if direction == pymongo.ASCENDING else "$lt": last_values[i]}
+        branches.append(cond)
+    return {"$or": branches}
+
+
+def get_path(doc, field):
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(field)
+        value = value[part]
+    return value
+
+
+def find_page(collection, db_name, coll_name, query=None, projection=None, sort=None,
+              limit=FIND_DEFAULT_LIMIT, skip=0, batch_size=FIND_BATCH_SIZE, page_token=None):
+    """
+    limit/skip/sort/batch_size를 서버에 위임해 한 페이지만 가져오고, 다음 페이지 토큰을 함께 반환
+    """
+    after = None
+    if page_token:
+        state = decode_page_token(page_token)
+        if state.get("db") != db_name or state.get("coll") != coll_name:
+            raise ValueError("page_token이 요청한 db_name/coll_name과 일치하지 않습니다.")
+        query = state.get("query")
+        projection = state.get("projection")
+        sort = state.get("sort")
+        limit = state.get("limit", limit)
+        skip = state.get("skip", 0)
+        after = state.get("after")
+    limit = max(1, min(int(limit or FIND_DEFAULT_LIMIT), FIND_MAX_LIMIT))
+    skip = max(0, int(skip or 0))
+    sort_keys = normalize_sort(sort)
+
+    server_query = query or {}
+    if after is not None:
+        cond = keyset_condition(sort_keys, after)
+        server_query = {"$and": [server_query, cond]} if server_query else cond
+
+    # 다음 페이지 존재 여부 확인을 위해 limit+1건만 요청
+    cursor = collection.find(server_query, projection or None)
+    cursor = cursor.sort(sort_keys).skip(skip).limit(limit + 1).batch_size(min(batch_size, limit + 1))
+    docs = []
+    try:
+        for doc in cursor:
+            docs.append(doc)
+    finally:
+        cursor.close()
+
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_token = None
+    if has_more and docs:
+        state = {
+            "db": db_name, "coll": coll_name, "query": query, "projection": projection,
+            "sort": [list(k) for k in sort_keys], "limit": limit,
+        }
+        try:
+            state["after"] = [get_path(docs[-1], f) for f, _ in sort_keys]
+            state["skip"] = 0
+        except KeyError:
+            # projection으로 정렬 키가 빠진 경우 오프셋 기반으로 이어서 조회
+            state["skip"] = skip + limit
+            if after is not None:
+                state["after"] = after
+        next_token = encode_page_token(state)
+    for doc in docs:
+        if "_id" in doc:
+            doc["_id"] = str(doc["_id"])
+    return docs, next_token
+
+
+# 일괄 쓰기 설정
+BULK_BATCH_SIZE = int(os.getenv("MONGO_BULK_BATCH_SIZE", "1000"))
+BULK_MAX_BATCH_SIZE = 100000   # 서버 maxWriteBatchSize
+BULK_SUMMARY_LINES = 20        # 결과에 표시할 배치별 요약 최대 줄 수
+BULK_ERROR_LINES = 5           # 결과에 표시할 오류 최대 건수
+
+
+def build_write_ops(ops):
+    """
+    [{"insert": 문서}, {"update": {...}}, {"replace": {...}}, {"delete": {...}}]를 pymongo 쓰기 요청 목록으로 변환
+    일부만 실행되지 않도록 서버로 보내기 전에 모든 작업의 형식을 검사 (잘못되면 ValueError)
+    """
+    requests = []
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict) or len(op) != 1:
+            raise ValueError(f"ops[{i}]는 insert, update, replace, delete 중 하나를 키로 가진 객체여야 합니다.")
+        kind, spec = next(iter(op.items()))
+        if not isinstance(spec, dict):
+            raise ValueError(f"ops[{i}].{kind} 값은 객체여야 합니다.")
+        if kind == "insert":
+            requests.append(InsertOne(spec))
+            continue
+        if kind not in ("update", "replace", "delete"):
+            raise ValueError(f"ops[{i}]: 지원하지 않는 작업({kind})입니다. (insert, update, replace, delete 중 선택)")
+        query = spec.get("query")
+        if not query:
+            raise ValueError(f"ops[{i}].{kind}에 query를 입력해 주세요.")
+        if kind == "update":
+            if not spec.get("update"):
+                raise ValueError(f"ops[{i}].update에 update 명령을 입력해 주세요.")
+            update_cls = UpdateMany if spec.get("many") else UpdateOne
+            requests.append(update_cls(query, spec["update"], upsert=bool(spec.get("upsert"))))
+        elif kind == "replace":
+            if not spec.get("data"):
+                raise ValueError(f"ops[{i}].replace에 data를 입력해 주세요.")
+            requests.append(ReplaceOne(query, spec["data"], upsert=bool(spec.get("upsert"))))
+        else:
+            requests.append(DeleteMany(query) if spec.get("many") else DeleteOne(query))
+    return requests
+
+
+def write_batches(collection, requests, ordered=True, batch_size=BULK_BATCH_SIZE):
+    """
+    쓰기 요청을 batch_size개씩 bulk_write 한 번으로 보내고 배치별 결과 요약 목록을 반환
+    ordered=True면 오류가 난 배치에서 멈추고(이후 배치는 보내지 않음), False면 모든 배치를 끝까지 실행
+    """
+    batch_size = max(1, min(int(batch_size or BULK_BATCH_SIZE), BULK_MAX_BATCH_SIZE))
+    summaries = []
+    for start in range(0, len(requests), batch_size):
+        batch = requests[start:start + batch_size]
+        errors = []
+        try:
+            counts = collection.bulk_write(batch, ordered=ordered).bulk_api_result
+        except BulkWriteError as e:
+            # 배치 안에서 성공한 작업 수와 실패한 작업(배치 내 위치)을 함께 돌려받음
+            counts = e.details
+            errors = [
+                {"index": start + err["index"], "code": err.get("code"), "message": str(err.get("errmsg", ""))[:200]}
+                for err in counts.get("writeErrors", [])
+            ]
+        summaries.append({
+            "batch": len(summaries) + 1,
+            "start": start,
+            "size": len(batch),
+            "inserted": counts.get("nInserted", 0),
+            "matched": counts.get("nMatched", 0),
+            "modified": counts.get("nModified", 0),
+            "deleted": counts.get("nRemoved", 0),
+            "upserted": counts.get("nUpserted", 0),
+            "errors": errors,
+        })
+        if errors and ordered:
+            break
+    return summaries
+
+
+def format_bulk_summary(summaries, total, ordered=True):
+    def counts_text(s):
+        return (f"삽입 {s['inserted']}, 수정 {s['modified']}(매칭 {s['matched']}), "
+                f"삭제 {s['deleted']}, upsert {s['upserted']}")
+
+    totals = {
+        key: sum(s[key] for s in summaries)
+        for key in ("inserted", "matched", "modified", "deleted", "upserted")
+    }
+    sent = sum(s["size"] for s in summaries)
+    errors = [err for s in summaries for err in s["errors"]]
+    lines = [
+        f"일괄 작업 결과: 요청 {total}건 중 {sent}건 전송 ({len(summaries)}개 배치), "
+        f"{counts_text(totals)}, 오류 {len(errors)}건"
+    ]
+    if errors and ordered:
+        lines.append("순서 보장(ordered) 모드라 첫 오류 이후의 작업은 실행되지 않았습니다.")
+    for s in summaries[:BULK_SUMMARY_LINES]:
+        lines.append(
+            f"- 배치 {s['batch']} (작업 {s['start'] + 1}~{s['start'] + s['size']}): "
+            f"{counts_text(s)}, 오류 {len(s['errors'])}건"
+        )
+    if len(summaries) > BULK_SUMMARY_LINES:
+        lines.append(f"- ... 외 {len(summaries) - BULK_SUMMARY_LINES}개 배치")
+    for err in errors[:BULK_ERROR_LINES]:
+        lines.append(f"오류: ops[{err['index']}] (code={err['code']}) {err['message']}")
+    if len(errors) > BULK_ERROR_LINES:
+        lines.append(f"오류 ... 외 {len(errors) - BULK_ERROR_LINES}건")
+    return "\n".join(lines)
+
+
 def run(
-    action=None,           # "find", "find_one", "insert", "update", "delete"
+    action=None,           # "find", "find_one", "insert", "insert_many", "update", "delete", "bulk_write"
     db_name=None,          # 데이터베이스 이름
     coll_name=None,        # 컬렉션 이름
     query=None,            # dict, 조회/수정/삭제 조건
     data=None,             # dict, 삽입/수정할 데이터
+    documents=None,        # list[dict], insert_many로 삽입할 문서 목록
+    ops=None,              # list[dict], bulk_write 작업 목록
+    ordered=True,          # insert_many/bulk_write 순서 보장 여부
     update=None,           # dict, update 명령 (예: {"$set": {...}})
     many=False,            # 여러 개 작업 여부
     object_id=None,        # _id로 직접 접근 시
-    projection=None        # dict, 반환 필드 제한(예: {"name": 1, "_id": 0})
+    projection=None,       # dict, 반환 필드 제한(예: {"name": 1, "_id": 0})
+    sort=None,             # 정렬 조건 (예: {"age": -1})
+    limit=FIND_DEFAULT_LIMIT,  # find 한 페이지 최대 건수
+    skip=0,                # find 건너뛸 건수
+    batch_size=None,       # find: 서버 커서 배치 크기, insert_many/bulk_write: 한 번에 보낼 작업 수
+    page_token=None        # 이전 find 결과의 다음 페이지 토큰
 ):
     """
-    action: "find", "find_one", "insert", "update", "delete" 중 하나
+    action: "find", "find_one", "insert", "insert_many", "update", "delete", "bulk_write" 중 하나
     db_name: 데이터베이스 이름
     coll_name: 컬렉션 이름
     query: dict, 조회/수정/삭제 조건
     data: dict, 삽입 또는 수정할 데이터
+    documents: list[dict], insert_many로 삽입할 문서 목록
+    ops: list[dict], bulk_write 작업 목록 ({"insert": 문서}, {"update": {"query", "update", "many", "upsert"}},
+         {"replace": {"query", "data", "upsert"}}, {"delete": {"query", "many"}})
+    ordered: insert_many/bulk_write 순서 보장 여부 (False면 실패한 작업이 있어도 나머지를 계속 실행)
     update: dict, update 명령 (예: {"$set": {...}})
     many: 여러 개 작업 여부 (True/False)
     object_id: _id로 직접 접근 시(str 또는 ObjectId)
     projection: dict, 반환 필드 제한(예: {"name": 1, "_id": 0})
+    sort: 정렬 조건 (dict 또는 [[필드, 1|-1], ...])
+    limit: find 한 페이지 최대 건수 (최대 100)
+    skip: find 건너뛸 건수
+    batch_size: find는 서버 커서 배치 크기, insert_many/bulk_write는 bulk_write 한 번에 보낼 작업 수
+    page_token: 이전 find 결과의 다음 페이지 토큰 (조건/정렬을 그대로 이어서 조회)
     """
     if not db_name or not coll_name:
         return "db_name과 coll_name을 지정해 주세요."
+    if not MONGODB_URI:
+        return "MONGODB_URI가 .env 파일에 정의되어 있어야 합니다."
     collection = get_collection(db_name, coll_name)
     try:
         # _id로 직접 접근 보정
@@ -51,21 +514,22 @@ def run(
             query["_id"] = ObjectId(object_id) if not isinstance(object_id, ObjectId) else object_id
 
         if action == "find":
-            cursor = collection.find(query or {}, projection or None)
-            results = [doc for doc in cursor]
-            for doc in results:
-                doc["_id"] = str(doc["_id"])
-            limited = results[:10]  # 최대 10건만 반환
-            return (
-                "조회 결과가 없습니다."
-                if not limited
-                else "조회 결과(최대 10건):\n" + json.dumps(limited, ensure_ascii=False, indent=2)
+            docs, next_token = find_page(
+                collection, db_name, coll_name, query=query, projection=projection, sort=sort,
+                limit=limit, skip=skip, batch_size=batch_size or FIND_BATCH_SIZE, page_token=page_token
             )
+            if not docs:
+                return "조회 결과가 없습니다."
+            text = f"조회 결과({len(docs)}건):\n" + json.dumps(docs, ensure_ascii=False, indent=2, default=str)
+            if next_token:
+                text += f"\n\n다음 페이지 토큰(page_token): {next_token}"
+            return text
         elif action == "find_one":
             doc = collection.find_one(query or {}, projection or None)
             if doc:
-                doc["_id"] = str(doc["_id"])
-                return "조회 결과(1건):\n" + json.dumps(doc, ensure_ascii=False, indent=2)
+                if "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+                return "조회 결과(1건):\n" + json.dumps(doc, ensure_ascii=False, indent=2, default=str)
             else:
                 return "조회 결과가 없습니다."
         elif action == "insert":
@@ -73,6 +537,22 @@ def run(
                 return "삽입할 data를 입력해 주세요."
             result = collection.insert_one(data)
             return f"삽입 완료: _id={str(result.inserted_id)}"
+        elif action == "insert_many":
+            if not documents:
+                return "삽입할 documents(문서 목록)를 입력해 주세요."
+            if not all(isinstance(doc, dict) for doc in documents):
+                return "documents의 각 원소는 객체여야 합니다."
+            summaries = write_batches(collection, [InsertOne(doc) for doc in documents], ordered, batch_size)
+            return format_bulk_summary(summaries, len(documents), ordered)
+        elif action == "bulk_write":
+            if not ops:
+                return "실행할 ops(작업 목록)를 입력해 주세요."
+            try:
+                requests = build_write_ops(ops)
+            except ValueError as e:
+                return str(e)
+            summaries = write_batches(collection, requests, ordered, batch_size)
+            return format_bulk_summary(summaries, len(requests), ordered)
         elif action == "update":
             if not query or not update:
                 return "수정할 query와 update를 모두 입력해 주세요."
@@ -92,6 +572,6 @@ def run(
                 result = collection.delete_one(query)
                 return f"{result.deleted_count}개 문서가 삭제되었습니다."
         else:
-            return "지원하지 않는 action입니다. (find, find_one, insert, update, delete 중 선택)"
+            return "지원하지 않는 action입니다. (find, find_one, insert, insert_many, update, delete, bulk_write 중 선택)"
     except Exception as e:
         return f"MongoDB 작업 중 오류 발생: {e}"
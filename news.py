@@ -1,37 +1,159 @@
 # tools/news.py
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from newsapi import NewsApiClient
 from googletrans import Translator
+from response_cache import response_cache
+from glossary import KO_EN_GLOSSARY
+from transport import get_session
 
 load_dotenv()
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
+# 헤드라인은 자주 바뀌므로 검색 캐시보다 짧게 유지
+NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", "300"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("NEWS_TRANSLATION_CACHE_SIZE", "1024"))
+# 1이면 헤드라인/전체 검색을 동시에 요청하고 먼저 도착한 비어 있지 않은 결과를 사용
+NEWS_PARALLEL_QUERIES = os.getenv("NEWS_PARALLEL_QUERIES", "0") == "1"
+
+# 플래너 프롬프트/함수 호출 스키마에 쓰이는 도구 명세 (import 없이 읽을 수 있도록 리터럴로 유지)
+TOOL_SPEC = {
+    "name": "news",
+    "description": "키워드(예: 인물, 이슈 등)에 대한 최신 뉴스 기사 5건을 제공합니다.",
+    "requires_env": ["NEWS_API_KEY"],
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "keyword": {"type": "string", "description": "뉴스 검색 키워드 (비우면 주요 헤드라인)"},
+        },
+        "required": ["keyword"],
+    },
+    "guidelines": [],
+    "examples": [
+        {"tool": "news", "keyword": "Apple"},
+    ],
+}
+
+# 클라이언트는 프로세스에서 한 번만 만들어 재사용
+_newsapi = None
+_translator = None
+_clients_lock = threading.Lock()
+# googletrans Translator는 스레드 안전하지 않으므로 번역 호출은 직렬화
+_translate_lock = threading.Lock()
+_query_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="news")
+
+def get_newsapi():
+    global _newsapi
+    with _clients_lock:
+        if _newsapi is None:
+            _newsapi = NewsApiClient(api_key=NEWS_API_KEY, session=get_session())
+        return _newsapi
+
+def get_translator():
+    global _translator
+    with _clients_lock:
+        if _translator is None:
+            _translator = Translator()
+        return _translator
+
+class TranslationMemo:
+    """
+    한→영 번역 결과 LRU 메모 (용어집 항목은 제거되지 않음)
+    """
+    def __init__(self, glossary, max_entries=TRANSLATION_CACHE_SIZE):
+        self.glossary = dict(glossary)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, text):
+        if text in self.glossary:
+            return self.glossary[text]
+        with self.lock:
+            if text in self.entries:
+                self.entries.move_to_end(text)
+                return self.entries[text]
+        return None
+
+    def put(self, text, translated):
+        with self.lock:
+            self.entries[text] = translated
+            self.entries.move_to_end(text)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+translation_memo = TranslationMemo(KO_EN_GLOSSARY)
+
+def translate_words(query):
+    # 모든 단어가 용어집에 있으면 번역 API 없이 조합 ("삼성전자 반도체" 등)
+    words = query.split()
+    mapped = [KO_EN_GLOSSARY.get(word) or (word if word.isascii() else None) for word in words]
+    if all(mapped):
+        return " ".join(mapped)
+    return None
 
 def map_query_to_keyword(query):
     if not query or not query.strip():
         return "world"
+    query = query.strip()
+    if query.isascii():
+        return query
+    cached = translation_memo.get(query) or translate_words(query)
+    if cached:
+        return cached
     try:
-        translator = Translator()
-        translated = translator.translate(query, src='ko', dest='en')
+        translator = get_translator()
+        with _translate_lock:
+            translated = translator.translate(query, src='ko', dest='en')
+        translation_memo.put(query, translated.text)
         return translated.text
     except Exception:
         return query
 
+def fetch_news(newsapi, method, **params):
+    return response_cache.get_or_fetch(
+        "news",
+        {"method": method, **params},
+        lambda: getattr(newsapi, method)(**params),
+        ttl=NEWS_CACHE_TTL,
+        cache_if=lambda response: response.get("status") == "ok",
+    )
+
+def first_articles(newsapi, requests):
+    """
+    requests: [(method, params), ...] 우선순위 순서
+    NEWS_PARALLEL_QUERIES면 동시에 요청하고 먼저 도착한 비어 있지 않은 결과를, 아니면 순서대로 요청
+    """
+    if not NEWS_PARALLEL_QUERIES or len(requests) < 2:
+        for method, params in requests:
+            articles = fetch_news(newsapi, method, **params).get("articles", [])
+            if articles:
+                return articles
+        return []
+    futures = [_query_pool.submit(fetch_news, newsapi, method, **params) for method, params in requests]
+    for future in as_completed(futures):
+        try:
+            articles = future.result().get("articles", [])
+        except Exception:
+            continue
+        if articles:
+            return articles
+    return []
+
 def run(query=None):
     if not NEWS_API_KEY:
         return "NEWS_API_KEY가 설정되어 있지 않습니다."
-    newsapi = NewsApiClient(api_key=NEWS_API_KEY)
-    articles = []
+    newsapi = get_newsapi()
     if not query or not query.strip():
-        response = newsapi.get_top_headlines(country="kr", page_size=5)
-        articles = response.get("articles", [])
+        articles = first_articles(newsapi, [("get_top_headlines", {"country": "kr", "page_size": 5})])
     else:
         q_en = map_query_to_keyword(query.strip())
-        response = newsapi.get_top_headlines(q=q_en, country="kr", page_size=5)
-        articles = response.get("articles", [])
-        if not articles:
-            response = newsapi.get_everything(q=q_en, language="en", sort_by="publishedAt", page_size=5)
-            articles = response.get("articles", [])
+        articles = first_articles(newsapi, [
+            ("get_top_headlines", {"q": q_en, "country": "kr", "page_size": 5}),
+            ("get_everything", {"q": q_en, "language": "en", "sort_by": "publishedAt", "page_size": 5}),
+        ])
     if not articles:
         return f"'{query}'(으)로 뉴스 결과를 찾을 수 없습니다."
     news_list = []
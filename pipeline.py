@@ -0,0 +1,151 @@
+import time
+from executor import execute_intents
+from tracing import start_trace, finish_trace, span, record_span
+
+# 백그라운드 작업으로 실행되는 요청 처리 흐름 (Streamlit API를 직접 호출하지 않고 job에 진행 상황만 기록)
+INTERRUPTED_NOTE = "\n\n(새 메시지가 입력되어 응답이 중단되었습니다)"
+
+
+def import_costs(tools, names):
+    # 이번 요청에서 처음 import된 도구의 import 시간
+    stats = tools.import_stats() if hasattr(tools, "import_stats") else {}
+    costs = []
+    for name in names:
+        info = stats.get(name)
+        if info and info["import_ms"] is not None:
+            state = "실패" if info["error"] else f"{info['import_ms']:.0f}ms"
+            costs.append(f"{name} {state}")
+    return ", ".join(costs)
+
+
+def collect_artifacts(tool_results):
+    # UI에 표시할 차트 등: [(도구 결과 텍스트, 산출물 목록), ...]
+    return [(tr["result"], tr["artifacts"]) for tr in tool_results if tr["artifacts"]]
+
+
+def used_tools_prefix(tool_results):
+    tools_used = ', '.join(set([tr['tool'] for tr in tool_results]))
+    return f"[사용된 도구: {tools_used}]\n\n"
+
+
+def streamed_plan(llm, user_input, collected, on_intent=None, cancel_event=None):
+    """
+    llm.iter_tools를 감싸 받은 intent를 collected에 모으면서 그대로 넘김 (execute_intents에 바로 전달)
+    cancel_event가 설정되면 플래너 스트림을 닫고 더 넘기지 않음
+    플래너 구간은 도구 span과 겹치므로 스트림이 끝날 때 planner span으로 따로 기록
+    """
+    start = time.perf_counter()
+    plan = llm.iter_tools(user_input, cancel_event=cancel_event)
+    try:
+        for intent in plan:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            collected.append(intent)
+            if on_intent is not None:
+                on_intent(intent)
+            yield intent
+    finally:
+        plan.close()
+        record_span("planner", (time.perf_counter() - start) * 1000,
+                    source=llm.last_plan_source, intents=len(collected))
+
+
+def stream_answer(job, make_chunks, stream=True, prefix=""):
+    """
+    답변 조각을 job.partial에 이어 붙여 UI가 폴링으로 바로 보여줄 수 있게 함
+    make_chunks(cancel_event)는 스트리밍 제너레이터, stream=False면 완성된 문자열을 반환하는 함수
+    """
+    job.append_partial(prefix)
+    if not stream:
+        text = make_chunks(None)
+        job.append_partial(text)
+        return prefix + text
+    text = ""
+    for chunk in make_chunks(job.cancel_event):
+        text += chunk
+        job.append_partial(chunk)
+    final = prefix + text.strip()
+    if job.cancel_event.is_set():
+        final += INTERRUPTED_NOTE
+    return final
+
+
+def process_request(job, llm, tools, user_input, history, agent_mode="planner", stream=True):
+    """
+    사용자 요청 하나를 처리 (계획 -> 도구 실행 -> 답변)
+    history: 직접 답변에 쓸 대화 맥락 (ConversationMemory.context 결과)
+    반환: {"answer", "artifacts", "intents", "notification"}
+    """
+    trace = start_trace("request", mode=agent_mode, job_id=job.id)
+    try:
+        if agent_mode == "function_calling":
+            job.emit("agent", "LLM 함수 호출 모드로 처리 중")
+            with span("agent") as agent_span:
+                answer, tool_results = llm.run_agent(
+                    user_input,
+                    lambda intents: execute_intents(tools, intents, user_input, cancel_event=job.cancel_event),
+                    cancel_event=job.cancel_event,
+                )
+                agent_span.attrs["round_trips"] = llm.last_round_trips
+            if job.cancel_event.is_set():
+                return {"answer": INTERRUPTED_NOTE.strip(), "artifacts": [], "intents": None, "notification": "요청 취소됨"}
+            if tool_results:
+                answer = used_tools_prefix(tool_results) + answer
+            job.append_partial(answer)
+            return {
+                "answer": answer,
+                "artifacts": collect_artifacts(tool_results),
+                "intents": None,
+                "notification": f"app.py에서 대기 중 (LLM 호출 {llm.last_round_trips}회)",
+            }
+
+        job.emit("planner", "LLM이 도구 판단 중...")
+        not_loaded = [name for name in tools if hasattr(tools[name], "loaded") and not tools[name].loaded]
+        tool_intents = []
+        # 계획이 완성되는 intent부터 바로 실행 (나머지 계획 생성과 도구 실행이 겹침)
+        tool_results = execute_intents(
+            tools,
+            streamed_plan(llm, user_input, tool_intents,
+                          on_intent=lambda intent: job.emit("planned", f"계획 수신: {intent.get('tool')}"),
+                          cancel_event=job.cancel_event),
+            user_input,
+            # 취소되면 남은 intent를 제출하거나 기다리지 않고 바로 돌아와 사용자별 실행 슬롯을 비움
+            cancel_event=job.cancel_event,
+        )
+        job.emit("tools", f"계획 출처: {llm.last_plan_source}, 도구: {[i.get('tool') for i in tool_intents]}")
+        if job.cancel_event.is_set():
+            return {"answer": INTERRUPTED_NOTE.strip(), "artifacts": [], "intents": tool_intents, "notification": "요청 취소됨"}
+        if tool_results:
+            timings = ", ".join(f"{tr['tool']} {tr['elapsed']:.2f}s({tr['status']})" for tr in tool_results)
+            notification = f"도구 실행 완료: {timings}"
+            first_imports = import_costs(tools, not_loaded)
+            if first_imports:
+                notification += f" / 첫 import: {first_imports}"
+            job.emit("tools_done", notification)
+            job.emit("answer", "답변 생성 중")
+            with span("answer", kind="with_tools", stream=stream):
+                answer = stream_answer(
+                    job,
+                    (lambda cancel_event: llm.stream_with_tools(user_input, tool_results, cancel_event=cancel_event))
+                    if stream else (lambda _: llm.answer_with_tools(user_input, tool_results)),
+                    stream=stream,
+                    prefix=used_tools_prefix(tool_results),
+                )
+        else:
+            notification = "app.py에서 대기 중"
+            job.emit("answer", "LLM 직접 답변")
+            with span("answer", kind="direct", stream=stream):
+                answer = stream_answer(
+                    job,
+                    (lambda cancel_event: llm.stream_direct(user_input, history=history, cancel_event=cancel_event))
+                    if stream else (lambda _: llm.answer_direct(user_input, history=history)),
+                    stream=stream,
+                )
+        return {
+            "answer": answer,
+            "artifacts": collect_artifacts(tool_results),
+            "intents": tool_intents,
+            "notification": notification,
+        }
+    finally:
+        finish_trace(trace)
@@ -0,0 +1,400 @@
+import os
+import re
+import copy
+import json
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from tickers import TICKER_MAP
+
+# decide_tools 앞단: 같은 요청은 캐시에서, 명확한 요청은 규칙으로 바로 도구 계획을 만들어 LLM 호출을 생략
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "512"))
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", "600"))
+
+STOCK_KEYWORDS = ("주가", "주식", "시세", "차트", "stock", "price")
+NEWS_KEYWORDS = ("최신 뉴스", "뉴스", "news")
+MIXED_CONNECTORS = ("그리고", "이랑", "및", "와", "과", "랑", "&")
+TICKER_RE = re.compile(r"^(?:[A-Z]{1,5}(?:\.[A-Z]{1,2})?|\d{6}\.(?:KS|KQ))$")
+
+
+PLANNER_FOOTER = """
+각 도구를 사용할 때는 반드시 아래와 같은 JSON 배열 형식으로만 명령을 생성하세요. 도구들을 복합적으로 여러개 활용하여 사용하세요.
+
+예시:
+{examples}
+도구가 필요 없다면 반드시 [{{"tool": "none"}}]만 반환하세요.
+절대 직접 답변하지 말고, 반드시 위와 같은 JSON 배열만 반환하세요.
+"""
+
+
+def describe_parameter(name, schema, required=False):
+    # 예: "interval (string, 선택, 값: 1d|1wk|1mo): 빈도"
+    kind = schema.get("type", "string")
+    items = schema.get("items", {})
+    if kind == "array" and items.get("type"):
+        kind = f"{kind}[{items['type']}]"
+    details = [kind, "필수" if required else "선택"]
+    enum = schema.get("enum") or items.get("enum")
+    if enum:
+        details.append("값: " + "|".join(str(value) for value in enum))
+    text = f"{name} ({', '.join(details)})"
+    if schema.get("description"):
+        text += f": {schema['description']}"
+    return text
+
+
+def build_planner_prefix(specs):
+    """
+    로드된 도구의 TOOL_SPEC만으로 플래너 프롬프트 앞부분을 구성 (도구별 설명, 파라미터 스키마, 지침, 예시)
+    도구 이름순으로 고정된 문자열을 만들어 같은 도구 구성이면 항상 같은 prefix가 되도록 함 (prefix 캐싱)
+    """
+    specs = sorted(specs, key=lambda spec: spec["name"])
+    lines = []
+    for spec in specs:
+        lines.extend(spec.get("preamble", []))
+    if lines:
+        lines.append("")
+    for spec in specs:
+        lines.append(f"- {spec['name']}: {spec['description']}")
+        parameters = spec.get("parameters", {})
+        required = set(parameters.get("required", []))
+        for name, schema in parameters.get("properties", {}).items():
+            lines.append(f"  - {describe_parameter(name, schema, name in required)}")
+        for guideline in spec.get("guidelines", []):
+            lines.append(f"  - {guideline}")
+    examples = [example for spec in specs for example in spec.get("examples", [])]
+    example_text = "[\n" + ",\n".join(
+        "  " + json.dumps(example, ensure_ascii=False) for example in examples
+    ) + "\n]"
+    return "\n".join(lines) + "\n" + PLANNER_FOOTER.format(examples=example_text)
+
+
+AGENT_INSTRUCTION_FOOTER = """
+필요한 도구는 함수 호출로 요청하세요. 서로 독립적인 도구는 한 번에 여러 개를 동시에 호출하세요.
+도구가 필요 없으면 바로 답변하세요.
+도구 결과를 받으면 각 도구의 결과를 종합해, 주요 인사이트·트렌드·요약·연관성·의미를 3~7줄로 심층 분석해줘.
+"""
+
+SCHEMA_TYPES = {
+    "string": "STRING", "integer": "INTEGER", "number": "NUMBER",
+    "boolean": "BOOLEAN", "array": "ARRAY", "object": "OBJECT",
+}
+
+
+def build_agent_instruction(specs):
+    # 함수 호출 모드용 시스템 지시문 (파라미터는 함수 선언으로 전달하므로 JSON 예시는 제외)
+    specs = sorted(specs, key=lambda spec: spec["name"])
+    lines = []
+    for spec in specs:
+        lines.extend(spec.get("preamble", []))
+    for spec in specs:
+        for guideline in spec.get("guidelines", []):
+            lines.append(f"- [{spec['name']}] {guideline}")
+    return "\n".join(lines) + "\n" + AGENT_INSTRUCTION_FOOTER
+
+
+def to_gemini_schema(schema):
+    """
+    TOOL_SPEC의 JSON 스키마를 Gemini 함수 선언 스키마로 변환
+    속성이 정해지지 않은 object(예: MongoDB 조건)는 JSON 문자열로 받도록 바꿈
+    """
+    kind = schema.get("type", "string")
+    out = {"type": SCHEMA_TYPES[kind]}
+    description = schema.get("description", "")
+    if kind == "object" and not schema.get("properties"):
+        out["type"] = "STRING"
+        description = (description + " (JSON 문자열)").strip()
+    elif kind == "object":
+        out["properties"] = {name: to_gemini_schema(sub) for name, sub in schema["properties"].items()}
+        if schema.get("required"):
+            out["required"] = list(schema["required"])
+    elif kind == "array":
+        out["items"] = to_gemini_schema(schema.get("items", {"type": "string"}))
+    if schema.get("enum"):
+        out["enum"] = list(schema["enum"])
+    if description:
+        out["description"] = description
+    return out
+
+
+def function_declarations(specs):
+    return [
+        {
+            "name": spec["name"],
+            "description": spec["description"],
+            "parameters": to_gemini_schema(spec["parameters"]),
+        }
+        for spec in sorted(specs, key=lambda spec: spec["name"])
+    ]
+
+
+def to_plain(value):
+    # proto MapComposite/RepeatedComposite 값을 dict/list로 변환
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "items"):
+        return {k: to_plain(v) for k, v in value.items()}
+    return [to_plain(v) for v in value]
+
+
+def loads_json_arg(value):
+    try:
+        return json.loads(value) if value.strip() else None
+    except ValueError:
+        return value
+
+
+def call_to_intent(spec, args):
+    """
+    함수 호출 인자를 executor가 받는 intent(dict)로 변환
+    스키마 기준으로 정수/JSON 문자열 인자를 원래 타입으로 되돌림
+    """
+    intent = {"tool": spec["name"]}
+    properties = spec["parameters"].get("properties", {})
+    for name, value in (args or {}).items():
+        schema = properties.get(name, {})
+        kind = schema.get("type")
+        if kind == "integer" and isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif kind == "object" and not schema.get("properties") and isinstance(value, str):
+            value = loads_json_arg(value)
+        elif kind == "array" and isinstance(value, list):
+            items = schema.get("items", {})
+            if items.get("type") == "object" and not items.get("properties"):
+                # 속성 없는 object 배열(예: MongoDB 문서 목록)은 원소마다 JSON 문자열로 받음
+                value = [loads_json_arg(v) if isinstance(v, str) else v for v in value]
+        intent[name] = value
+    return intent
+
+
+def prefix_fingerprint(prefix):
+    return hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+
+
+def normalize_input(text):
+    # 대소문자/공백/끝 문장부호 차이는 같은 요청으로 취급
+    text = re.sub(r"\s+", " ", (text or "").strip().lower())
+    return text.rstrip(" ?!.~")
+
+
+class PlanCache:
+    """
+    정규화된 입력 -> 도구 계획(intent 리스트) LRU + TTL 캐시
+    """
+    def __init__(self, max_entries=PLAN_CACHE_SIZE, ttl=PLAN_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, plan = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return copy.deepcopy(plan)
+
+    def put(self, key, plan):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(plan))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def resolve_ticker(name):
+    name = name.strip()
+    if name in TICKER_MAP:
+        return TICKER_MAP[name]
+    # "gold", "oil" 같은 일반 단어가 다른 종목(GOLD 등)으로 바뀌지 않도록, 원문이 이미 대문자인 티커만 인정
+    if name.isascii() and name.isupper() and TICKER_RE.match(name):
+        return name
+    return None
+
+
+def strip_keyword(text, keywords):
+    for keyword in keywords:
+        if text.endswith(keyword):
+            return text[: -len(keyword)].strip(), True
+    return text, False
+
+
+def split_keywords(text):
+    """
+    끝에 붙은 주가/뉴스 키워드를 (사이의 "와", "및" 같은 접속어와 함께) 모두 떼어냄
+    반환: (남은 주제, 매칭된 도구 집합) 예: "aapl 주가와 뉴스" -> ("aapl", {"stock", "news"})
+    """
+    found = set()
+    while True:
+        text = text.rstrip(" ,")
+        for tool, keywords in (("stock", STOCK_KEYWORDS), ("news", NEWS_KEYWORDS)):
+            rest, matched = strip_keyword(text, keywords)
+            if matched:
+                found.add(tool)
+                text = rest
+                break
+        else:
+            # 접속어는 바로 앞이 키워드일 때만 떼어냄 (주제 끝 글자를 잘못 지우지 않도록)
+            for connector in MIXED_CONNECTORS:
+                head = text[: -len(connector)].rstrip(" ,")
+                if text.endswith(connector) and head.endswith(STOCK_KEYWORDS + NEWS_KEYWORDS):
+                    text = head
+                    break
+            else:
+                return text.strip(), found
+
+
+def rule_based_plan(user_input, available=None):
+    """
+    확실한 패턴만 규칙으로 처리하고, 애매하면 None을 반환해 LLM 플래너에 맡김
+    - "AAPL 주가", "삼성전자 시세" -> stock
+    - "뉴스", "최신 뉴스", "애플 뉴스" -> news
+    - "AAPL 주가 뉴스", "삼성전자 주가와 뉴스" -> stock + news
+    available: 사용 가능한 도구 이름 집합 (None이면 제한 없음)
+    """
+    text = re.sub(r"\s+", " ", (user_input or "").strip()).rstrip(" ?!.~")
+    if not text or len(text) > 40:
+        return None
+    lowered = text.lower()
+    rest, found = split_keywords(lowered)
+    if not found:
+        return None
+    # 주제 안에 다른 키워드가 남아 있으면(예: "주가 전망 뉴스") 일부 요청만 처리하게 되므로 LLM에 맡김
+    if any(keyword in rest for keyword in STOCK_KEYWORDS + NEWS_KEYWORDS):
+        return None
+    # 필요한 도구를 하나라도 쓸 수 없으면 LLM 플래너가 대안을 고르도록 함
+    if available is not None and not found <= set(available):
+        return None
+
+    if "stock" in found:
+        ticker = resolve_ticker(text[: len(rest)]) if rest else None
+        if not ticker:
+            return None
+        plan = [{"tool": "stock", "ticker": ticker, "summary": True, "chart": True}]
+        if "news" in found:
+            plan.append({"tool": "news", "keyword": text[: len(rest)].strip()})
+        return plan
+
+    rest, _ = strip_keyword(rest, ("최신", "오늘", "요즘"))
+    original = text[: len(rest)].strip()
+    # 기간/비교 등 추가 조건이 붙은 요청은 LLM에 맡김
+    if len(original.split()) <= 2 and not re.search(r"\d|와|과|및|그리고|비교", original):
+        return [{"tool": "news", "keyword": original}]
+    return None
+
+
+class IntentStreamParser:
+    """
+    플래너 출력(JSON 배열)을 조각 단위로 받아, 배열 원소 객체가 닫히는 즉시 dict로 돌려주는 증분 파서
+    배열 앞뒤의 설명/코드블록 표시는 무시하며, 문자열 안의 괄호와 이스케이프를 구분함
+        parser = IntentStreamParser()
+        for chunk in stream:
+            for intent in parser.feed(chunk): ...
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0            # 다음에 검사할 buffer 위치
+        self.started = False    # 배열 시작 '['를 만났는지
+        self.closed = False     # 배열 끝 ']'를 만났는지
+        self.depth = 0          # 배열 원소 내부의 괄호 깊이
+        self.in_string = False
+        self.escape = False
+        self.item_start = None
+        self.items = []
+        self.errors = 0         # 파싱에 실패한 원소 수
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        while self.pos < len(buffer) and not self.closed:
+            ch = buffer[self.pos]
+            if not self.started:
+                # 배열 시작 전의 설명/코드블록 표시는 건너뜀
+                # "Plan [note]:"처럼 설명 속 대괄호와 구분하기 위해 '[' 다음 공백이 아닌 문자가 '{' 또는 ']'일 때만 배열로 봄
+                if ch == "[":
+                    rest = buffer[self.pos + 1:].lstrip()
+                    if not rest:
+                        # 다음 문자가 아직 도착하지 않았으면 '['부터 다시 검사하도록 다음 조각을 기다림
+                        break
+                    if rest[0] in "{]":
+                        self.started = True
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 0:
+                    self.item_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 0:
+                    if ch == "]":
+                        self.closed = True
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        item = self.parse_item(buffer[self.item_start:self.pos + 1])
+                        if item is not None:
+                            completed.append(item)
+            self.pos += 1
+        if self.depth == 0:
+            # 완성된 원소까지의 텍스트는 더 필요 없으므로 버퍼를 비워 긴 응답에서도 재검사 비용이 없게 함
+            self.buffer = buffer[self.pos:]
+            self.pos = 0
+        self.items.extend(completed)
+        return completed
+
+    def parse_item(self, text):
+        try:
+            item = json.loads(text)
+        except ValueError:
+            self.errors += 1
+            return None
+        if not isinstance(item, dict):
+            self.errors += 1
+            return None
+        return item
+
+    @property
+    def complete(self):
+        # 배열이 정상적으로 닫혔고 깨진 원소가 없을 때만 True (캐시 저장 기준)
+        return self.closed and not self.errors
+
+
+class PlannerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"cache_hits": 0, "rule_hits": 0, "llm_calls": 0, "llm_retries": 0, "llm_failures": 0}
+
+    def incr(self, key, value=1):
+        with self.lock:
+            self.counts[key] += value
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        total = counts["cache_hits"] + counts["rule_hits"] + counts["llm_calls"]
+        avoided = counts["cache_hits"] + counts["rule_hits"]
+        counts["requests"] = total
+        counts["avoided_rate"] = avoided / total if total else 0.0
+        return counts
+
+
+plan_cache = PlanCache()
+planner_stats = PlannerStats()
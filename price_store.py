@@ -0,0 +1,353 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+import yfinance as yf
+from tracing import span
+
+# 로컬 시세 저장소: (ticker, interval)별 OHLCV를 SQLite에 저장하고, 없는 구간만 yfinance에서 받아 병합
+CACHE_DIR = os.getenv("JARVIS_CACHE_DIR", ".cache")
+DB_PATH = os.path.join(CACHE_DIR, "prices.sqlite3")
+
+# 최근 구간(아직 확정되지 않은 봉)의 유효 시간(초)
+INTRADAY_TTL = int(os.getenv("PRICE_INTRADAY_TTL", "60"))
+EOD_TTL = int(os.getenv("PRICE_EOD_TTL", "3600"))
+# 빈 응답(휴장일일 수도, 네트워크/요청 제한 오류일 수도 있음)을 다시 받지 않는 시간(초)
+EMPTY_TTL = int(os.getenv("PRICE_EMPTY_TTL", "300"))
+
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def key_lock(ticker, interval):
+    # 같은 (ticker, interval)만 직렬화하고, 다른 종목은 동시에 받을 수 있게 함
+    with _locks_guard:
+        return _locks.setdefault((ticker, interval), threading.Lock())
+
+
+def connect():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS bars (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            open REAL, high REAL, low REAL, close REAL, adj_close REAL, volume REAL,
+            PRIMARY KEY (ticker, interval, ts)
+        );
+        CREATE TABLE IF NOT EXISTS coverage (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            start TEXT NOT NULL,
+            end TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS empty_ranges (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            start TEXT NOT NULL,
+            end TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS series (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            tz TEXT,
+            PRIMARY KEY (ticker, interval)
+        );
+    """)
+    return conn
+
+
+def is_intraday(interval):
+    return interval in INTRADAY_INTERVALS
+
+
+def volatile_from(interval, today=None):
+    """
+    이 날짜(포함) 이후의 봉은 아직 바뀔 수 있으므로 TTL이 지나면 다시 받음
+    - 분/시간봉, 일봉: 오늘
+    - 주봉: 이번 주 월요일, 월봉: 이번 달 1일
+    """
+    today = today or datetime.now().date()
+    if interval == "1wk":
+        return today - timedelta(days=today.weekday())
+    if interval in ("1mo", "3mo"):
+        return today.replace(day=1)
+    return today
+
+
+def ttl_for(interval):
+    return INTRADAY_TTL if is_intraday(interval) else EOD_TTL
+
+
+def to_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def align_range(start, end, interval):
+    # 주봉/월봉은 봉 경계(월요일, 1일)에 맞춰 받아야 부분 봉이 생기지 않음
+    if interval == "1wk":
+        start = start - timedelta(days=start.weekday())
+        if end.weekday():
+            end = end + timedelta(days=7 - end.weekday())
+    elif interval in ("1mo", "3mo"):
+        start = start.replace(day=1)
+        if end.day != 1:
+            end = (end.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def bar_end(day, interval):
+    # day에 시작한 봉이 끝나는 날짜(미포함)
+    if interval == "1wk":
+        return day + timedelta(days=7)
+    if interval in ("1mo", "3mo"):
+        months = 3 if interval == "3mo" else 1
+        year, month = divmod(day.month - 1 + months, 12)
+        return day.replace(year=day.year + year, month=month + 1, day=1)
+    return day + timedelta(days=1)
+
+
+def subtract_ranges(start, end, covered):
+    # [start, end) 구간에서 covered 구간들을 뺀 나머지(받아야 할 구간) 목록
+    missing = []
+    cursor = start
+    for c_start, c_end in sorted(covered):
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, min(c_start, end)))
+        cursor = max(cursor, c_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def covered_ranges(conn, ticker, interval, now=None):
+    now = now or time.time()
+    ttl = ttl_for(interval)
+    rows = conn.execute(
+        "SELECT start, end, fetched_at FROM coverage WHERE ticker=? AND interval=?",
+        (ticker, interval),
+    ).fetchall()
+    ranges = []
+    for start, end, fetched_at in rows:
+        c_start, c_end = to_date(start), to_date(end)
+        # 받은 시점에 이미 확정돼 있던 봉만 계속 유효하고, 그때 진행 중이던 봉(그날/그 주/그 달)과
+        # 그 이후 구간은 TTL 안에서만 유효 (날짜가 바뀌어 확정된 뒤에도 부분 봉이 남지 않도록 다시 받음)
+        if now - fetched_at >= ttl:
+            c_end = min(c_end, volatile_from(interval, datetime.fromtimestamp(fetched_at).date()))
+        if c_start < c_end:
+            ranges.append((c_start, c_end))
+    # 빈 응답 구간은 EMPTY_TTL 동안만 다시 받지 않음
+    rows = conn.execute(
+        "SELECT start, end FROM empty_ranges WHERE ticker=? AND interval=? AND expires_at>?",
+        (ticker, interval, now),
+    ).fetchall()
+    ranges.extend((to_date(start), to_date(end)) for start, end in rows)
+    return ranges
+
+
+def flatten_columns(data):
+    # 멀티인덱스(예: ('Close', 'AAPL')) 컬럼을 단일 필드명으로 정리
+    if not isinstance(data.columns, pd.MultiIndex):
+        return data
+    out = {}
+    for field in FIELDS:
+        candidates = [col for col in data.columns if col[0] == field]
+        if candidates:
+            out[field] = data[candidates[0]]
+    return pd.DataFrame(out, index=data.index)
+
+
+def index_to_ns(index):
+    # pandas 버전에 따라 내부 해상도(ns/us)가 달라지므로 ns 정수로 통일
+    tz = str(index.tz) if index.tz is not None else None
+    if tz:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.values.astype("datetime64[ns]").astype("int64"), tz
+
+
+def bound_to_ns(value, tz):
+    ts = pd.Timestamp(value)
+    if tz:
+        ts = ts.tz_localize(tz).tz_convert("UTC").tz_localize(None)
+    return int(ts.to_datetime64().astype("datetime64[ns]").astype("int64"))
+
+
+def save_bars(conn, ticker, interval, data):
+    data = flatten_columns(data)
+    if data.empty:
+        return
+    ns, tz = index_to_ns(pd.DatetimeIndex(data.index))
+    columns = [data[f] if f in data.columns else pd.Series(float("nan"), index=data.index) for f in FIELDS]
+    rows = [
+        (ticker, interval, int(t), *[None if pd.isna(v) else float(v) for v in vals])
+        for t, *vals in zip(ns, *columns)
+    ]
+    conn.executemany(
+        "INSERT OR REPLACE INTO bars (ticker, interval, ts, open, high, low, close, adj_close, volume) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO series (ticker, interval, tz) VALUES (?, ?, ?)",
+        (ticker, interval, tz),
+    )
+
+
+def save_coverage(conn, ticker, interval, start, end, fetched_at):
+    # 새 구간에 완전히 포함되는 기존 기록은 정리
+    conn.execute(
+        "DELETE FROM coverage WHERE ticker=? AND interval=? AND start>=? AND end<=?",
+        (ticker, interval, start.isoformat(), end.isoformat()),
+    )
+    conn.execute(
+        "INSERT INTO coverage (ticker, interval, start, end, fetched_at) VALUES (?, ?, ?, ?, ?)",
+        (ticker, interval, start.isoformat(), end.isoformat(), fetched_at),
+    )
+
+
+def save_empty(conn, ticker, interval, start, end, now):
+    conn.execute("DELETE FROM empty_ranges WHERE expires_at<=?", (now,))
+    conn.execute(
+        "INSERT INTO empty_ranges (ticker, interval, start, end, expires_at) VALUES (?, ?, ?, ?, ?)",
+        (ticker, interval, start.isoformat(), end.isoformat(), now + EMPTY_TTL),
+    )
+
+
+def read_bars(conn, ticker, interval, start, end):
+    row = conn.execute(
+        "SELECT tz FROM series WHERE ticker=? AND interval=?", (ticker, interval)
+    ).fetchone()
+    tz = row[0] if row else None
+    rows = conn.execute(
+        "SELECT ts, open, high, low, close, adj_close, volume FROM bars "
+        "WHERE ticker=? AND interval=? AND ts>=? AND ts<? ORDER BY ts",
+        (ticker, interval, bound_to_ns(start, tz), bound_to_ns(end, tz)),
+    ).fetchall()
+    if not rows:
+        return pd.DataFrame(columns=FIELDS)
+    frame = pd.DataFrame(rows, columns=["ts"] + FIELDS)
+    index = pd.DatetimeIndex(frame.pop("ts").to_numpy().astype("datetime64[ns]"), name="Date")
+    if tz:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    frame.index = index
+    if frame["Adj Close"].isna().all():
+        frame = frame.drop(columns=["Adj Close"])
+    return frame
+
+
+def download(tickers, start, end, interval):
+    # 여러 종목은 한 번의 요청으로 받음 (컬럼: (필드, 티커) 멀티인덱스)
+    target = tickers[0] if len(tickers) == 1 else tickers
+    with span("yfinance", tickers=len(tickers), interval=interval) as s:
+        data = yf.download(target, start=start.isoformat(), end=end.isoformat(), interval=interval, progress=False)
+        s.attrs["rows"] = len(data)
+    return data
+
+
+def split_by_ticker(data, ticker):
+    if isinstance(data.columns, pd.MultiIndex) and data.columns.nlevels > 1:
+        if ticker in data.columns.get_level_values(1):
+            return data.xs(ticker, axis=1, level=1).dropna(how="all")
+        return None
+    return data
+
+
+def get_prices_many(tickers, start, end, interval="1d", fetch=download):
+    """
+    여러 종목의 [start, end) 구간 시세를 {ticker: DataFrame}으로 반환
+    종목별로 없는 구간을 계산하고, 같은 구간이 빠진 종목끼리 묶어 한 번에 받음
+    start, end: 'YYYY-MM-DD'
+    """
+    tickers = list(dict.fromkeys(tickers))
+    start_d, end_d = to_date(start), to_date(end)
+    if end_d <= start_d:
+        end_d = start_d + timedelta(days=1)
+    # 교착을 피하기 위해 항상 같은 순서로 잠금
+    locks = [key_lock(t, interval) for t in sorted(tickers)]
+    for lock in locks:
+        lock.acquire()
+    conn = connect()
+    try:
+        groups = {}
+        for ticker in tickers:
+            missing = subtract_ranges(start_d, end_d, covered_ranges(conn, ticker, interval))
+            for m_start, m_end in missing:
+                groups.setdefault(align_range(m_start, m_end, interval), []).append(ticker)
+        for (m_start, m_end), group in groups.items():
+            fetched_at = time.time()
+            data = fetch(group, m_start, m_end, interval)
+            if data is None or data.empty:
+                # 휴장일인지 일시적 오류인지 구분할 수 없으므로 커버리지로 남기지 않고 짧게만 다시 받지 않음
+                for ticker in group:
+                    save_empty(conn, ticker, interval, m_start, m_end, fetched_at)
+                continue
+            for ticker in group:
+                part = split_by_ticker(data, ticker)
+                if part is not None and "Close" in part.columns:
+                    part = part[part["Close"].notna()]
+                if part is None or part.empty:
+                    # 묶음 요청에서 빠졌거나 값이 모두 비어 있는 종목은 실패로 보고 다음 요청에서 다시 받음
+                    continue
+                save_bars(conn, ticker, interval, part)
+                # 받은 마지막 봉까지만 커버리지로 기록 (그 뒤 구간은 아직 데이터가 없거나 받지 못한 것일 수 있음)
+                last = pd.DatetimeIndex(part.index)[-1].date()
+                covered_end = min(m_end, bar_end(last, interval))
+                save_coverage(conn, ticker, interval, m_start, covered_end, fetched_at)
+                if covered_end < m_end:
+                    save_empty(conn, ticker, interval, covered_end, m_end, fetched_at)
+        conn.commit()
+        # 받을 때와 같이 봉 경계에 맞춰 읽어야 start가 속한 주봉/월봉이 빠지지 않음
+        read_start, _ = align_range(start_d, end_d, interval)
+        return {ticker: read_bars(conn, ticker, interval, read_start, end_d) for ticker in tickers}
+    finally:
+        conn.close()
+        for lock in locks:
+            lock.release()
+
+
+def get_prices(ticker, start, end, interval="1d", fetch=download):
+    """
+    [start, end) 구간 시세를 반환. 저장소에 없는 구간만 fetch로 받아 저장 후 함께 반환
+    start, end: 'YYYY-MM-DD'
+    """
+    return get_prices_many([ticker], start, end, interval, fetch=fetch)[ticker]
+
+
+def combine(frames):
+    # {ticker: 단일 컬럼 DataFrame}을 yfinance와 같은 (필드, 티커) 멀티인덱스 프레임으로 합침
+    frames = {t: f for t, f in frames.items() if not f.empty}
+    if not frames:
+        return pd.DataFrame()
+    combined = pd.concat(frames, axis=1)
+    return combined.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+def clear(ticker=None, interval=None):
+    with _locks_guard:
+        conn = connect()
+        try:
+            for table in ("bars", "coverage", "empty_ranges", "series"):
+                if ticker and interval:
+                    conn.execute(f"DELETE FROM {table} WHERE ticker=? AND interval=?", (ticker, interval))
+                elif ticker:
+                    conn.execute(f"DELETE FROM {table} WHERE ticker=?", (ticker,))
+                else:
+                    conn.execute(f"DELETE FROM {table}")
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,136 @@
+import os
+import ast
+import time
+import importlib
+import threading
+from collections.abc import Mapping
+from dotenv import load_dotenv
+
+# 도구 모듈을 import하지 않고 TOOL_SPEC만 읽어 등록, 실제 import는 도구를 처음 실행할 때 수행
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# (검색 디렉터리, 모듈 이름 접두사): tools/ 패키지를 우선하고, 없으면 앱 디렉터리의 도구 모듈 사용
+TOOL_PATHS = [
+    (os.path.join(APP_DIR, "tools"), "tools."),
+    (APP_DIR, ""),
+]
+
+
+def missing_env(spec):
+    # TOOL_SPEC의 requires_env 중 설정되지 않은 환경 변수 목록 (API 키가 없으면 도구를 쓸 수 없음)
+    load_dotenv()
+    return [key for key in spec.get("requires_env", []) if not os.getenv(key)]
+
+
+def read_tool_spec(path):
+    """
+    파이썬 파일에서 최상위 TOOL_SPEC = {...} 리터럴을 AST로 읽음 (코드 실행/의존성 import 없음)
+    TOOL_SPEC이 없거나 리터럴이 아니면 None
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, UnicodeDecodeError):
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "TOOL_SPEC" for target in node.targets
+        ):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+
+class LazyTool:
+    """
+    도구 모듈 대리 객체: TOOL_SPEC은 바로 제공하고, 그 외 속성(run 등)에 처음 접근할 때 모듈을 import
+    """
+    def __init__(self, name, module_name, spec):
+        self.name = name
+        self.module_name = module_name
+        self.TOOL_SPEC = spec
+        self._module = None
+        self._lock = threading.Lock()
+        self.import_ms = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    try:
+                        module = importlib.import_module(self.module_name)
+                    except Exception as e:
+                        self.error = f"{type(e).__name__}: {e}"
+                        raise
+                    finally:
+                        self.import_ms = (time.perf_counter() - start) * 1000
+                    self.error = None
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        # __init__에서 설정한 속성은 여기로 오지 않음
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+
+class ToolRegistry(Mapping):
+    """
+    도구 이름 -> LazyTool 매핑 (기존 tools dict와 같은 방식으로 사용)
+    """
+    def __init__(self, paths=TOOL_PATHS):
+        self.tools = {}
+        self.discover_ms = 0.0
+        start = time.perf_counter()
+        for directory, prefix in paths:
+            if not os.path.isdir(directory):
+                continue
+            for fname in sorted(os.listdir(directory)):
+                if not fname.endswith(".py") or fname.startswith("__"):
+                    continue
+                spec = read_tool_spec(os.path.join(directory, fname))
+                if not spec or spec.get("name") in self.tools:
+                    continue
+                self.tools[spec["name"]] = LazyTool(spec["name"], prefix + fname[:-3], spec)
+        self.discover_ms = (time.perf_counter() - start) * 1000
+
+    def __getitem__(self, name):
+        return self.tools[name]
+
+    def __iter__(self):
+        return iter(self.tools)
+
+    def __len__(self):
+        return len(self.tools)
+
+    def specs(self):
+        # 필요한 API 키가 설정된 도구만 플래너/함수 선언에 노출
+        return [tool.TOOL_SPEC for tool in self.tools.values() if not missing_env(tool.TOOL_SPEC)]
+
+    def unavailable(self):
+        return {
+            name: missing for name, tool in self.tools.items()
+            if (missing := missing_env(tool.TOOL_SPEC))
+        }
+
+    def preload(self, names=None):
+        # 백그라운드 예열용: import 실패는 기록만 하고 넘어감
+        for name in names or list(self.tools):
+            try:
+                self.tools[name].load()
+            except Exception:
+                pass
+
+    def import_stats(self):
+        return {
+            name: {"loaded": tool.loaded, "import_ms": tool.import_ms, "error": tool.error}
+            for name, tool in self.tools.items()
+        }
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from tracing import annotate
+
+# serp/tavily/news 외부 API 응답 공유 캐시: 메모리 LRU + TTL, 선택적 디스크(SQLite) 계층, 동일 요청 단일 호출(single-flight)
+CACHE_DIR = os.getenv("JARVIS_CACHE_DIR", ".cache")
+DB_PATH = os.path.join(CACHE_DIR, "responses.sqlite3")
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_DISK = os.getenv("RESPONSE_CACHE_DISK", "0") == "1"
+
+
+def make_key(namespace, params):
+    # API 키 등 요청 결과와 무관한 값은 호출하는 쪽에서 params에서 제외
+    body = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha1(body.encode('utf-8')).hexdigest()}"
+
+
+class DiskTier:
+    """
+    프로세스 재시작/여러 워커 간에 응답을 공유하는 SQLite 계층
+    값은 JSON으로 저장하므로 JSON 직렬화 가능한 응답만 저장
+    """
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    value TEXT NOT NULL
+                )
+            """)
+        return self.conn
+
+    def get(self, key):
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], row[1]
+
+    def put(self, key, expires_at, body):
+        with self.lock:
+            conn = self.connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, body),
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+
+    def clear(self):
+        with self.lock:
+            conn = self.connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+
+class ResponseCache:
+    """
+    key -> 응답 LRU + TTL 캐시
+    - 같은 key로 동시에 들어온 요청은 첫 요청의 외부 호출 결과를 함께 기다림
+    - 외부 호출이 예외를 내면 캐시하지 않고 기다리던 요청 모두에 예외를 전달
+    """
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, disk=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "bytes_saved": 0}
+
+    def lookup(self, key):
+        # 호출 전 self.lock 보유
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, size = entry
+        if expires_at < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value, size
+
+    def store(self, key, expires_at, value, size):
+        # 호출 전 self.lock 보유
+        self.entries[key] = (expires_at, value, size)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_or_fetch(self, namespace, params, fetch, ttl=None, cache_if=None):
+        """
+        namespace: "serp", "tavily", "news" 등 API 구분
+        params: 응답을 결정하는 요청 인자 (dict)
+        fetch(): 캐시에 없을 때 외부 API를 호출해 응답을 반환
+        cache_if(value): False면 응답을 돌려주기만 하고 저장하지 않음 (API 오류 응답 등)
+        """
+        key = make_key(namespace, params)
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            found = self.lookup(key)
+            if found is not None:
+                self.counts["hits"] += 1
+                self.counts["bytes_saved"] += found[1]
+                annotate(cache="hit", cache_bytes=found[1])
+                return found[0]
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inflight[key] = future
+            else:
+                self.counts["coalesced"] += 1
+        if not leader:
+            annotate(cache="coalesced")
+            return future.result()
+
+        try:
+            value = self.fetch_through(key, fetch, ttl, cache_if)
+        except BaseException as e:
+            with self.lock:
+                self.counts["errors"] += 1
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.inflight[key]
+        future.set_result(value)
+        return value
+
+    def fetch_through(self, key, fetch, ttl, cache_if=None):
+        if self.disk is not None:
+            found = self.disk.get(key)
+            if found is not None:
+                expires_at, body = found
+                value = json.loads(body)
+                annotate(cache="disk_hit", cache_bytes=len(body))
+                with self.lock:
+                    self.counts["disk_hits"] += 1
+                    self.counts["bytes_saved"] += len(body)
+                    self.store(key, expires_at, value, len(body))
+                return value
+        annotate(cache="miss")
+        value = fetch()
+        if cache_if is not None and not cache_if(value):
+            with self.lock:
+                self.counts["misses"] += 1
+            return value
+        body = json.dumps(value, ensure_ascii=False, default=str)
+        expires_at = time.time() + ttl
+        with self.lock:
+            self.counts["misses"] += 1
+            self.store(key, expires_at, value, len(body))
+        if self.disk is not None:
+            try:
+                self.disk.put(key, expires_at, body)
+            except sqlite3.Error:
+                # 디스크 계층 실패는 응답에 영향을 주지 않음
+                pass
+        return value
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+            counts["entries"] = len(self.entries)
+        total = counts["hits"] + counts["disk_hits"] + counts["coalesced"] + counts["misses"]
+        counts["hit_rate"] = (total - counts["misses"]) / total if total else 0.0
+        return counts
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+response_cache = ResponseCache(disk=DiskTier() if RESPONSE_CACHE_DISK else None)
@@ -1,11 +1,144 @@
 # tools/serp.py
 import os
-from serpapi import GoogleSearch
+from response_cache import response_cache
+from transport import get_json
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+# 플래너 프롬프트/함수 호출 스키마에 쓰이는 도구 명세 (import 없이 읽을 수 있도록 리터럴로 유지)
+TOOL_SPEC = {
+    "name": "serp",
+    "description": "다양한 검색 유형(search_type)과 쿼리(query)를 받아, 구글/유튜브 등에서 실시간 검색 결과, 뉴스, 이미지, 동영상, 학술논문, 즉답 박스, 지식 그래프, 함께 묻는 질문 등 특화된 정보를 제공합니다.",
+    "requires_env": ["SERPAPI_API_KEY"],
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "검색 질의"},
+            "search_type": {"type": "string", "description": "검색 유형: web, news, images, videos, scholar, answer_box, knowledge_graph, people_also_ask (여러 개는 쉼표로 구분)"},
+        },
+        "required": ["query"],
+    },
+    "guidelines": [
+        "같은 질의에 여러 검색 유형이 필요하면 serp 명령을 나누지 말고 search_type에 쉼표로 함께 지정하세요.",
+    ],
+    "examples": [
+        {"tool": "serp", "query": "2025년 AI 트렌드", "search_type": "news"},
+        {"tool": "serp", "query": "파이썬 GIL", "search_type": "web,answer_box,people_also_ask"},
+    ],
+}
+
+# 검색 유형 -> SerpAPI engine (answer_box/knowledge_graph/people_also_ask는 web과 같은 google 응답에서 추출)
+ENGINES = {
+    "web": "google",
+    "answer_box": "google",
+    "knowledge_graph": "google",
+    "people_also_ask": "google",
+    "news": "google_news",
+    "images": "google_images",
+    "videos": "youtube",
+    "scholar": "google_scholar",
+}
+
+def parse_search_types(search_type):
+    # "web,answer_box" 또는 ["web", "answer_box"] 모두 허용, 순서 유지하며 중복 제거
+    if not search_type:
+        return ["web"]
+    if isinstance(search_type, str):
+        search_type = search_type.split(",")
+    types = []
+    for t in search_type:
+        t = str(t).strip()
+        if t and t not in types:
+            types.append(t)
+    return types or ["web"]
+
+def fetch_engine(engine, query, api_key, location, hl, gl, num):
+    params = {
+        "q": query,
+        "api_key": api_key,
+        "location": location,
+        "hl": hl,
+        "gl": gl,
+        "num": num,
+        "engine": engine,
+    }
+    # 같은 질의는 공유 캐시에서 재사용 (API 키는 캐시 키에서 제외, 오류 응답은 저장하지 않음)
+    return response_cache.get_or_fetch(
+        "serp",
+        {k: v for k, v in params.items() if k != "api_key"},
+        lambda: get_json(SERPAPI_URL, params),
+        cache_if=lambda results: "error" not in results,
+    )
+
+def format_items(items, num, title_key="title", link_key="link", snippet_key="snippet", default_title="제목 없음"):
+    lines = []
+    for idx, item in enumerate(items[:num], 1):
+        title = item.get(title_key, default_title)
+        link = item.get(link_key, "")
+        if snippet_key:
+            lines.append(f"{idx}. {title}\n{item.get(snippet_key, '')}\n{link}")
+        else:
+            lines.append(f"{idx}. {title}\n{link}")
+    return "\n\n".join(lines)
+
+def extract_view(search_type, results, query, num):
+    # 하나의 engine 응답에서 search_type에 해당하는 부분만 문자열로 변환
+    # 특수 SERP 박스 추출
+    if search_type == "answer_box":
+        answer_box = results.get("answer_box")
+        if answer_box:
+            answer = answer_box.get("answer") or answer_box.get("snippet") or answer_box.get("title")
+            return f"[Answer Box]\n{answer}"
+        else:
+            return "Answer Box(즉답 박스) 정보를 찾을 수 없습니다."
+    elif search_type == "knowledge_graph":
+        kg = results.get("knowledge_graph")
+        if kg:
+            lines = [f"{k}: {v}" for k, v in kg.items()]
+            return "[Knowledge Graph]\n" + "\n".join(lines)
+        else:
+            return "Knowledge Graph 정보를 찾을 수 없습니다."
+    elif search_type == "people_also_ask":
+        paa = results.get("related_questions") or results.get("people_also_ask")
+        if paa:
+            lines = [f"- {q.get('question')}" for q in paa if 'question' in q]
+            return "[People Also Ask]\n" + "\n".join(lines)
+        else:
+            return "People Also Ask(함께 묻는 질문) 정보를 찾을 수 없습니다."
+
+    # 일반 결과(웹, 뉴스, 이미지, 동영상, 학술)
+    if search_type == "news":
+        news_results = results.get("news_results", [])
+        if not news_results:
+            return f"'{query}'에 대한 뉴스 검색 결과를 찾을 수 없습니다."
+        return format_items(news_results, num)
+    elif search_type == "images":
+        images = results.get("images_results", [])
+        if not images:
+            return f"'{query}'에 대한 이미지 검색 결과를 찾을 수 없습니다."
+        return format_items(images, num, link_key="original", snippet_key=None, default_title="이미지")
+    elif search_type == "videos":
+        videos = results.get("video_results", [])
+        if not videos:
+            return f"'{query}'에 대한 동영상 검색 결과를 찾을 수 없습니다."
+        return format_items(videos, num, snippet_key="description", default_title="동영상")
+    elif search_type == "scholar":
+        scholar = results.get("organic_results", [])
+        if not scholar:
+            return f"'{query}'에 대한 학술 검색 결과를 찾을 수 없습니다."
+        return format_items(scholar, num)
+    else:  # 기본: 웹검색
+        organic = results.get("organic_results", [])
+        if not organic:
+            return f"'{query}'에 대한 검색 결과를 찾을 수 없습니다."
+        return format_items(organic, num)
 
 def run(query=None, search_type="web", location="South Korea", hl="ko", gl="kr", num=5):
     """
     query: 검색할 자연어 질의
     search_type: 'web'(기본), 'news', 'images', 'videos', 'scholar', 'answer_box', 'knowledge_graph', 'people_also_ask'
+                 여러 유형은 리스트 또는 쉼표로 구분 (예: "web,answer_box,people_also_ask")
+                 같은 engine을 쓰는 유형은 한 번의 SerpAPI 호출 결과에서 모두 추출
     location: 검색 위치(예: 'South Korea')
     hl: 언어 코드(예: 'ko')
     gl: 국가 코드(예: 'kr')
@@ -17,105 +150,14 @@ def run(query=None, search_type="web", location="South Korea", hl="ko", gl="kr",
     if not query or not query.strip():
         return "검색할 쿼리를 입력해 주세요."
     try:
-        params = {
-            "q": query,
-            "api_key": api_key,
-            "location": location,
-            "hl": hl,
-            "gl": gl,
-            "num": num
-        }
-        # 검색 엔진/타입 지정
-        if search_type == "news":
-            params["engine"] = "google_news"
-        elif search_type == "images":
-            params["engine"] = "google_images"
-        elif search_type == "videos":
-            params["engine"] = "youtube"
-        elif search_type == "scholar":
-            params["engine"] = "google_scholar"
-        else:
-            params["engine"] = "google"
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        
-        # 특수 SERP 박스 추출
-        if search_type == "answer_box":
-            answer_box = results.get("answer_box")
-            if answer_box:
-                answer = answer_box.get("answer") or answer_box.get("snippet") or answer_box.get("title")
-                return f"[Answer Box]\n{answer}"
-            else:
-                return "Answer Box(즉답 박스) 정보를 찾을 수 없습니다."
-        elif search_type == "knowledge_graph":
-            kg = results.get("knowledge_graph")
-            if kg:
-                lines = [f"{k}: {v}" for k, v in kg.items()]
-                return "[Knowledge Graph]\n" + "\n".join(lines)
-            else:
-                return "Knowledge Graph 정보를 찾을 수 없습니다."
-        elif search_type == "people_also_ask":
-            paa = results.get("related_questions") or results.get("people_also_ask")
-            if paa:
-                lines = [f"- {q.get('question')}" for q in paa if 'question' in q]
-                return "[People Also Ask]\n" + "\n".join(lines)
-            else:
-                return "People Also Ask(함께 묻는 질문) 정보를 찾을 수 없습니다."
-        
-        # 일반 결과(웹, 뉴스, 이미지, 동영상, 학술)
-        if search_type == "news":
-            news_results = results.get("news_results", [])
-            if not news_results:
-                return f"'{query}'에 대한 뉴스 검색 결과를 찾을 수 없습니다."
-            lines = []
-            for idx, item in enumerate(news_results[:num], 1):
-                title = item.get("title", "제목 없음")
-                link = item.get("link", "")
-                snippet = item.get("snippet", "")
-                lines.append(f"{idx}. {title}\n{snippet}\n{link}")
-            return "\n\n".join(lines)
-        elif search_type == "images":
-            images = results.get("images_results", [])
-            if not images:
-                return f"'{query}'에 대한 이미지 검색 결과를 찾을 수 없습니다."
-            lines = []
-            for idx, item in enumerate(images[:num], 1):
-                title = item.get("title", "이미지")
-                link = item.get("original", "")
-                lines.append(f"{idx}. {title}\n{link}")
-            return "\n\n".join(lines)
-        elif search_type == "videos":
-            videos = results.get("video_results", [])
-            if not videos:
-                return f"'{query}'에 대한 동영상 검색 결과를 찾을 수 없습니다."
-            lines = []
-            for idx, item in enumerate(videos[:num], 1):
-                title = item.get("title", "동영상")
-                link = item.get("link", "")
-                snippet = item.get("description", "")
-                lines.append(f"{idx}. {title}\n{snippet}\n{link}")
-            return "\n\n".join(lines)
-        elif search_type == "scholar":
-            scholar = results.get("organic_results", [])
-            if not scholar:
-                return f"'{query}'에 대한 학술 검색 결과를 찾을 수 없습니다."
-            lines = []
-            for idx, item in enumerate(scholar[:num], 1):
-                title = item.get("title", "제목 없음")
-                link = item.get("link", "")
-                snippet = item.get("snippet", "")
-                lines.append(f"{idx}. {title}\n{snippet}\n{link}")
-            return "\n\n".join(lines)
-        else:  # 기본: 웹검색
-            organic = results.get("organic_results", [])
-            if not organic:
-                return f"'{query}'에 대한 검색 결과를 찾을 수 없습니다."
-            lines = []
-            for idx, item in enumerate(organic[:num], 1):
-                title = item.get("title", "제목 없음")
-                link = item.get("link", "")
-                snippet = item.get("snippet", "")
-                lines.append(f"{idx}. {title}\n{snippet}\n{link}")
-            return "\n\n".join(lines)
+        search_types = parse_search_types(search_type)
+        responses = {}
+        sections = []
+        for t in search_types:
+            engine = ENGINES.get(t, "google")
+            if engine not in responses:
+                responses[engine] = fetch_engine(engine, query, api_key, location, hl, gl, num)
+            sections.append(extract_view(t, responses[engine], query, num))
+        return "\n\n".join(sections)
     except Exception as e:
         return f"검색 정보를 가져오는 중 오류 발생: {e}"
@@ -1,15 +1,44 @@
 import yfinance as yf
 from datetime import datetime
 import pandas as pd
-import matplotlib.pyplot as plt
-import io
-import base64
-
-# 한글 종목명 → 티커 매핑 (필요시 확장)
-TICKER_MAP = {
-    "삼성전자": "005930.KS",
-    "애플": "AAPL",
-    # 필요시 추가
+import numpy as np
+import price_store
+from tickers import TICKER_MAP
+import charts
+from artifacts import ToolOutput
+from indicators import indicator_cache
+
+# 플래너 프롬프트/함수 호출 스키마에 쓰이는 도구 명세 (import 없이 읽을 수 있도록 리터럴로 유지)
+TOOL_SPEC = {
+    "name": "stock",
+    "description": "주식 티커, 기간, 빈도, 이동평균선/RSI 기간 등을 받아 상세 시세, 기술적 지표, 요약, 차트 이미지를 제공합니다.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "ticker": {"type": "string", "description": "Yahoo Finance 티커 (예: 'AAPL', '005930.KS'). 여러 종목 비교 시 쉼표로 구분하거나 리스트로 전달"},
+            "start": {"type": "string", "description": "시작일 YYYY-MM-DD"},
+            "end": {"type": "string", "description": "종료일 YYYY-MM-DD"},
+            "interval": {"type": "string", "enum": ["1d", "1wk", "1mo"], "description": "빈도"},
+            "ma_window": {"type": "integer", "description": "이동평균선 기간"},
+            "rsi_window": {"type": "integer", "description": "RSI 기간"},
+            "summary": {"type": "boolean", "description": "요약 통계 포함 여부"},
+            "chart": {"type": "boolean", "description": "차트 이미지 생성 여부"},
+            "indicators": {"type": "array", "items": {"type": "string", "enum": ["ema", "rsi", "macd", "bollinger", "atr", "volume_ma"]}, "description": "추가 기술적 지표"},
+        },
+        "required": ["ticker"],
+    },
+    "guidelines": [
+        "티커는 반드시 Yahoo Finance에서 인식 가능한 형식으로 입력해야 하며, 한글 종목명 대신 반드시 티커 심볼을 사용하세요.",
+        "사용자가 한글 종목명(예: \"삼성전자\")으로 질문해도 반드시 Yahoo Finance에서 인식 가능한 티커(예: \"005930.KS\")로 변환하여 반환하세요.",
+        "'chart' 파라미터는 주가 그래프가 필요한 경우 true로 반드시 설정하세요.",
+        "추가 기술적 지표가 필요하면 indicators에 [\"ema\", \"rsi\", \"macd\", \"bollinger\", \"atr\", \"volume_ma\"] 중 필요한 것만 리스트로 지정하세요.",
+        "예를 들어, 삼성전자는 '005930.KS', 애플은 'AAPL'과 같이 정확한 티커를 입력해야 합니다.",
+        "여러 종목을 비교할 때는 stock 도구를 종목마다 따로 호출하지 말고, ticker에 티커 리스트(예: [\"005930.KS\", \"000660.KS\", \"AAPL\"])를 넣어 한 번만 호출하세요.",
+    ],
+    "examples": [
+        {"tool": "stock", "ticker": "AAPL", "start": "2024-01-01", "end": "2024-12-31", "interval": "1d", "ma_window": 20, "rsi_window": 14, "summary": True, "chart": True},
+        {"tool": "stock", "ticker": ["005930.KS", "000660.KS", "AAPL"], "start": "2024-01-01", "end": "2024-12-31", "interval": "1d", "chart": True},
+    ],
 }
 
 def guess_interval(query, interval):
@@ -46,12 +75,19 @@ def get_col(data, col_name):
     else:
         return data[col_name]
 
-def calculate_moving_average(data, window=5):
-    close = get_close_series(data)
+def get_close_frame(data):
+    # 여러 종목의 종가를 (날짜 x 티커) 2차원 프레임으로 반환
+    if isinstance(data.columns, pd.MultiIndex):
+        if 'Close' not in data.columns.get_level_values(0):
+            raise ValueError("멀티인덱스에서 'Close' 컬럼을 찾을 수 없습니다.")
+        return data.xs('Close', axis=1, level=0)
+    return data[['Close']]
+
+def moving_average(close, window=5):
+    # close: Series 또는 (날짜 x 티커) DataFrame — DataFrame이면 모든 종목을 한 번에 계산
     return close.rolling(window=window).mean()
 
-def calculate_rsi(data, window=14):
-    close = get_close_series(data)
+def rsi_from_close(close, window=14):
     delta = close.diff()
     gain = delta.where(delta > 0, 0)
     loss = -delta.where(delta < 0, 0)
@@ -61,26 +97,203 @@ def calculate_rsi(data, window=14):
     rsi = 100 - (100 / (1 + rs))
     return rsi
 
-def plot_to_base64(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
+def per_ticker(close, fn):
+    # 시장이 다른 종목을 합친 프레임은 서로의 휴장일에 NaN 행이 생기므로 종목별로 NaN을 뺀 뒤 계산하고 원래 날짜축에 맞춤
+    return pd.DataFrame({t: fn(close[t].dropna()) for t in close.columns}, index=close.index, columns=close.columns)
+
+def calculate_moving_average(data, window=5):
+    return moving_average(get_close_series(data), window)
+
+def calculate_rsi(data, window=14):
+    return rsi_from_close(get_close_series(data), window)
+
+def resolve_tickers(ticker):
+    # 리스트 또는 "AAPL, 005930.KS" 형태를 티커 리스트로 변환 (한글 종목명은 TICKER_MAP으로 변환)
+    if isinstance(ticker, str):
+        ticker = ticker.split(",")
+    names = [str(t).strip() for t in ticker if str(t).strip()]
+    return list(dict.fromkeys(TICKER_MAP.get(name, name.upper()) for name in names))
+
+def format_float_column(values, fmt="%.2f"):
+    # NaN은 "-"로, 나머지는 고정 소수점 문자열로 변환 (컬럼 단위로 한 번만 순회)
+    arr = np.asarray(values, dtype=np.float64)
+    return ["-" if v != v else fmt % v for v in arr.tolist()]
+
+def format_int_column(values):
+    arr = np.asarray(values, dtype=np.float64)
+    return ["-" if v != v else "%d" % v for v in arr.tolist()]
+
+TABLE_HEADER = ["날짜", "종가", "이동평균선", "RSI", "거래량", "시가", "고가", "저가"]
+
+def format_price_table(data, ma, rsi, table_format="text"):
+    """
+    주가 표를 컬럼 단위 연산으로 생성 (행마다 컬럼 탐색/.loc 조회 없음)
+    table_format: "text"(기본, '날짜 | 종가 | ...'), "markdown", "csv"
+    """
+    columns = [
+        data.index.strftime('%Y-%m-%d').tolist(),
+        format_float_column(get_close_series(data)),
+        format_float_column(ma),
+        format_float_column(rsi),
+        format_int_column(get_col(data, 'Volume')),
+        format_float_column(get_col(data, 'Open')),
+        format_float_column(get_col(data, 'High')),
+        format_float_column(get_col(data, 'Low')),
+    ]
+    if table_format == "csv":
+        return [",".join(TABLE_HEADER)] + [",".join(row) for row in zip(*columns)]
+    sep = " | "
+    rows = [sep.join(row) for row in zip(*columns)]
+    if table_format == "markdown":
+        header = "| " + sep.join(TABLE_HEADER) + " |"
+        divider = "|" + "|".join(["---"] * len(TABLE_HEADER)) + "|"
+        return [header, divider] + ["| " + row + " |" for row in rows]
+    return [sep.join(TABLE_HEADER)] + rows
+
+INDICATOR_LABELS = {
+    "ema": "EMA", "rsi": "Wilder RSI", "macd": "MACD", "bollinger": "볼린저밴드",
+    "atr": "ATR", "volume_ma": "거래량 MA",
+}
+
+def build_indicator_spec(names, ma_window=5, rsi_window=14):
+    # ["ema", "macd", ...] 형태의 지표 이름 목록을 IndicatorEngine spec으로 변환
+    defaults = {
+        "ema": [ma_window],
+        "rsi": rsi_window,
+        "macd": (12, 26, 9),
+        "bollinger": (20, 2.0),
+        "atr": 14,
+        "volume_ma": ma_window,
+    }
+    return {name: defaults[name] for name in names if name in defaults}
+
+def compute_indicators(data, ticker, interval, names, ma_window=5, rsi_window=14):
+    spec = build_indicator_spec(names, ma_window, rsi_window)
+    key = (ticker, interval, repr(sorted(spec.items())))
+    return indicator_cache.get(
+        key,
+        data.index.values,
+        get_close_series(data).to_numpy(),
+        high=get_col(data, 'High').to_numpy(),
+        low=get_col(data, 'Low').to_numpy(),
+        volume=get_col(data, 'Volume').to_numpy(),
+        spec=spec,
+    )
+
+def format_indicator_summary(result):
+    def last(name):
+        values = result.get(name)
+        if values is None or not len(values):
+            return "-"
+        v = values[-1]
+        return "-" if v != v else f"{v:.2f}"
+    parts = []
+    for name in result:
+        if name.startswith("ema_"):
+            parts.append(f"EMA({name[4:]}) {last(name)}")
+        elif name.startswith("rsi_"):
+            parts.append(f"Wilder RSI({name[4:]}) {last(name)}")
+        elif name.startswith("atr_"):
+            parts.append(f"ATR({name[4:]}) {last(name)}")
+        elif name.startswith("volume_ma_"):
+            parts.append(f"거래량 MA({name[10:]}) {last(name)}")
+    if "macd" in result:
+        parts.append(f"MACD {last('macd')} / 시그널 {last('macd_signal')} / 히스토그램 {last('macd_hist')}")
+    if "bb_mid" in result:
+        parts.append(f"볼린저밴드 상단 {last('bb_upper')} / 중단 {last('bb_mid')} / 하단 {last('bb_lower')}")
+    return "추가 지표(최근 값): " + ", ".join(parts)
+
+def run_batch(
+    tickers, start, end, interval, ma_window=5, rsi_window=14, summary=True, chart=True,
+    use_cache=True, indicators=None
+):
+    """
+    여러 종목을 한 번에 받아 MA/RSI를 종목별 거래일 기준으로 계산하고 비교 요약과 통합 차트를 생성
+    indicators가 있으면 종목별로 추가 지표의 최근 값을 함께 표시
+    """
+    if use_cache:
+        data = price_store.combine(price_store.get_prices_many(tickers, start, end, interval))
+    else:
+        data = yf.download(tickers, start=start, end=end, interval=interval)
+    if data.empty:
+        return f"{', '.join(tickers)}에 대한 주가 데이터를 찾을 수 없습니다. (start={start}, end={end}, interval={interval})"
+    close = get_close_frame(data)
+    ma = per_ticker(close, lambda s: moving_average(s, ma_window))
+    rsi = per_ticker(close, lambda s: rsi_from_close(s, rsi_window))
+    missing = [t for t in tickers if t not in close.columns or close[t].isna().all()]
+    found = [t for t in tickers if t not in missing]
+
+    # 종목별 통계를 컬럼 연산으로 한 번에 계산
+    first = close.apply(lambda s: s.loc[s.first_valid_index()] if s.first_valid_index() is not None else np.nan)
+    last = close.ffill().iloc[-1]
+    stats = pd.DataFrame({
+        "시작가": first,
+        "종가": last,
+        "최고가": close.max(),
+        "최저가": close.min(),
+        "평균가": close.mean(),
+        "기간 변동률(%)": (last - first) / first * 100,
+        f"MA({ma_window})": ma.ffill().iloc[-1],
+        f"RSI({rsi_window})": rsi.ffill().iloc[-1],
+    }).reindex(found)
+
+    lines = []
+    lines.append(f"{', '.join(found)} 주가 비교 ({start} ~ {end}, 간격: {interval})")
+    lines.append(f"이동평균선({ma_window}일) 및 RSI({rsi_window}일) 포함")
+    header = ["티커"] + list(stats.columns)
+    lines.append(" | ".join(header))
+    formatted = [format_float_column(stats[col]) for col in stats.columns]
+    for t, *vals in zip(found, *formatted):
+        lines.append(" | ".join([t] + vals))
+    if missing:
+        lines.append(f"데이터 없음: {', '.join(missing)}")
+    if summary and found:
+        change = stats["기간 변동률(%)"]
+        lines.append("")
+        lines.append(
+            f"요약: 최고 수익률 {change.idxmax()} {change.max():.2f}%, "
+            f"최저 수익률 {change.idxmin()} {change.min():.2f}%"
+        )
+    if indicators:
+        lines.append("")
+        for t in found:
+            part = price_store.split_by_ticker(data, t)
+            result = compute_indicators(part, t, interval, indicators, ma_window, rsi_window)
+            lines.append(f"{t} {format_indicator_summary(result)}")
+    artifacts = []
+    if chart and found:
+        # 가격 단위가 다른 종목을 비교할 수 있도록 시작가=100 기준으로 정규화
+        rebased = close[found] / first[found] * 100
+        title = f"{' vs '.join(found)} 주가 비교"
+        key = (
+            "compare", tuple(found), start, end, interval, rsi_window,
+            charts.data_fingerprint(close.index, close[found].sum(axis=1)),
+        )
+        png = charts.render_cache.get_or_render(key, lambda: charts.render_comparison_chart(
+            close.index,
+            {t: rebased[t].to_numpy() for t in found},
+            {t: rsi[t].to_numpy() for t in found},
+            title, rsi_window=rsi_window,
+        ))
+        artifacts.append({"type": "image/png", "data": png, "title": title})
+    return ToolOutput("\n".join(lines), artifacts)
 
 def run(
     query=None, ticker=None, start=None, end=None, interval=None,
-    ma_window=5, rsi_window=14, summary=True, chart=True
+    ma_window=5, rsi_window=14, summary=True, chart=True, table_format="text",
+    use_cache=True, indicators=None
 ):
     """
-    ticker: 주식 티커 (예: AAPL, 005930.KS)
+    ticker: 주식 티커 (예: AAPL, 005930.KS), 여러 종목 비교 시 리스트 (예: ["005930.KS", "AAPL"])
     start, end: 조회 기간 (YYYY-MM-DD)
     interval: '1d', '1wk', '1mo'
     ma_window: 이동평균선 기간
     rsi_window: RSI 계산 기간
     summary: 요약 통계 제공 여부
-    chart: 차트 이미지(base64) 생성 여부
+    chart: 차트 이미지(PNG 산출물) 생성 여부
+    table_format: 시세 표 형식 ("text", "markdown", "csv")
+    use_cache: 로컬 시세 저장소 사용 여부 (없는 구간만 yfinance에서 받음)
+    indicators: 추가 지표 목록 (예: ["ema", "macd", "bollinger", "atr", "rsi", "volume_ma"])
     """
     if not ticker and query:
         ticker = TICKER_MAP.get(query.strip(), query.strip().upper())
@@ -91,8 +304,23 @@ def run(
     if not end:
         end = datetime.now().strftime("%Y-%m-%d")
     interval = guess_interval(query, interval)
+    tickers = resolve_tickers(ticker)
+    if not tickers:
+        return "주식 티커를 입력해 주세요. 예: AAPL, TSLA, 005930.KS"
+    if len(tickers) > 1:
+        try:
+            return run_batch(
+                tickers, start, end, interval, ma_window=ma_window, rsi_window=rsi_window,
+                summary=summary, chart=chart, use_cache=use_cache, indicators=indicators
+            )
+        except Exception as e:
+            return f"주식 정보를 가져오는 중 오류 발생: {e}"
+    ticker = tickers[0]
     try:
-        data = yf.download(ticker, start=start, end=end, interval=interval)
+        if use_cache:
+            data = price_store.get_prices(ticker, start, end, interval)
+        else:
+            data = yf.download(ticker, start=start, end=end, interval=interval)
         if data.empty:
             return f"{ticker}에 대한 주가 데이터를 찾을 수 없습니다. (start={start}, end={end}, interval={interval})"
         ma = calculate_moving_average(data, ma_window)
@@ -100,24 +328,7 @@ def run(
         lines = []
         lines.append(f"{ticker} 주가 데이터 ({start} ~ {end}, 간격: {interval})")
         lines.append(f"이동평균선({ma_window}일) 및 RSI({rsi_window}일) 포함")
-        lines.append("날짜 | 종가 | 이동평균선 | RSI | 거래량 | 시가 | 고가 | 저가")
-        for idx, row in data.iterrows():
-            date_str = idx.strftime('%Y-%m-%d')
-            close = get_close_series(data).loc[idx]
-            ma_val = ma.loc[idx]
-            rsi_val = rsi.loc[idx]
-            volume = get_col(data, 'Volume').loc[idx]
-            open_p = get_col(data, 'Open').loc[idx]
-            high = get_col(data, 'High').loc[idx]
-            low = get_col(data, 'Low').loc[idx]
-            close_str = f"{close:.2f}" if pd.notna(close) else "-"
-            ma_str = f"{ma_val:.2f}" if pd.notna(ma_val) else "-"
-            rsi_str = f"{rsi_val:.2f}" if pd.notna(rsi_val) else "-"
-            volume_str = f"{int(volume)}" if pd.notna(volume) else "-"
-            open_str = f"{open_p:.2f}" if pd.notna(open_p) else "-"
-            high_str = f"{high:.2f}" if pd.notna(high) else "-"
-            low_str = f"{low:.2f}" if pd.notna(low) else "-"
-            lines.append(f"{date_str} | {close_str} | {ma_str} | {rsi_str} | {volume_str} | {open_str} | {high_str} | {low_str}")
+        lines.extend(format_price_table(data, ma, rsi, table_format=table_format))
         if summary:
             close_series = get_close_series(data)
             max_close = close_series.max()
@@ -126,27 +337,23 @@ def run(
             pct_change = ((close_series.iloc[-1] - close_series.iloc[0]) / close_series.iloc[0]) * 100 if len(close_series) > 1 else 0
             lines.append("")
             lines.append(f"요약: 최고가 {max_close:.2f}, 최저가 {min_close:.2f}, 평균가 {mean_close:.2f}, 기간 변동률 {pct_change:.2f}%")
-        # 차트 생성
-        chart_img = None
+        if indicators:
+            result = compute_indicators(data, ticker, interval, indicators, ma_window, rsi_window)
+            lines.append(format_indicator_summary(result))
+        # 차트 생성 (텍스트와 분리된 PNG 산출물로 전달)
+        artifacts = []
         if chart:
             close_series = get_close_series(data)
-            fig, ax1 = plt.subplots(figsize=(10, 6))
-            ax1.plot(data.index, close_series, label='종가', color='blue')
-            ax1.plot(ma.index, ma, label=f'MA({ma_window})', color='orange')
-            ax1.set_xlabel('날짜')
-            ax1.set_ylabel('가격')
-            ax1.legend(loc='upper left')
-            ax2 = ax1.twinx()
-            ax2.plot(rsi.index, rsi, label=f'RSI({rsi_window})', color='green')
-            ax2.axhline(70, color='red', linestyle='--', linewidth=0.7)
-            ax2.axhline(30, color='red', linestyle='--', linewidth=0.7)
-            ax2.set_ylabel('RSI')
-            ax2.legend(loc='upper right')
-            plt.title(f'{ticker} 주가 및 기술적 지표')
-            chart_img = plot_to_base64(fig)
-        result_text = "\n".join(lines)
-        if chart_img:
-            result_text += f"\n\n[차트 이미지(base64)]: {chart_img}"
-        return result_text
+            title = f'{ticker} 주가 및 기술적 지표'
+            key = (
+                ticker, start, end, interval, ma_window, rsi_window,
+                charts.data_fingerprint(data.index, close_series),
+            )
+            png = charts.render_cache.get_or_render(key, lambda: charts.render_price_chart(
+                data.index, close_series.to_numpy(), ma.to_numpy(), rsi.to_numpy(),
+                title, ma_window=ma_window, rsi_window=rsi_window,
+            ))
+            artifacts.append({"type": "image/png", "data": png, "title": title})
+        return ToolOutput("\n".join(lines), artifacts)
     except Exception as e:
         return f"주식 정보를 가져오는 중 오류 발생: {e}"
@@ -1,9 +1,36 @@
 # tools/tavily.py
 import os
-from tavily import TavilyClient
+from response_cache import response_cache
+from transport import post_json
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+# 플래너 프롬프트/함수 호출 스키마에 쓰이는 도구 명세 (import 없이 읽을 수 있도록 리터럴로 유지)
+TOOL_SPEC = {
+    "name": "tavily",
+    "description": "자연어 질의에 대해 실시간 웹 검색, 뉴스, 금융, 이미지, 원문 포함 등 다양한 정보를 제공합니다.",
+    "requires_env": ["TAVILY_API_KEY"],
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "자연어 검색 질의"},
+        },
+        "required": ["query"],
+    },
+    "guidelines": [],
+    "examples": [
+        {"tool": "tavily", "query": "2025년 AI 트렌드"},
+    ],
+}
 
 api_key = os.getenv("TAVILY_API_KEY")
-tavily_client = TavilyClient(api_key=api_key)
+
+def search(**params):
+    # 공유 HTTP 세션(keep-alive/재시도/타임아웃)으로 Tavily REST API 직접 호출
+    if not api_key:
+        raise ValueError("TAVILY_API_KEY가 설정되어 있지 않습니다.")
+    payload = {k: v for k, v in params.items() if v is not None}
+    return post_json(TAVILY_SEARCH_URL, payload, headers={"Authorization": f"Bearer {api_key}"})
 
 def run(
     query,
@@ -21,7 +48,7 @@ def run(
     Tavily Search Tool - 실시간 웹/뉴스/금융/이미지/원문 검색 및 요약
     """
     try:
-        response = tavily_client.search(
+        params = dict(
             query=query,
             max_results=max_results,
             topic=topic,
@@ -33,6 +60,7 @@ def run(
             include_domains=include_domains,
             exclude_domains=exclude_domains
         )
+        response = response_cache.get_or_fetch("tavily", params, lambda: search(**params))
         results = response.get("results", [])
         answer = response.get("answer")
         if not results:
@@ -0,0 +1,7 @@
+# 한글 종목명 → 티커 매핑 (필요시 확장)
+TICKER_MAP = {
+    "삼성전자": "005930.KS",
+    "애플": "AAPL",
+    "SK하이닉스": "000660.KS",
+    # 필요시 추가
+}
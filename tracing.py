@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# 요청 단위 트레이스: 플래너/도구/외부 호출/차트/답변 생성 구간을 중첩 span으로 기록
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH")      # 설정하면 요청마다 JSON 한 줄씩 추가
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "50"))
+# Prometheus 히스토그램 버킷(초)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = dict(attrs)
+        self.start = time.perf_counter()
+        self.end = None
+        self.status = "ok"
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.start) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    def __init__(self, name, attrs=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self.lock:
+            spans = [span.to_dict() for span in self.spans]
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "attrs": self.attrs,
+            "spans": spans,
+        }
+
+
+class SpanMetrics:
+    """
+    span 이름별 지속 시간 히스토그램과 오류 수 (Prometheus 텍스트 형식으로 출력)
+    """
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, name, seconds, error=False):
+        with self.lock:
+            entry = self.series.setdefault(
+                name, {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0, "errors": 0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+            entry["count"] += 1
+            entry["sum"] += seconds
+            if error:
+                entry["errors"] += 1
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP jarvis_span_duration_seconds Duration of traced pipeline spans.",
+            "# TYPE jarvis_span_duration_seconds histogram",
+        ]
+        with self.lock:
+            series = {name: dict(entry, buckets=list(entry["buckets"])) for name, entry in self.series.items()}
+        for name in sorted(series):
+            entry = series[name]
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                lines.append(f'jarvis_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'jarvis_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'jarvis_span_duration_seconds_sum{{span="{name}"}} {entry["sum"]:.6f}')
+            lines.append(f'jarvis_span_duration_seconds_count{{span="{name}"}} {entry["count"]}')
+        lines.append("# HELP jarvis_span_errors_total Spans that ended with an error.")
+        lines.append("# TYPE jarvis_span_errors_total counter")
+        for name in sorted(series):
+            lines.append(f'jarvis_span_errors_total{{span="{name}"}} {series[name]["errors"]}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = SpanMetrics()
+recent_traces = deque(maxlen=TRACE_HISTORY)
+
+
+def start_trace(name, **attrs):
+    # 현재 컨텍스트에 새 트레이스를 설정하고 반환 (finish_trace로 종료)
+    trace = Trace(name, attrs)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def finish_trace(trace):
+    if trace is None or trace.end is not None:
+        return
+    trace.end = time.perf_counter()
+    metrics.observe(trace.name, trace.end - trace.start)
+    recent_traces.append(trace)
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+    if TRACE_JSONL_PATH:
+        try:
+            with open(TRACE_JSONL_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+        except OSError:
+            pass
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    with span("tool", tool="stock") as s:
+        s.attrs["bytes"] = ...
+    트레이스가 없으면 기록하지 않음 (attrs 설정은 그대로 가능)
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    s = Span(trace, name, parent.id if parent else None, attrs) if trace else None
+    if s is None:
+        yield _NullSpan()
+        return
+    trace.add(s)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.attrs["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current_span.reset(token)
+        metrics.observe(name, s.end - s.start, error=s.status == "error")
+
+
+class _NullSpan:
+    def __init__(self):
+        self.attrs = {}
+
+
+def annotate(**attrs):
+    # 현재 span에 속성 추가 (캐시 히트, 바이트 수 등)
+    s = _current_span.get()
+    if s is not None:
+        s.attrs.update(attrs)
+
+
+def record_span(name, duration_ms, **attrs):
+    # 이미 끝난 구간을 현재 span의 자식으로 기록 (드라이버 이벤트 등 콜백 기반 측정용)
+    trace = _current_trace.get()
+    if trace is None:
+        metrics.observe(name, duration_ms / 1000)
+        return
+    parent = _current_span.get()
+    s = Span(trace, name, parent.id if parent else None, attrs)
+    s.end = time.perf_counter()
+    s.start = s.end - duration_ms / 1000
+    if attrs.get("error"):
+        s.status = "error"
+    trace.add(s)
+    metrics.observe(name, duration_ms / 1000, error=s.status == "error")
+
+
+def wrap_context(fn):
+    # 스레드 풀로 넘기는 함수가 현재 트레이스/span을 이어받도록 컨텍스트를 복사
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def waterfall(trace):
+    """
+    디버그 패널용: [(깊이, 이름, 시작 ms, 지속 ms, 상태, attrs), ...] (시작 시각 순)
+    """
+    data = trace.to_dict()
+    spans = sorted(data["spans"], key=lambda s: s["start_ms"])
+    depth = {}
+    rows = []
+    for s in spans:
+        depth[s["id"]] = depth.get(s["parent_id"], -1) + 1 if s["parent_id"] else 0
+        rows.append((depth[s["id"]], s["name"], s["start_ms"], s["duration_ms"], s["status"], s["attrs"]))
+    return rows
+
+
+def export_jsonl(path, traces=None):
+    with open(path, "a", encoding="utf-8") as f:
+        for trace in traces if traces is not None else list(recent_traces):
+            f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
@@ -0,0 +1,207 @@
+import os
+import random
+import asyncio
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tracing import span
+
+# 모든 도구가 공유하는 HTTP 전송 계층: keep-alive 커넥션 풀, 공통 타임아웃, 지터 백오프 재시도, 호스트별 동시 연결 제한
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "4"))
+HTTP_PER_HOST_CONNECTIONS = int(os.getenv("HTTP_PER_HOST_CONNECTIONS", "8"))
+HTTP_HOST_POOLS = int(os.getenv("HTTP_HOST_POOLS", "16"))
+# 호스트별 동시 연결 한도에 걸렸을 때 빈 자리를 기다리는 최대 시간(초)
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# POST는 서버에서 이미 처리됐을 수 있으므로 요청이 처리되지 않았음이 확실한 경우(연결 실패, 429/503)만 재시도
+POST_RETRY_STATUSES = (429, 503)
+USER_AGENT = "jarvis-agent/1.0"
+
+
+class HTTPError(Exception):
+    pass
+
+
+def backoff_delay(attempt, base=HTTP_BACKOFF, cap=HTTP_BACKOFF_MAX):
+    # full jitter: 0 ~ min(cap, base * 2^attempt) 사이 임의 대기 (동시 재시도가 한꺼번에 몰리지 않도록)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class PoolTimeout(requests.exceptions.ConnectionError):
+    pass
+
+
+class TimeoutSession(requests.Session):
+    """
+    호출하는 쪽(외부 라이브러리 포함)이 timeout을 주지 않아도 기본 타임아웃 적용
+    호스트별 동시 요청 수는 세마포어로 제한하고, 자리가 나기를 최대 pool_timeout초만 기다림
+    (urllib3의 pool_block은 대기 시간 제한이 없어 요청 제한 시간 밖에서 도구 스레드를 무기한 붙잡을 수 있음)
+    """
+    def __init__(self, per_host=HTTP_PER_HOST_CONNECTIONS, pool_timeout=HTTP_POOL_TIMEOUT):
+        super().__init__()
+        self.per_host = per_host
+        self.pool_timeout = pool_timeout
+        self.host_limits = {}
+        self.host_limits_lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        host = urlsplit(url).netloc
+        with self.host_limits_lock:
+            limit = self.host_limits.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        if not limit.acquire(timeout=self.pool_timeout):
+            raise PoolTimeout(f"{host} 연결 대기 시간 초과({self.pool_timeout:.0f}초, 동시 연결 {self.per_host}개 사용 중)")
+        try:
+            return super().request(method, url, **kwargs)
+        finally:
+            limit.release()
+
+
+class SafeRetry(Retry):
+    """
+    GET/HEAD는 연결/읽기 오류와 RETRY_STATUSES를 재시도하고,
+    POST는 연결 오류와 POST_RETRY_STATUSES만 재시도 (읽기 시간 초과/5xx는 중복 실행 위험이 있어 재시도하지 않음)
+    연결 오류는 urllib3가 메서드와 관계없이 재시도하고, 읽기 오류는 allowed_methods(GET/HEAD)에서만 재시도함
+    """
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == "POST":
+            return bool(self.total) and status_code in POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def build_session(max_retries=HTTP_MAX_RETRIES, per_host=HTTP_PER_HOST_CONNECTIONS):
+    retry = SafeRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=HTTP_BACKOFF,
+        backoff_max=HTTP_BACKOFF_MAX,
+        backoff_jitter=HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        # POST는 읽기 오류를 재시도하지 않음 (SafeRetry.is_retry에서 429/503만 따로 허용)
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # 동시 연결 수는 TimeoutSession이 대기 시간 제한과 함께 관리하므로 풀 자체는 막지 않음 (pool_block=False)
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_HOST_POOLS, pool_maxsize=per_host, max_retries=retry, pool_block=False
+    )
+    session = TimeoutSession(per_host=per_host)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # 프로세스 전역 세션 (requests.Session은 요청 단위 사용에 대해 스레드 간 공유 가능)
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def request_json(method, url, **kwargs):
+    """
+    공유 세션으로 요청하고 JSON을 반환
+    4xx/5xx(재시도 후)는 HTTPError(상태 코드 + 응답 일부)로 변환
+    """
+    with span("http", method=method, host=urlsplit(url).netloc) as s:
+        response = get_session().request(method, url, **kwargs)
+        s.attrs["status"] = response.status_code
+        s.attrs["bytes"] = len(response.content)
+    if response.status_code >= 400:
+        raise HTTPError(f"{urlsplit(url).netloc} HTTP {response.status_code}: {response.text[:200]}")
+    return response.json()
+
+
+def get_json(url, params=None, **kwargs):
+    return request_json("GET", url, params=params, **kwargs)
+
+
+def post_json(url, payload=None, **kwargs):
+    return request_json("POST", url, json=payload, **kwargs)
+
+
+class AsyncTransport:
+    """
+    비동기 버전 (httpx 필요): 인스턴스당 하나의 AsyncClient를 재사용 (같은 이벤트 루프 안에서 사용)
+    호스트별 동시 요청 수는 세마포어로 제한
+    """
+    def __init__(self, per_host=HTTP_PER_HOST_CONNECTIONS, max_retries=HTTP_MAX_RETRIES):
+        self.per_host = per_host
+        self.max_retries = max_retries
+        self.client = None
+        self.host_limits = {}
+
+    def get_client(self):
+        if self.client is None:
+            try:
+                import httpx
+            except ImportError:
+                raise ImportError("비동기 전송 계층을 사용하려면 httpx를 설치해 주세요. (pip install httpx)")
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.per_host * HTTP_HOST_POOLS,
+                    max_keepalive_connections=self.per_host * HTTP_HOST_POOLS,
+                ),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self.client
+
+    async def request_json(self, method, url, **kwargs):
+        import httpx
+        client = self.get_client()
+        host = urlsplit(url).netloc
+        limit = self.host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        # 동기 세션(SafeRetry)과 같은 기준: POST는 연결 오류와 429/503만 재시도
+        is_post = method.upper() == "POST"
+        retry_errors = (httpx.ConnectError, httpx.ConnectTimeout) if is_post else (
+            httpx.ConnectError, httpx.ReadTimeout, httpx.ConnectTimeout
+        )
+        retry_statuses = POST_RETRY_STATUSES if is_post else RETRY_STATUSES
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                async with limit:
+                    response = await client.request(method, url, **kwargs)
+            except retry_errors:
+                if last:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            if response.status_code in retry_statuses and not last:
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            if response.status_code >= 400:
+                raise HTTPError(f"{host} HTTP {response.status_code}: {response.text[:200]}")
+            return response.json()
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None